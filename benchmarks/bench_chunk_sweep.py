@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Chunk size / overlap sweep: retrieval quality against cost.
+Extracts the PDF once, then for every size:overlap setting re-chunks and re-embeds the
+corpus into a throwaway Chroma collection and scores it on a question set:
+  - recall@k: share of each question's relevant pages found in the top-k chunks
+  - embed time and tokens/s for the whole corpus
+  - index size on disk
+  - context tokens per query: the format_docs() prompt context built from the top-k chunks
+Token counts use the embedding model's tokenizer, so they approximate the LLM's.
+
+The question set is a JSON list of {"question": "...", "pages": [page numbers]}. Without
+--questions, the synthetic rulebook is used with one "Article N" question per text page,
+which exercises the harness but says little about a real model's quality.
+
+Usage:
+    python benchmarks/bench_chunk_sweep.py [pdf_path] --questions questions.json
+                                           [--settings 4096:512,1024:128,512:64] [--k 10]
+                                           [--model NAME_OR_PATH|tiny] [--output data/benchmarks/chunk_sweep.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from src.config import EMBEDDING_MODEL_NAME, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP
+from src.data_processor import (create_token_budget_embeddings, prepare_documents_for_chroma,
+                                assign_chunk_ids, add_new_chunks)
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.pdf_parser import extract_text_with_metadata
+from src.token_chunker import ModelTokenTextSplitter
+from rag_chain import format_docs
+from benchmarks.bench_ingestion import PrecomputedEmbeddings
+from benchmarks.synthetic_model import build_tiny_sentence_transformer
+from benchmarks.synthetic_pdf import build_synthetic_rulebook
+
+DEFAULT_SETTINGS = f"{TOKEN_CHUNK_SIZE}:{TOKEN_CHUNK_OVERLAP},2048:256,1024:128,512:64,256:32"
+
+def parse_settings(value: str) -> List[Tuple[int, int]]:
+    """Parse 'size:overlap,size:overlap,...'."""
+    settings = []
+    for term in value.split(","):
+        try:
+            size, overlap = (int(part) for part in term.split(":"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected size:overlap pairs such as 1024:128, got '{term}'")
+        if size <= 0 or not 0 <= overlap < size:
+            raise argparse.ArgumentTypeError(f"Overlap must be below the chunk size: '{term}'")
+        settings.append((size, overlap))
+    return settings
+
+def synthetic_questions(pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One question per included text page of the synthetic rulebook, whose pages say 'Article <page>'."""
+    return [{"question": f"What does Article {page['page_number']} say about scoring in Tanding?",
+             "pages": [page["page_number"]]}
+            for page in pages if not page.get("is_visual_reference") and "Article" in page["text"]]
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under path."""
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def text_tokens(embeddings: TokenBudgetEmbeddings, text: str) -> int:
+    """Untruncated token count of a text (count_tokens truncates to the model input)."""
+    return len(embeddings.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+def run_setting(pages: List[Dict[str, Any]], questions: List[Dict[str, Any]], query_vectors: np.ndarray,
+                embeddings: TokenBudgetEmbeddings, chunk_size: int, chunk_overlap: int, k: int,
+                work_dir: str) -> Dict[str, Any]:
+    """Chunk, embed, index and score one size/overlap setting."""
+    splitter = ModelTokenTextSplitter(embeddings, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_documents(prepare_documents_for_chroma(pages))
+    chunk_texts = [chunk.page_content for chunk in chunks]
+
+    tokens_before = embeddings.stats["tokens"]
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(chunk_texts)
+    embed_seconds = time.perf_counter() - start
+    corpus_tokens = embeddings.stats["tokens"] - tokens_before
+
+    persist_directory = os.path.join(work_dir, f"chroma_{chunk_size}_{chunk_overlap}")
+    precomputed = PrecomputedEmbeddings(dict(zip(chunk_texts, vectors)))
+    vector_store = Chroma(collection_name=f"sweep_{chunk_size}_{chunk_overlap}",
+                          persist_directory=persist_directory, embedding_function=precomputed)
+    start = time.perf_counter()
+    add_new_chunks(vector_store, chunks, assign_chunk_ids(chunks))
+    write_seconds = time.perf_counter() - start
+
+    recalls = []
+    context_tokens = []
+    for question, query_vector in zip(questions, query_vectors):
+        docs = vector_store.similarity_search_by_vector(query_vector.tolist(), k=k)
+        relevant = set(question["pages"])
+        found = {doc.metadata.get("page_number") for doc in docs}
+        recalls.append(len(relevant & found) / len(relevant))
+        context_tokens.append(text_tokens(embeddings, format_docs(docs)))
+    index_bytes = directory_size(persist_directory)
+    shutil.rmtree(persist_directory, ignore_errors=True)
+
+    return {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "effective_chunk_size": splitter._chunk_size,
+        "effective_chunk_overlap": splitter._chunk_overlap,
+        "chunks": len(chunks),
+        "corpus_tokens": corpus_tokens,
+        "embed_seconds": round(embed_seconds, 3),
+        "tokens_per_second": round(corpus_tokens / embed_seconds, 1) if embed_seconds else None,
+        "write_seconds": round(write_seconds, 3),
+        "index_mb": round(index_bytes / (1024 * 1024), 2),
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "context_tokens_mean": round(float(np.mean(context_tokens)), 1) if context_tokens else None,
+        "context_tokens_max": max(context_tokens, default=None)
+    }
+
+def pick_setting(results: List[Dict[str, Any]], k: int, recall_margin: float = 0.01) -> Dict[str, Any]:
+    """The cheapest setting (fewest context tokens per query) within recall_margin of the best recall."""
+    recall_key = f"recall_at_{k}"
+    best_recall = max(result[recall_key] for result in results)
+    candidates = [result for result in results if result[recall_key] >= best_recall - recall_margin]
+    return min(candidates, key=lambda result: (result["context_tokens_mean"], result["embed_seconds"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunk size/overlap against recall@k and cost")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to index (default: a synthetic rulebook)")
+    parser.add_argument("--questions", help="JSON list of {\"question\": ..., \"pages\": [...]}")
+    parser.add_argument("--settings", type=parse_settings, default=parse_settings(DEFAULT_SETTINGS),
+                        help=f"Comma-separated size:overlap pairs (default: {DEFAULT_SETTINGS})")
+    parser.add_argument("--k", type=int, default=10, help="Chunks retrieved per question (the retriever uses 10)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME,
+                        help="Embedding model name or path; 'tiny' builds a random offline stand-in")
+    parser.add_argument("--output", default="data/benchmarks/chunk_sweep.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="chunk_sweep_")
+    try:
+        pdf_path = args.pdf_path
+        if not pdf_path:
+            pdf_path = build_synthetic_rulebook(os.path.join(work_dir, "synthetic_rulebook.pdf"), table_pages=10)
+            print(f"No PDF given, using a synthetic rulebook: {pdf_path}")
+        model = args.model
+        if model == "tiny":
+            model = build_tiny_sentence_transformer(os.path.join(work_dir, "tiny_model"), max_seq_length=512)
+
+        pages = extract_text_with_metadata(pdf_path)
+        if args.questions:
+            with open(args.questions, encoding="utf-8") as f:
+                questions = json.load(f)
+        else:
+            questions = synthetic_questions(pages)
+        if not questions:
+            raise SystemExit("The question set is empty")
+
+        embeddings = create_token_budget_embeddings(model)
+        query_vectors = np.array([embeddings.embed_query(question["question"]) for question in questions])
+
+        results = []
+        for chunk_size, chunk_overlap in args.settings:
+            print(f"\n--- chunk size {chunk_size}, overlap {chunk_overlap} ---")
+            results.append(run_setting(pages, questions, query_vectors, embeddings, chunk_size, chunk_overlap,
+                                       args.k, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    recall_key = f"recall_at_{args.k}"
+    print(f"\n{'='*96}")
+    print(f"CHUNK SWEEP: {os.path.basename(pdf_path)}, {len(pages)} pages, {len(questions)} questions, model {args.model}")
+    print(f"{'='*96}")
+    print(f"{'size:overlap':<14}{'effective':>11}{'chunks':>8}{'recall@' + str(args.k):>11}{'embed s':>9}"
+          f"{'tokens/s':>10}{'index MB':>10}{'ctx tokens':>12}{'ctx max':>9}")
+    for result in results:
+        print(f"{result['chunk_size']}:{result['chunk_overlap']:<{13 - len(str(result['chunk_size']))}}"
+              f"{result['effective_chunk_size']:>6}:{result['effective_chunk_overlap']:<4}"
+              f"{result['chunks']:>8}{result[recall_key]:>11.1%}{result['embed_seconds']:>9.1f}"
+              f"{result['tokens_per_second'] or 0:>10.0f}{result['index_mb']:>10.1f}"
+              f"{result['context_tokens_mean']:>12.0f}{result['context_tokens_max']:>9}")
+    choice = pick_setting(results, args.k)
+    print(f"\nCheapest setting within 1 point of the best recall: "
+          f"TOKEN_CHUNK_SIZE = {choice['chunk_size']}, TOKEN_CHUNK_OVERLAP = {choice['chunk_overlap']}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"pdf_path": pdf_path, "model": args.model, "k": args.k, "questions": len(questions),
+                   "results": results, "choice": choice}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
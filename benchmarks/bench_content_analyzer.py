@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for page content analysis.
+Compares per-page time of analyze_page_content (full get_drawings()) against
+analyze_page_content_fast (content-stream scan) and checks the labels agree.
+
+Usage:
+    python benchmarks/bench_content_analyzer.py [pdf_path] [--drawing-limit N]
+Without a PDF path the rulebook from src/config.py is used, or a synthetic one if it is missing.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from src.config import PDF_PATH
+from src.content_analyzer import analyze_page_content, analyze_page_content_fast
+from benchmarks.synthetic_pdf import build_synthetic_rulebook
+
+def time_call(func, *args, **kwargs):
+    """Return (result, elapsed seconds) for a single call."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_benchmark(pdf_path: str, drawing_limit=None, slowest: int = 5):
+    """Analyze every page with both functions and print timing and agreement."""
+    doc = fitz.open(pdf_path)
+    rows = []
+    for page in doc:
+        text = page.get_text()
+        full, full_time = time_call(analyze_page_content, page, text)
+        fast, fast_time = time_call(analyze_page_content_fast, page, text, drawing_limit=drawing_limit)
+        rows.append((page.number + 1, full, fast, full_time, fast_time))
+    doc.close()
+
+    total_full = sum(row[3] for row in rows)
+    total_fast = sum(row[4] for row in rows)
+    label_mismatches = [row[0] for row in rows if row[1]["content_type"] != row[2]["content_type"]]
+    count_mismatches = [row[0] for row in rows if row[1]["drawing_count"] != row[2]["drawing_count"]]
+
+    print(f"{'='*80}")
+    print(f"CONTENT ANALYSIS BENCHMARK: {pdf_path}")
+    print(f"{'='*80}")
+    print(f"Pages: {len(rows)}")
+    print(f"Drawing limit: {drawing_limit}")
+    print(f"analyze_page_content:      {total_full:.3f}s total, {total_full / len(rows) * 1000:.2f} ms/page")
+    print(f"analyze_page_content_fast: {total_fast:.3f}s total, {total_fast / len(rows) * 1000:.2f} ms/page")
+    print(f"Speed-up: {total_full / total_fast if total_fast else float('inf'):.1f}x")
+    print(f"content_type mismatches: {len(label_mismatches)} {label_mismatches[:10]}")
+    print(f"drawing_count mismatches: {len(count_mismatches)} {count_mismatches[:10]}")
+
+    print(f"\nSlowest {slowest} pages under analyze_page_content:")
+    for page_number, full, fast, full_time, fast_time in sorted(rows, key=lambda row: row[3], reverse=True)[:slowest]:
+        print(f"  Page {page_number}: {full['drawing_count']} drawings, "
+              f"{full_time * 1000:.2f} ms -> {fast_time * 1000:.2f} ms ({full['content_type']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page content analysis")
+    parser.add_argument("pdf_path", nargs="?", default=PDF_PATH)
+    parser.add_argument("--drawing-limit", type=int, default=None,
+                        help="Stop counting drawings at this many (early exit)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.pdf_path):
+        run_benchmark(args.pdf_path, drawing_limit=args.drawing_limit)
+        return
+
+    print(f"PDF not found at {args.pdf_path}; using a synthetic rulebook instead.\n")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = build_synthetic_rulebook(os.path.join(tmp_dir, "synthetic_rulebook.pdf"))
+        run_benchmark(pdf_path, drawing_limit=args.drawing_limit)
+
+if __name__ == "__main__":
+    main()
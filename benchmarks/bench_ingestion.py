@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingestion benchmark on a synthetic rulebook.
+Builds a PDF with a configurable mix of text pages, table pages and drawing-heavy pages,
+then times each ingestion stage separately:
+  - extraction: extract_text_with_metadata (text layer, analysis, cleaning, filtering; page cache off)
+  - text_layer / analysis / analysis_fast / cleaning: the per-page steps on their own
+  - splitting: token chunking with the stand-in model's tokenizer
+  - embedding: TokenBudgetEmbeddings with a small stand-in model (no embedding cache)
+  - chroma_write: chunk IDs plus add_new_chunks into a throwaway collection
+Per stage it records seconds, pages/s and the peak RSS so far, and writes everything to JSON.
+With --baseline it compares pages/s against an earlier result and exits non-zero on regressions.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--pages 200] [--mix 7:2:1] [--drawings-per-page 3000]
+                                         [--model tiny|NAME_OR_PATH] [--workers N]
+                                         [--output data/benchmarks/ingestion.json]
+                                         [--baseline previous.json] [--tolerance 0.2]
+Use --pages 10000 to check scaling; --keep-pdf reuses the generated PDF between runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+import src.pdf_parser as pdf_parser
+from src.config import TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP
+from src.content_analyzer import analyze_page_content, analyze_page_content_fast
+from src.data_processor import prepare_documents_for_chroma, assign_chunk_ids, add_new_chunks
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.text_processor import clean_text
+from src.token_chunker import ModelTokenTextSplitter
+from benchmarks.synthetic_model import build_tiny_sentence_transformer
+from benchmarks.synthetic_pdf import build_synthetic_rulebook
+
+class PrecomputedEmbeddings(Embeddings):
+    """Hands Chroma vectors computed in the embedding stage, so chroma_write times the writes only."""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """
+    Peak resident set size so far in MB (ru_maxrss is KB on Linux and bytes on macOS),
+    of this process or of its finished child processes. None where resource is unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+    return round(peak, 1)
+
+def parse_mix(mix: str) -> Tuple[int, int, int]:
+    """Parse a text:table:drawing page ratio such as '7:2:1'."""
+    parts = [int(part) for part in mix.split(":")]
+    if len(parts) != 3 or min(parts) < 0 or not sum(parts):
+        raise argparse.ArgumentTypeError(f"Expected a text:table:drawing ratio such as 7:2:1, got '{mix}'")
+    return tuple(parts)
+
+def page_counts(pages: int, mix: Tuple[int, int, int]) -> Dict[str, int]:
+    """Split a page total by the mix ratio; rounding leftovers go to text pages."""
+    table_pages = pages * mix[1] // sum(mix)
+    drawing_pages = pages * mix[2] // sum(mix)
+    return {"text_pages": pages - table_pages - drawing_pages, "table_pages": table_pages,
+            "drawing_pages": drawing_pages}
+
+class StageTimer:
+    """Collects per-stage seconds, throughput and peak memory."""
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, name: str, func, *args, **kwargs):
+        print(f"  {name}...", end="", flush=True)
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        stage = {
+            "seconds": round(seconds, 4),
+            "pages_per_second": round(self.pages / seconds, 2) if seconds else None,
+            "peak_rss_mb": peak_rss_mb()
+        }
+        self.stages[name] = stage
+        print(f" {seconds:.2f}s ({stage['pages_per_second']} pages/s)")
+        return result
+
+    def count(self, name: str, items: str, count: int):
+        """Record a stage's item count and rate, e.g. chunks for the embedding stage."""
+        seconds = self.stages[name]["seconds"]
+        self.stages[name][items] = count
+        self.stages[name][f"{items}_per_second"] = round(count / seconds, 2) if seconds else None
+
+def load_stand_in_model(model: str, work_dir: str) -> TokenBudgetEmbeddings:
+    """'tiny' builds a random 2-layer BERT offline; anything else is loaded by name or path."""
+    if model == "tiny":
+        model = build_tiny_sentence_transformer(os.path.join(work_dir, "tiny_model"), max_seq_length=256)
+    huggingface_embeddings = HuggingFaceEmbeddings(model_name=model,
+                                                   model_kwargs={"device": "cpu", "trust_remote_code": True},
+                                                   encode_kwargs={"normalize_embeddings": True})
+    return TokenBudgetEmbeddings(huggingface_embeddings)
+
+def run_benchmark(pdf_path: str, model: str, work_dir: str, workers=None) -> Dict[str, Any]:
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+    timer = StageTimer(total_pages)
+
+    # Reruns must not be served from the page cache
+    pdf_parser.PAGE_CACHE_ENABLED = False
+    pages = timer.run("extraction", pdf_parser.extract_text_with_metadata, pdf_path,
+                      num_workers=workers, ocr=False)
+
+    doc = fitz.open(pdf_path)
+    texts = timer.run("text_layer", lambda: [page.get_text() for page in doc])
+    timer.run("analysis", lambda: [analyze_page_content(page, text) for page, text in zip(doc, texts)])
+    timer.run("analysis_fast", lambda: [analyze_page_content_fast(page, text) for page, text in zip(doc, texts)])
+    timer.run("cleaning", lambda: [clean_text(text) for text in texts])
+    doc.close()
+
+    embeddings = load_stand_in_model(model, work_dir)
+    splitter = ModelTokenTextSplitter(embeddings, chunk_size=TOKEN_CHUNK_SIZE, chunk_overlap=TOKEN_CHUNK_OVERLAP)
+    chunks = timer.run("splitting", splitter.split_documents, prepare_documents_for_chroma(pages))
+    timer.count("splitting", "chunks", len(chunks))
+    chunk_texts = [chunk.page_content for chunk in chunks]
+    vectors = timer.run("embedding", embeddings.embed_documents, chunk_texts)
+    timer.count("embedding", "chunks", len(chunks))
+    timer.stages["embedding"]["tokens_per_second"] = round(embeddings.throughput()["tokens_per_second"], 1)
+
+    vector_store = Chroma(collection_name="ingestion_benchmark", persist_directory=os.path.join(work_dir, "chroma"),
+                          embedding_function=PrecomputedEmbeddings(dict(zip(chunk_texts, vectors))))
+    ids = assign_chunk_ids(chunks)
+    added = timer.run("chroma_write", add_new_chunks, vector_store, chunks, ids)
+    timer.count("chroma_write", "chunks", added)
+
+    return {
+        "total_pages": total_pages,
+        "included_pages": len(pages),
+        "chunks": len(chunks),
+        "stages": timer.stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in timer.stages.values()), 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_children_mb": peak_rss_mb(children=True)
+    }
+
+def compare_with_baseline(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Names of stages whose pages/s dropped by more than `tolerance` against the baseline."""
+    regressions = []
+    print(f"\n{'Stage':<16}{'baseline p/s':>14}{'now p/s':>12}{'change':>10}")
+    for name, stage in result["stages"].items():
+        before = baseline.get("stages", {}).get(name, {}).get("pages_per_second")
+        now = stage["pages_per_second"]
+        if not before or not now:
+            continue
+        change = now / before - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        print(f"{name:<16}{before:>14.1f}{now:>12.1f}{change:>+10.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion stages on a synthetic rulebook")
+    parser.add_argument("--pages", type=int, default=200, help="Total pages in the synthetic PDF")
+    parser.add_argument("--mix", type=parse_mix, default=(7, 2, 1), help="text:table:drawing page ratio")
+    parser.add_argument("--drawings-per-page", type=int, default=3000,
+                        help="Vector drawings on each drawing-heavy page (page 46 has thousands)")
+    parser.add_argument("--model", default="tiny",
+                        help="Stand-in embedding model: 'tiny' (random, offline) or a name/path")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction workers (default: EXTRACTION_WORKERS)")
+    parser.add_argument("--output", default="data/benchmarks/ingestion.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare pages/s against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed pages/s drop per stage before it counts as a regression")
+    parser.add_argument("--keep-pdf", action="store_true", help="Reuse/keep the PDF under data/benchmarks/")
+    args = parser.parse_args()
+
+    counts = page_counts(args.pages, args.mix)
+    work_dir = tempfile.mkdtemp(prefix="ingestion_benchmark_")
+    pdf_dir = os.path.dirname(args.output) if args.keep_pdf else work_dir
+    pdf_path = os.path.join(pdf_dir, f"synthetic_{args.pages}p_{'-'.join(map(str, args.mix))}"
+                                     f"_{args.drawings_per_page}d.pdf")
+    try:
+        print("=" * 80)
+        print(f"INGESTION BENCHMARK: {args.pages} pages ({counts}), model {args.model}")
+        print("=" * 80)
+        if not os.path.exists(pdf_path):
+            os.makedirs(pdf_dir, exist_ok=True)
+            start = time.perf_counter()
+            build_synthetic_rulebook(pdf_path, drawings_per_page=args.drawings_per_page, **counts)
+            print(f"  Built {pdf_path} in {time.perf_counter() - start:.1f}s")
+
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {"pages": args.pages, "mix": "-".join(map(str, args.mix)), **counts,
+                       "drawings_per_page": args.drawings_per_page, "model": args.model,
+                       "workers": args.workers, "cpu_count": os.cpu_count(), "python": platform.python_version()},
+            **run_benchmark(pdf_path, args.model, work_dir, workers=args.workers)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    memory = (f", peak RSS {result['peak_rss_mb']:.0f} MB (workers {result['peak_rss_children_mb']:.0f} MB)"
+              if result["peak_rss_mb"] is not None else "")
+    print(f"\nTotal: {result['total_seconds']:.1f}s, {result['chunks']} chunks{memory}")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
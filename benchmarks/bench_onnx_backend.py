@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Parity and throughput check for the ONNX Runtime embedding backend.
+Embeds the chunks of a PDF with the PyTorch backend and the ONNX backend and reports:
+  - cosine agreement between the two vectors of every chunk
+  - top-k retrieval overlap for a set of rulebook questions
+  - ingest throughput (tokens/s) and query latency for both backends
+
+Usage:
+    python benchmarks/bench_onnx_backend.py [pdf_path] [--model NAME_OR_PATH] [--no-quantize] [--k 10]
+Without a PDF path the rulebook from src/config.py is used, or a synthetic one if it is missing.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from src.config import PDF_PATH, EMBEDDING_MODEL_NAME, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.onnx_embeddings import OnnxTokenBudgetEmbeddings
+from src.pdf_parser import extract_text_with_metadata
+from src.token_chunker import ModelTokenTextSplitter
+from benchmarks.synthetic_pdf import build_synthetic_rulebook
+
+QUERIES = [
+    "How many points is a punch worth in tanding?",
+    "What are the legal target areas?",
+    "When does the referee stop the match?",
+    "What equipment must a pesilat wear?",
+    "How is a winner decided if the score is tied?",
+    "What happens after a second warning?",
+    "How long does a round last?",
+    "Which techniques are prohibited?",
+]
+
+def time_call(func, *args):
+    """Return (result, elapsed seconds) for a single call."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def top_k(query_vectors: np.ndarray, chunk_vectors: np.ndarray, k: int):
+    """Indices of the k most similar chunks per query (vectors are normalised, so dot = cosine)."""
+    scores = query_vectors @ chunk_vectors.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+def run_benchmark(pdf_path: str, model_name: str, quantize: bool = True, k: int = 10):
+    huggingface_embeddings = HuggingFaceEmbeddings(model_name=model_name,
+                                                   model_kwargs={"device": "cpu", "trust_remote_code": True},
+                                                   encode_kwargs={"normalize_embeddings": True})
+    torch_backend = TokenBudgetEmbeddings(huggingface_embeddings)
+    (onnx_backend, load_time) = time_call(OnnxTokenBudgetEmbeddings, huggingface_embeddings, model_name, quantize)
+
+    pages = extract_text_with_metadata(pdf_path, ocr=False)
+    splitter = ModelTokenTextSplitter(torch_backend, chunk_size=TOKEN_CHUNK_SIZE, chunk_overlap=TOKEN_CHUNK_OVERLAP)
+    chunks = [chunk for page in pages for chunk in splitter.split_text(page["text"])]
+    token_total = sum(torch_backend.count_tokens(chunks))
+
+    results = {}
+    for name, backend in [("torch", torch_backend), ("onnx", onnx_backend)]:
+        vectors, ingest_time = time_call(backend.embed_documents, chunks)
+        query_vectors = []
+        query_start = time.perf_counter()
+        for query in QUERIES:
+            query_vectors.append(backend.embed_query(query))
+        query_time = (time.perf_counter() - query_start) / len(QUERIES)
+        results[name] = (np.array(vectors), np.array(query_vectors), ingest_time, query_time)
+
+    torch_vectors, torch_queries, torch_ingest, torch_query = results["torch"]
+    onnx_vectors, onnx_queries, onnx_ingest, onnx_query = results["onnx"]
+    cosines = np.sum(torch_vectors * onnx_vectors, axis=1)
+    k = min(k, len(chunks))
+    overlaps = [len(a & b) / k for a, b in zip(top_k(torch_queries, torch_vectors, k),
+                                               top_k(onnx_queries, onnx_vectors, k))]
+
+    print(f"{'='*80}")
+    print(f"ONNX BACKEND PARITY: {model_name} ({'int8' if quantize else 'fp32'})")
+    print(f"{'='*80}")
+    print(f"PDF: {pdf_path}")
+    print(f"Chunks: {len(chunks)} ({token_total} tokens), queries: {len(QUERIES)}")
+    print(f"ONNX model: {onnx_backend.model_path} (load/export {load_time:.1f}s)")
+    print(f"Cosine agreement: mean {cosines.mean():.5f}, min {cosines.min():.5f}")
+    print(f"Top-{k} retrieval overlap: mean {np.mean(overlaps):.1%}, min {np.min(overlaps):.1%}")
+    print(f"Ingest throughput: torch {token_total / torch_ingest:.0f} tokens/s, "
+          f"onnx {token_total / onnx_ingest:.0f} tokens/s ({torch_ingest / onnx_ingest:.2f}x)")
+    print(f"Query latency: torch {torch_query * 1000:.1f} ms, onnx {onnx_query * 1000:.1f} ms "
+          f"({torch_query / onnx_query:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the ONNX and PyTorch embedding backends")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to embed (default: the configured rulebook)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="Model name or local path")
+    parser.add_argument("--no-quantize", action="store_true", help="Compare against the fp32 ONNX model")
+    parser.add_argument("--k", type=int, default=10, help="Retrieval depth for the overlap check")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf_path or PDF_PATH
+    if not os.path.exists(pdf_path):
+        pdf_path = build_synthetic_rulebook(os.path.join(tempfile.mkdtemp(), "synthetic_rulebook.pdf"))
+        print(f"Rulebook not found, using a synthetic PDF: {pdf_path}")
+    run_benchmark(pdf_path, args.model, quantize=not args.no_quantize, k=args.k)
+
+if __name__ == "__main__":
+    main()
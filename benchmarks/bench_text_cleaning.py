@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for text cleaning.
+Compares the previous per-call re.sub loop against clean_text/clean_texts and checks
+that both produce identical output.
+
+Usage:
+    python benchmarks/bench_text_cleaning.py [pdf_path] [--pages N] [--repeat R]
+With a PDF path the raw page texts of that PDF are used, otherwise synthetic rulebook pages.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from src.config import BOILERPLATE_PATTERNS
+from src.text_processor import clean_text, clean_texts
+from benchmarks.synthetic_pdf import RULE_SENTENCE
+
+FOOTER = ("Copyright © 01 October 2022 Version 1 by International Pencak Silat Federation (PERSILAT). "
+          "All rights reserved.\nNo part of this material/publication may be reproduced or published "
+          "in any manner without the consent in writing.")
+
+def legacy_clean_text(text: str) -> str:
+    """The original implementation: one uncompiled re.sub per pattern and per normalisation step."""
+    cleaned = text
+    for pattern in BOILERPLATE_PATTERNS:
+        cleaned = re.sub(pattern, "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
+    cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)
+    cleaned = re.sub(r'[ \t]+', ' ', cleaned)
+    return cleaned.strip()
+
+def synthetic_page_texts(pages: int):
+    """Rule-like page texts with extracted-PDF noise: footers, ragged spacing and blank lines."""
+    texts = []
+    for page_number in range(1, pages + 1):
+        lines = [RULE_SENTENCE.format(page=page_number).strip() for _ in range(30)]
+        lines[5] = "  " + lines[5].replace(", ", ",   ")
+        lines[12] = lines[12] + "\t"
+        if page_number % 25 == 0:
+            lines.insert(0, "Table of Contents")
+        texts.append("\n".join(lines) + "\n\n \n" + FOOTER)
+    return texts
+
+def pdf_page_texts(pdf_path: str, pages: int):
+    """Raw text of the first `pages` pages of a PDF."""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(min(pages, len(doc)))]
+
+def best_of(func, repeat: int) -> float:
+    """Fastest wall time of `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_benchmark(texts, repeat: int = 5):
+    """Time both implementations over the same texts and report the speed-up."""
+    legacy_time = best_of(lambda: [legacy_clean_text(text) for text in texts], repeat)
+    single_time = best_of(lambda: [clean_text(text) for text in texts], repeat)
+    batch_time = best_of(lambda: clean_texts(texts), repeat)
+    mismatches = [i for i, text in enumerate(texts) if legacy_clean_text(text) != clean_text(text)]
+
+    total_chars = sum(len(text) for text in texts)
+    print(f"{'='*80}")
+    print("TEXT CLEANING BENCHMARK")
+    print(f"{'='*80}")
+    print(f"Pages: {len(texts)} ({total_chars / len(texts):.0f} chars/page), best of {repeat}")
+    print(f"legacy loop:  {legacy_time:.4f}s ({legacy_time / len(texts) * 1e6:.1f} us/page)")
+    print(f"clean_text:   {single_time:.4f}s ({single_time / len(texts) * 1e6:.1f} us/page)")
+    print(f"clean_texts:  {batch_time:.4f}s ({batch_time / len(texts) * 1e6:.1f} us/page)")
+    print(f"Speed-up: {legacy_time / batch_time if batch_time else float('inf'):.1f}x")
+    print(f"Output mismatches: {len(mismatches)} {mismatches[:10]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text cleaning")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to take page texts from (default: synthetic pages)")
+    parser.add_argument("--pages", type=int, default=1000, help="Number of pages to clean")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation")
+    args = parser.parse_args()
+
+    texts = pdf_page_texts(args.pdf_path, args.pages) if args.pdf_path else synthetic_page_texts(args.pages)
+    run_benchmark(texts, repeat=args.repeat)
+
+if __name__ == "__main__":
+    main()
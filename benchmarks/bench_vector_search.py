@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Chroma (HNSW) against the exact NumPy vector store, on a synthetic collection of
+normalised vectors shaped like the rulebook's (a few thousand chunks, clustered by topic).
+Reports for both backends:
+  - cold start: opening the store in a fresh process and answering the first query
+  - single-query latency (p50/p95) and batched throughput (queries/s)
+  - recall@k of Chroma's approximate search against the exact top k
+
+Usage:
+    python benchmarks/bench_vector_search.py [--chunks 3000] [--dimensions 1024] [--queries 200]
+                                             [--k 10] [--batch 32] [--output data/benchmarks/vector_search.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+COLLECTION_NAME = "vector_search_benchmark"
+
+def synthetic_vectors(count: int, dimensions: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around `topics` random centres, like chunks about a few subjects."""
+    centres = rng.normal(size=(topics, dimensions))
+    vectors = centres[rng.integers(topics, size=count)] + rng.normal(scale=1.5, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def open_store(backend: str, work_dir: str):
+    if backend == "numpy":
+        from src.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(os.path.join(work_dir, "numpy_store"))
+    from langchain_community.vectorstores import Chroma
+    return Chroma(collection_name=COLLECTION_NAME, persist_directory=os.path.join(work_dir, "chroma_db"))
+
+def query_ids(store, query_vectors: np.ndarray, k: int):
+    results = store._collection.query(query_embeddings=query_vectors.tolist(), n_results=k, include=[])
+    return results["ids"]
+
+def cold_start(backend: str, work_dir: str, query_vector: np.ndarray, k: int) -> float:
+    """Seconds to open the store and answer one query, run in a fresh process."""
+    start = time.perf_counter()
+    store = open_store(backend, work_dir)
+    query_ids(store, query_vector[None, :], k)
+    return time.perf_counter() - start
+
+def percentile_ms(seconds, q: float) -> float:
+    return round(float(np.percentile(seconds, q)) * 1000, 3)
+
+def run_benchmark(chunks: int, dimensions: int, queries: int, k: int, batch: int, work_dir: str) -> Dict[str, Any]:
+    from src.numpy_store import export_numpy_store
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_vectors(chunks, dimensions, topics=max(1, chunks // 100), rng=rng)
+    # Questions land near stored chunks, as real questions land near the passage answering them
+    query_vectors = vectors[rng.integers(chunks, size=queries)] + rng.normal(scale=0.02, size=(queries, dimensions))
+    query_vectors = (query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    chroma = open_store("chroma", work_dir)
+    ids = [f"chunk-{i}" for i in range(chunks)]
+    start = time.perf_counter()
+    step = chroma._client.get_max_batch_size()
+    for offset in range(0, chunks, step):
+        chroma._collection.upsert(ids=ids[offset:offset + step], embeddings=vectors[offset:offset + step].tolist(),
+                                  documents=[f"chunk {i}" for i in range(offset, min(offset + step, chunks))],
+                                  metadatas=[{"page_number": i} for i in range(offset, min(offset + step, chunks))])
+    chroma_build = time.perf_counter() - start
+    start = time.perf_counter()
+    numpy_store = export_numpy_store(chroma, None, open_store("numpy", work_dir))
+    numpy_build = time.perf_counter() - start
+    stores = {"chroma": chroma, "numpy": numpy_store}
+
+    result: Dict[str, Any] = {"build_seconds": {"chroma": round(chroma_build, 3), "numpy_export": round(numpy_build, 3)}}
+    exact = None
+    context = multiprocessing.get_context("spawn")
+    for name, store in stores.items():
+        with context.Pool(1) as pool:
+            cold = pool.apply(cold_start, (name, work_dir, query_vectors[0], k))
+
+        latencies, found = [], []
+        for query_vector in query_vectors:
+            start = time.perf_counter()
+            found.extend(query_ids(store, query_vector[None, :], k))
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, queries, batch):
+            query_ids(store, query_vectors[offset:offset + batch], k)
+        batch_seconds = time.perf_counter() - start
+
+        if name == "numpy":
+            exact = found
+        result[name] = {"cold_start_seconds": round(cold, 3), "p50_ms": percentile_ms(latencies, 50),
+                        "p95_ms": percentile_ms(latencies, 95),
+                        "batched_queries_per_second": round(queries / batch_seconds, 1), "found": found}
+
+    for name in stores:
+        found = result[name].pop("found")
+        result[name][f"recall_at_{k}"] = round(float(np.mean([len(set(a) & set(b)) / k
+                                                              for a, b in zip(found, exact)])), 4)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Chroma and the exact NumPy vector store")
+    parser.add_argument("--chunks", type=int, default=3000, help="Vectors in the synthetic collection")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Embedding size (Qwen3-Embedding-0.6B: 1024)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to time and score")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch", type=int, default=32, help="Queries per batched search")
+    parser.add_argument("--output", default="data/benchmarks/vector_search.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="vector_search_benchmark_")
+    try:
+        print("=" * 80)
+        print(f"VECTOR SEARCH BENCHMARK: {args.chunks} chunks x {args.dimensions} dims, "
+              f"{args.queries} queries, k={args.k}")
+        print("=" * 80)
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {"chunks": args.chunks, "dimensions": args.dimensions, "queries": args.queries, "k": args.k,
+                       "batch": args.batch, "cpu_count": os.cpu_count(), "python": platform.python_version()},
+            **run_benchmark(args.chunks, args.dimensions, args.queries, args.k, args.batch, work_dir)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'backend':<8} {'cold start':>11} {'p50':>9} {'p95':>9} {'batched':>12} {'recall@' + str(args.k):>10}")
+    for name in ("chroma", "numpy"):
+        stats = result[name]
+        print(f"{name:<8} {stats['cold_start_seconds']:>10.2f}s {stats['p50_ms']:>7.2f}ms {stats['p95_ms']:>7.2f}ms "
+              f"{stats['batched_queries_per_second']:>8.0f} q/s {stats[f'recall_at_{args.k}']:>10.1%}")
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Stand-in embedding model for benchmarks and tests.
+Builds a small, randomly initialised BERT saved as a SentenceTransformer, so the
+embedding path runs against a real tokenizer and forward pass without downloads.
+"""
+
+import os
+
+WORDS = ("the pesilat referee scores must salute article page rule bow twice arena technique "
+         "lands cleanly on legal target area and confirms it during tanding").split()
+CHARACTERS = list("abcdefghijklmnopqrstuvwxyz0123456789.,:;()-")
+
+def build_tiny_sentence_transformer(model_dir: str, hidden_size: int = 32, num_layers: int = 2,
+                                    max_seq_length: int = 64) -> str:
+    """Write the model under model_dir and return the path of the SentenceTransformer directory."""
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    os.makedirs(model_dir, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    vocab += [token for token in dict.fromkeys(WORDS + CHARACTERS) if token not in vocab]
+    vocab += ["##" + character for character in "abcdefghijklmnopqrstuvwxyz0123456789"]
+    vocab_path = os.path.join(model_dir, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=hidden_size, num_hidden_layers=num_layers,
+                        num_attention_heads=2, intermediate_size=hidden_size * 2,
+                        max_position_embeddings=max(128, max_seq_length))
+    transformer_dir = os.path.join(model_dir, "transformer")
+    BertModel(config).save_pretrained(transformer_dir)
+    BertTokenizerFast(vocab_path).save_pretrained(transformer_dir)
+
+    transformer = models.Transformer(transformer_dir, max_seq_length=max_seq_length)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), "mean")
+    sentence_transformer_dir = os.path.join(model_dir, "sentence_transformer")
+    SentenceTransformer(modules=[transformer, pooling], device="cpu").save(sentence_transformer_dir)
+    return sentence_transformer_dir
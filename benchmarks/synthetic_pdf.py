@@ -0,0 +1,91 @@
+"""
+Synthetic rulebook PDFs for benchmarks.
+Builds documents that mimic the page mix of the Silat rulebook using PyMuPDF.
+"""
+
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+
+RULE_SENTENCE = ("Article {page}: During Tanding, a pesilat scores when a technique lands cleanly "
+                 "on a legal target area and the referee confirms it. ")
+
+def add_text_page(doc: fitz.Document, page_number: int, sentences: int = 30):
+    """Add a text-only page of rule-like prose."""
+    page = doc.new_page()
+    text = RULE_SENTENCE.format(page=page_number) * sentences
+    page.insert_textbox(fitz.Rect(50, 50, 545, 790), text, fontsize=9)
+
+def add_drawing_page(doc: fitz.Document, drawings: int = 1200):
+    """Add a page made of vector paths only, like the scoring diagrams on pages 46-47."""
+    page = doc.new_page()
+    # One shape committed once gives a single content stream, as in real PDFs
+    shape = page.new_shape()
+    columns = 40
+    for i in range(drawings):
+        x = 40 + (i % columns) * 13
+        y = 40 + (i // columns) * 13 % 740
+        shape.draw_rect(fitz.Rect(x, y, x + 10, y + 10))
+        shape.finish(color=(0, 0, 0), fill=(0.9, 0.9, 0.9) if i % 2 else None)
+    shape.commit()
+
+TABLE_HEADER = ["Technique", "Target", "Points", "Notes"]
+TABLE_ROWS = [["Punch", "Torso", "1", "Clean contact"], ["Kick", "Torso", "2", "Clean contact"],
+              ["Sweep", "Legs", "3", "Opponent falls"], ["Lock", "Arm", "3", "Referee confirms"],
+              ["Warning", "-", "-5", "Second offence"]]
+
+def add_table_page(doc: fitz.Document, page_number: int, rows: int = 40):
+    """Add a scoring-table page: ruled grid lines with short text in every cell."""
+    page = doc.new_page()
+    page.insert_text((50, 40), f"Table {page_number}: Scoring reference", fontsize=11)
+    column_x = [50, 180, 310, 390, 545]
+    row_height = 18
+    top = 55
+    # Every rule is its own path, as exported tables usually are
+    shape = page.new_shape()
+    bottom = top + (rows + 1) * row_height
+    lines = [((column_x[0], top + row * row_height), (column_x[-1], top + row * row_height))
+             for row in range(rows + 2)]
+    lines += [((x, top), (x, bottom)) for x in column_x]
+    for start, end in lines:
+        shape.draw_line(start, end)
+        shape.finish(color=(0, 0, 0), width=0.5)
+    shape.commit()
+
+    for row in range(rows + 1):
+        cells = TABLE_HEADER if row == 0 else TABLE_ROWS[(row + page_number) % len(TABLE_ROWS)]
+        for x, cell in zip(column_x, cells):
+            page.insert_text((x + 4, top + row * row_height + 13), cell, fontsize=9)
+
+def _page_schedule(counts: Dict[str, int]) -> List[str]:
+    """Spreads each page kind evenly through the document (smooth weighted round-robin)."""
+    total = sum(counts.values())
+    current = {kind: 0 for kind in counts}
+    schedule = []
+    for _ in range(total):
+        for kind, count in counts.items():
+            current[kind] += count
+        kind = max(current, key=current.get)
+        current[kind] -= total
+        schedule.append(kind)
+    return schedule
+
+def build_synthetic_rulebook(pdf_path: str, text_pages: int = 40, drawing_pages: int = 10,
+                             drawings_per_page: int = 1200, table_pages: int = 0) -> str:
+    """
+    Write a synthetic rulebook with text pages, drawing-heavy pages and table pages
+    spread evenly through the document. Returns the path.
+    """
+    doc = fitz.open()
+    schedule = _page_schedule({"text": text_pages, "drawing": drawing_pages, "table": table_pages})
+    for page_index, kind in enumerate(schedule):
+        if kind == "text":
+            add_text_page(doc, page_index + 1)
+        elif kind == "table":
+            add_table_page(doc, page_index + 1)
+        else:
+            add_drawing_page(doc, drawings_per_page)
+
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
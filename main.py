@@ -6,72 +6,149 @@ Runs the complete PDF ingestion pipeline from extraction to vector storage.
 
 import sys
 import os
+import argparse
 from datetime import datetime
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.pdf_parser import extract_text_with_metadata
-from src.data_processor import process_and_store_data
-from src.pipeline_utils import display_page_samples, generate_summary_stats, print_summary_stats
-from src.config import PDF_PATH
+from src.ingestion import resolve_pdf_paths, ingest_documents
+from src.pipeline_utils import print_summary_stats
+from src.page_selection import parse_page_spec
+from src.config import PDF_PATH, INGEST_MAX_CONCURRENT_DOCUMENTS, PACK_PAGES, DEDUP_NEAR_DUPLICATES
 
-def main():
+def page_spec_arg(value: str) -> str:
+    """argparse type for --pages: validates the spec and keeps it as a string."""
+    try:
+        parse_page_spec(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options for the ingestion pipeline."""
+    parser = argparse.ArgumentParser(description="Silat RAG System - PDF ingestion pipeline")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[PDF_PATH],
+        help="PDF files, directories of PDFs or glob patterns to ingest (default: the rulebook in src/config.py)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream pages through chunking, embedding and storage in bounded batches "
+             "instead of holding the whole document in memory"
+    )
+    parser.add_argument(
+        "--max-concurrent-documents",
+        type=int,
+        default=INGEST_MAX_CONCURRENT_DOCUMENTS,
+        help="How many documents to ingest at the same time"
+    )
+    parser.add_argument(
+        "--pages",
+        type=page_spec_arg,
+        default=None,
+        help="Only ingest these pages, e.g. '200-260' or '200-260,!230' ('300-' runs to the end). "
+             "PAGES_TO_SKIP and DOCUMENT_PAGE_RULES in src/config.py still apply"
+    )
+    parser.add_argument(
+        "--pack-pages",
+        action="store_true",
+        default=PACK_PAGES,
+        help="Pack consecutive pages into shared chunks up to the chunk size; chunks record "
+             "the page span they cover"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        default=DEDUP_NEAR_DUPLICATES,
+        help="Store near-duplicate chunks (e.g. visual placeholders) once, listing every page they cover"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run of the same files and settings from its journal "
+             "instead of starting over"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Run the complete PDF ingestion pipeline."""
+    args = parse_args(argv)
+    try:
+        pdf_paths = resolve_pdf_paths(args.inputs)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return
+
     print("="*80)
     print("SILAT RAG SYSTEM - PDF INGESTION PIPELINE")
     print("="*80)
     print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"PDF file: {PDF_PATH}")
-    
-    # Check if PDF exists
-    if not os.path.exists(PDF_PATH):
-        print(f"ERROR: PDF file not found at {PDF_PATH}")
+    print(f"PDF files: {len(pdf_paths)}")
+    for pdf_path in pdf_paths:
+        print(f"  - {pdf_path}")
+    print(f"Mode: {'streaming' if args.stream else 'batch'}")
+    if args.pages:
+        print(f"Pages: {args.pages}")
+    if args.pack_pages:
+        print("Page packing: on")
+    if args.dedup:
+        print("Near-duplicate collapsing: on")
+    if args.resume:
+        print("Resume: on")
+
+    # Check that every PDF exists
+    missing = [pdf_path for pdf_path in pdf_paths if not os.path.exists(pdf_path)]
+    if not pdf_paths or missing:
+        for pdf_path in missing or args.inputs:
+            print(f"ERROR: PDF file not found at {pdf_path}")
         print("Please ensure the PDF is in the correct location.")
         return
-    
+
     try:
-        # Phase 1: PDF Extraction & Content Analysis
+        # Phases 1 and 2: extraction, chunking, embedding and storage, per document
         print("\n" + "="*80)
-        print("PHASE 1: PDF EXTRACTION & CONTENT ANALYSIS")
+        print("PHASE 1+2: PDF EXTRACTION, EMBEDDING & VECTOR STORAGE")
         print("="*80)
-        
-        extracted_data = extract_text_with_metadata(PDF_PATH)
-        
-        if not extracted_data:
-            print("WARNING: No data was extracted from the PDF. Halting pipeline.")
-            return
-            
-        print(f"\nPHASE 1 COMPLETE: Extracted and analyzed {len(extracted_data)} pages.")
-        
-        # Phase 2: Data Processing & Vector Storage
-        print("\n" + "="*80)
-        print("PHASE 2: DATA PROCESSING & VECTOR STORAGE")
-        print("="*80)
-        
-        process_and_store_data(extracted_data)
-        
-        print(f"\nPHASE 2 COMPLETE: Data chunked, embedded, and stored in ChromaDB.")
+
+        manifests = ingest_documents(pdf_paths, stream=args.stream,
+                                     max_concurrent=args.max_concurrent_documents,
+                                     page_spec=args.pages, pack_pages=args.pack_pages,
+                                     resume=args.resume, dedup=args.dedup)
 
         # Phase 3: Post-Ingestion Analysis
         print("\n" + "="*80)
         print("PHASE 3: POST-INGESTION ANALYSIS")
         print("="*80)
-        
-        # Generate and display summary statistics
-        stats = generate_summary_stats(extracted_data)
-        print_summary_stats(stats)
-        
-        # Display page samples (first 7, middle 7, last 7)
-        display_page_samples(extracted_data, sample_size=3) # smaller sample for brevity
-        
+
+        for manifest in manifests:
+            print(f"\n{manifest['source_document']}: {manifest['status']}, "
+                  f"{manifest['chunk_count']} chunks (manifest: {manifest['manifest_path']})")
+            if manifest['status'] == "failed":
+                print(f"  ERROR: {manifest['error']}")
+            elif manifest['status'] == "completed":
+                print(f"  Time: {manifest['timings']['total_seconds']:.1f}s")
+                if manifest.get('dedup'):
+                    print(f"  Near-duplicates collapsed: {manifest['dedup']['collapsed']} chunks "
+                          f"({manifest['dedup']['text_bytes_saved'] / 1024:.1f} KB of text not stored)")
+                print_summary_stats(manifest['summary_stats'])
+
+        failed = [manifest for manifest in manifests if manifest['status'] != "completed"]
+        if len(failed) == len(manifests):
+            print("\nWARNING: No data was extracted and stored. Halting pipeline.")
+            return
+
         # Success message
         print("\n" + "="*80)
-        print("PIPELINE COMPLETED SUCCESSFULLY")
+        print("PIPELINE COMPLETED SUCCESSFULLY" if not failed else
+              f"PIPELINE COMPLETED WITH {len(failed)} DOCUMENT(S) NOT INGESTED")
         print("="*80)
         print(f"End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("The vector database is now ready for the RAG query pipeline.")
-        
+
     except Exception as e:
         print(f"\nERROR: Pipeline failed with exception:")
         print(f"  {type(e).__name__}: {e}")
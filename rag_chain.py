@@ -2,49 +2,84 @@ from langchain_community.vectorstores import Chroma
 from langchain_community.llms import Ollama
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
 from typing import Dict, Any
 
 from src.data_processor import get_embeddings_model
-from src.config import CHROMA_DB_DIR, CHROMA_COLLECTION_NAME, LLM_MODEL_NAME
+from src.page_packing import page_segments
+from src.dedup import covered_pages
+from src.retrieval import CachedRetriever, read_ingest_stamp
+from src.numpy_store import load_numpy_store
+from src.answer_cache import AnswerCache
+from src.config import (CHROMA_DB_DIR, CHROMA_COLLECTION_NAME, LLM_MODEL_NAME, RETRIEVAL_TOP_K,
+                        EMBEDDING_MODEL_NAME, ANSWER_CACHE_ENABLED, HYBRID_RETRIEVAL_ENABLED,
+                        METADATA_LOOKUP_ENABLED, VECTOR_BACKEND)
 
 def get_retriever():
     """
     Creates and returns a retriever from the persistent ChromaDB vector store.
+    Query embeddings and results of repeated questions are cached, with
+    METADATA_LOOKUP_ENABLED page and article references are looked up directly, and with
+    HYBRID_RETRIEVAL_ENABLED the vector search is fused with BM25 (see CachedRetriever).
+    With VECTOR_BACKEND = "numpy" the search is exact, over a memory-mapped copy of the
+    collection's vectors; ChromaDB is only opened when that copy is out of date.
     """
     print("Loading embedding model for retriever...")
     embedding_function = get_embeddings_model()
-    
-    print(f"Loading ChromaDB from: {CHROMA_DB_DIR}")
-    vector_store = Chroma(
-        collection_name=CHROMA_COLLECTION_NAME,
-        persist_directory=CHROMA_DB_DIR,
-        embedding_function=embedding_function
-    )
-    
-    print(f"ChromaDB loaded. Number of documents: {vector_store._collection.count()}")
-    return vector_store.as_retriever(search_kwargs={"k": 10})
+
+    def open_chroma():
+        print(f"Loading ChromaDB from: {CHROMA_DB_DIR}")
+        return Chroma(
+            collection_name=CHROMA_COLLECTION_NAME,
+            persist_directory=CHROMA_DB_DIR,
+            embedding_function=embedding_function
+        )
+
+    if VECTOR_BACKEND == "numpy":
+        vector_store = load_numpy_store(open_chroma, read_ingest_stamp())
+        print(f"NumPy store loaded. Number of documents: {vector_store.count()}")
+    else:
+        vector_store = open_chroma()
+        print(f"ChromaDB loaded. Number of documents: {vector_store._collection.count()}")
+    return CachedRetriever(vector_store, embedding_function, k=RETRIEVAL_TOP_K, hybrid=HYBRID_RETRIEVAL_ENABLED,
+                           metadata_lookup=METADATA_LOOKUP_ENABLED)
 
 def format_docs(docs: list) -> str:
     """
     Formats the retrieved documents into a single string for the prompt.
-    Includes page number and a note for visual content.
+    Includes source document, page number and a note for visual content. Chunks
+    packed across pages cite their page span and mark where each page begins, and
+    collapsed near-duplicates list the other pages they stand for.
     """
     formatted_docs = []
-    unique_pages = set()
+    unique_spans = set()
     for doc in docs:
         metadata = doc.metadata
-        page_num = metadata.get('page_number', 'N/A')
+        source_document = metadata.get('source_document')
+        page_start = metadata.get('page_start', metadata.get('page_number', 'N/A'))
+        page_end = metadata.get('page_end', page_start)
         
-        # Avoid duplicating the same page content if multiple chunks are retrieved
-        if page_num in unique_pages:
+        # Avoid duplicating the same page content if multiple chunks are retrieved;
+        # the same page number in another document is different content
+        if (source_document, page_start, page_end) in unique_spans:
             continue
-        unique_pages.add(page_num)
+        unique_spans.add((source_document, page_start, page_end))
 
-        content = doc.page_content
-        header = f"--- START OF DOCUMENT FROM PAGE {page_num} ---"
-        footer = f"--- END OF DOCUMENT FROM PAGE {page_num} ---\n"
+        segments = page_segments(metadata, doc.page_content)
+        if len(segments) > 1:
+            content = "\n\n".join(f"[Page {page_num}]\n{text}" for page_num, text in segments)
+        else:
+            content = doc.page_content
+        pages = f"PAGE {page_start}" if page_end == page_start else f"PAGES {page_start}-{page_end}"
+        if source_document:
+            pages = f"{source_document}, {pages}"
+        header = f"--- START OF DOCUMENT FROM {pages} ---"
+        footer = f"--- END OF DOCUMENT FROM {pages} ---\n"
         
+        also_on = [page for page in covered_pages(metadata) if not page_start <= page <= page_end]
+        if also_on:
+            content += f"\n\n[NOTE: Near-identical content also appears on pages {', '.join(map(str, also_on))}.]"
+
         if metadata.get('is_visual_reference', False):
             content += "\n\n[NOTE: This is a placeholder for a page with significant visual content like tables or diagrams. Refer to the original PDF page for full context.]"
 
@@ -52,9 +87,33 @@ def format_docs(docs: list) -> str:
         
     return "\n".join(formatted_docs)
 
+def cached_answer_chain(retriever: CachedRetriever, generate: Runnable, answer_cache: AnswerCache) -> Runnable:
+    """
+    Question -> answer chain that consults the semantic answer cache after retrieval and
+    only runs `generate` (prompt, LLM and parser) on a miss, storing its answer.
+    Page, article and section references the retriever answered from the metadata index
+    are not embedded for the cache either; they are matched by their normalised text and
+    retrieved pages. Keyword queries served by the lexical fast path are still embedded,
+    since paraphrases of them ("legal targets", "valid target areas") should share an answer.
+    """
+    def answer(question: str) -> str:
+        documents, path = retriever.retrieve(question)
+        query_vector = None if path == "metadata" else retriever.embed_query(question)
+        cached = answer_cache.lookup(query_vector, documents, question)
+        if cached is not None:
+            print(f"Answer cache hit (similarity {cached['similarity']:.3f}, earlier question: {cached['question']!r})")
+            return cached["answer"]
+        response = generate.invoke({"context": format_docs(documents), "question": question})
+        answer_cache.store(question, query_vector, documents, response)
+        return response
+
+    return RunnableLambda(answer)
+
 def create_rag_chain():
     """
     Creates the complete RAG chain for processing queries.
+    With ANSWER_CACHE_ENABLED, answers to near-identical questions over the same pages
+    are served from the answer cache instead of the LLM.
     """
     retriever = get_retriever()
     llm = Ollama(model=LLM_MODEL_NAME)
@@ -71,18 +130,21 @@ def create_rag_chain():
     INSTRUCTIONS:
     1.  Answer the question using only the information from the context above.
     2.  If the context does not contain the answer, state clearly "The provided context does not contain enough information to answer this question."
-    3.  Cite the page number(s) from which you derived your answer (e.g., "Source: Page 123"). If the information comes from multiple pages, cite them all.
+    3.  Cite the document and page number(s) from which you derived your answer, as named in the context headers (e.g., "Source: rules.pdf, Page 123"). If the information comes from multiple pages or documents, cite them all.
     4.  If the context includes a note about visual content (tables, diagrams), explicitly advise the user to refer to that page in the PDF for the visual information.
     5.  Do not make up information or hallucinate.
     """
     
     prompt = ChatPromptTemplate.from_template(prompt_template)
     
+    generate = prompt | llm | StrOutputParser()
+    if ANSWER_CACHE_ENABLED:
+        answer_cache = AnswerCache(namespace=f"{LLM_MODEL_NAME}|{EMBEDDING_MODEL_NAME}")
+        return cached_answer_chain(retriever, generate, answer_cache)
+
     rag_chain = (
         {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+        | generate
     )
     
     return rag_chain
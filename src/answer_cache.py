@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.config import (ANSWER_CACHE_PATH, ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_MIN_PAGE_OVERLAP,
+                        ANSWER_CACHE_TTL_SECONDS)
+from src.dedup import covered_pages
+from src.retrieval import read_ingest_stamp, normalize_query
+
+def retrieved_pages(documents: List[Document]) -> List[Tuple[str, int]]:
+    """Sorted (source document, page) pairs the retrieved chunks cover."""
+    pages = {(document.metadata.get("source_document", "unknown"), page)
+             for document in documents for page in covered_pages(document.metadata)}
+    return sorted(pages)
+
+def page_overlap(pages_a: List[Tuple[str, int]], pages_b: List[Tuple[str, int]]) -> float:
+    """Jaccard overlap of two page sets (1.0 when both are empty)."""
+    set_a, set_b = set(map(tuple, pages_a)), set(map(tuple, pages_b))
+    if not set_a and not set_b:
+        return 1.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+class AnswerCache:
+    """
+    Persistent cache of generated answers, looked up by question similarity.
+
+    An earlier answer is reused when its question embedding has a cosine similarity of
+    at least `similarity` to the new question's, and the pages retrieved for the new
+    question overlap the pages it was answered from by at least `min_page_overlap`
+    (Jaccard; 1.0 means the same page set). Since the answer was generated from those
+    pages, its citations still hold.
+
+    Queries the retriever answered from the metadata index without embedding them (page,
+    article and section references) are looked up without a vector instead: by their
+    normalised text and the exact set of retrieved pages.
+
+    Entries live in a JSON-lines file. They expire after `ttl_seconds`, and entries
+    written before the last ingest run (a different ingest stamp) or under another
+    `namespace` (LLM and embedding model) are never served and are pruned on load.
+    """
+
+    def __init__(self, path: Optional[str] = None, similarity: float = ANSWER_CACHE_SIMILARITY,
+                 min_page_overlap: float = ANSWER_CACHE_MIN_PAGE_OVERLAP,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, namespace: str = "",
+                 clock: Callable[[], float] = time.time):
+        self.path = path or ANSWER_CACHE_PATH
+        self.similarity = similarity
+        self.min_page_overlap = min_page_overlap
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Optional[List[Dict[str, Any]]] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._vector_entries: List[Dict[str, Any]] = []
+        self._stamp: Optional[str] = None
+
+    def _is_live(self, entry: Dict[str, Any], stamp: Optional[str]) -> bool:
+        return (entry.get("namespace") == self.namespace and entry.get("ingest_stamp") == stamp
+                and self.clock() - entry["created_at"] < self.ttl_seconds)
+
+    def _read_file(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Entries on disk and whether the file held anything unreadable (a torn last line)."""
+        entries = []
+        if not os.path.exists(self.path):
+            return entries, False
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    return entries, True
+        return entries, False
+
+    def _rewrite(self):
+        """Replaces the file with the live entries. Call with the lock held."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temporary_path, self.path)
+
+    def _refresh(self):
+        """
+        Loads the entries on first use and whenever the ingest stamp changed, dropping
+        expired and stale ones. Call with the lock held.
+        """
+        stamp = read_ingest_stamp()
+        if self._entries is not None and stamp == self._stamp:
+            return
+        self._stamp = stamp
+        entries, torn = self._read_file()
+        self._entries = [entry for entry in entries if self._is_live(entry, stamp)]
+        self._vectors = None
+        if torn or len(self._entries) < len(entries):
+            self._rewrite()
+
+    def _matrix(self) -> np.ndarray:
+        """Embeddings of the entries that have one, row i belonging to self._vector_entries[i]."""
+        if self._vectors is None:
+            self._vector_entries = [entry for entry in self._entries if entry.get("embedding") is not None]
+            self._vectors = (np.array([entry["embedding"] for entry in self._vector_entries], dtype=np.float32)
+                             if self._vector_entries else np.zeros((0, 0), dtype=np.float32))
+        return self._vectors
+
+    def lookup(self, query_vector: Optional[List[float]], documents: List[Document],
+               question: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        The most similar live entry that matches the retrieved pages, or None. Without a
+        query_vector, only an entry for the same normalised question and the same pages matches.
+        """
+        pages = retrieved_pages(documents)
+        with self._lock:
+            self._refresh()
+            best = None
+            if query_vector is None:
+                query_key = normalize_query(question)
+                for entry in reversed(self._entries):
+                    if (entry.get("query_key") == query_key and self._is_live(entry, self._stamp)
+                            and set(map(tuple, entry["pages"])) == set(pages)):
+                        best = {**entry, "similarity": 1.0}
+                        break
+            elif self._entries and len(self._matrix()):
+                similarities = self._matrix() @ _unit(query_vector)
+                for index in np.argsort(-similarities):
+                    if similarities[index] < self.similarity:
+                        break
+                    entry = self._vector_entries[index]
+                    if self._is_live(entry, self._stamp) and page_overlap(entry["pages"], pages) >= self.min_page_overlap:
+                        best = {**entry, "similarity": float(similarities[index])}
+                        break
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def store(self, question: str, query_vector: Optional[List[float]], documents: List[Document], answer: str):
+        """Appends an answer and the pages it was generated from (query_vector None: keyed lookups only)."""
+        entry = {
+            "question": question,
+            "query_key": normalize_query(question),
+            "answer": answer,
+            "pages": [list(page) for page in retrieved_pages(documents)],
+            "embedding": _unit(query_vector).tolist() if query_vector is not None else None,
+            "namespace": self.namespace,
+            "ingest_stamp": read_ingest_stamp(),
+            "created_at": self.clock()
+        }
+        with self._lock:
+            self._refresh()
+            if entry["ingest_stamp"] != self._stamp:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries.append(entry)
+            self._vectors = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries or []),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
@@ -1,6 +1,10 @@
 # PDF Processing Configuration
 PDF_PATH = "data/silat_rules_and_regulations_version_7.pdf"
 CHROMA_DB_DIR = "data/chroma_db"
+# Documents are stored (in chunk IDs and metadata, manifests and journals) under their path
+# relative to DOCUMENT_ROOT, e.g. "rules.pdf" or "v7/rules.pdf"; PDFs outside it under their
+# file name. A run given two PDFs that end up with the same name is rejected
+DOCUMENT_ROOT = "data"
 CHROMA_COLLECTION_NAME = "silat_rules"
 
 # Text Cleaning Parameters
@@ -17,13 +21,71 @@ BOILERPLATE_PATTERNS = [
 # Pages to explicitly skip (1-indexed page numbers)
 PAGES_TO_SKIP = list(range(1, 15))  # Cover page, title page, table of contents - adjust based on inspection
 # Removed MIN_TEXT_LENGTH_THRESHOLD - we want to keep image-based pages
+# Per-document page selection, keyed by document name (see DOCUMENT_ROOT), in the same syntax as main.py --pages:
+# comma-separated pages or ranges ("200-260", "300-" to the end), "!" to exclude ("!230").
+# Pages outside the selection are never loaded. Example: {"circular_2024.pdf": "1-20,!3"}
+DOCUMENT_PAGE_RULES = {}
+
+# Visual Content Analysis Parameters
+# Count vector drawings from the raw content stream instead of building page.get_drawings()
+FAST_VISUAL_ANALYSIS = True
+# Stop counting drawings once this many are found (None = exact count). Only "any or none"
+# affects the content type; the count itself only appears in descriptions and placeholders.
+DRAWING_COUNT_LIMIT = None
+
+# Page Cache Parameters
+# Per-page extraction output is cached on disk, keyed by the page's raw content and the
+# cleaning/analysis settings above, so reruns only redo pages that actually changed
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_DIR = "data/page_cache"
+
+# Parallel Extraction Parameters
+# Number of worker processes used to extract pages (0 = one per CPU core, 1 = serial)
+EXTRACTION_WORKERS = 0
+# Small PDFs are not worth the process start-up cost, so each worker gets at least this many pages
+EXTRACTION_MIN_PAGES_PER_WORKER = 25
+# Pages handed to a worker at a time; smaller shards keep workers balanced and memory bounded
+EXTRACTION_SHARD_PAGES = 50
+# How extraction and OCR worker processes are started. "spawn" is safe when documents are
+# ingested on several threads of a process that also runs torch and Chroma; with "fork"
+# a worker could inherit a lock another thread held at the time and deadlock
+WORKER_START_METHOD = "spawn"
+
+# Multi-Document Ingestion Parameters
+# Documents ingested at the same time when main.py is given a directory or glob
+INGEST_MAX_CONCURRENT_DOCUMENTS = 2
+# One JSON manifest per ingested document (page counts, timings, chunk IDs)
+MANIFEST_DIR = "data/manifests"
+# Per-document ingestion journals (completed stages and committed batches) used by --resume
+INGEST_JOURNAL_DIR = "data/journals"
+
+# Streaming Ingestion Parameters
+# Pages grouped into one split/embed/store batch when streaming
+INGEST_BATCH_PAGES = 32
+# Parsed batches allowed to wait for the embedder before parsing pauses
+INGEST_MAX_INFLIGHT_BATCHES = 2
+
+# Chunks embedded and written to Chroma per write; the next batch is embedded while the
+# current one is written. Capped at the Chroma client's max batch size
+CHROMA_WRITE_BATCH_SIZE = 256
 
 # OCR Configuration
+# Optional stage: OCR text is appended to the placeholders of visual-heavy pages.
+# It only runs when Tesseract is found at TESSERACT_PATH or on the PATH.
 OCR_ENABLED = True
 OCR_MIN_TEXT_THRESHOLD = 50  # Only attempt OCR if PDF text layer has less than this many characters
 OCR_CONFIDENCE_THRESHOLD = 30  # Minimum confidence for OCR text (0-100)
 # Tesseract path for Windows (adjust if installed elsewhere)
 TESSERACT_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+OCR_LANGUAGE = "eng"
+# Number of OCR worker processes, each running a single-threaded Tesseract (0 = one per CPU core)
+OCR_WORKERS = 0
+# OCR results are cached on disk by page image hash, so only new pages pay the OCR cost
+OCR_CACHE_DIR = "data/ocr_cache"
+# Pages are rasterised so the longer side is about this many pixels, within the DPI bounds below
+OCR_TARGET_LONG_SIDE_PX = 3000
+OCR_MIN_DPI = 150
+OCR_MAX_DPI = 400
 
 # --- Embedding Model and Chunking Strategy ---
 # Using a powerful Qwen embedding model with a large context window.
@@ -32,14 +94,96 @@ EMBEDDING_MODEL_NAME = "Qwen/Qwen3-Embedding-0.6B"
 
 # We now use token-based chunking to be more precise with the model's context window.
 # A larger chunk size is chosen to leverage the model's 32k token capacity.
+# Sizes are counted in the embedding model's own tokens (see src/token_chunker.py).
 TOKEN_CHUNK_SIZE = 4096
 TOKEN_CHUNK_OVERLAP = 512
 
+# Cross-page packing: consecutive text pages are concatenated up to TOKEN_CHUNK_SIZE tokens
+# before splitting, so short pages share a chunk and rules running over a page break stay
+# together. Chunks then record page_start/page_end and where each page begins (page_offsets)
+PACK_PAGES = False
+
+# Near-duplicate collapsing: chunks whose MinHash signatures (over character shingles)
+# estimate a Jaccard similarity of at least DEDUP_THRESHOLD are stored once, listing every
+# page they cover (covered_pages), e.g. the near-identical visual placeholders.
+# LSH splits the DEDUP_NUM_PERM hashes into DEDUP_BANDS bands to find candidates
+DEDUP_NEAR_DUPLICATES = False
+DEDUP_THRESHOLD = 0.9
+DEDUP_NUM_PERM = 128
+DEDUP_BANDS = 16
+DEDUP_SHINGLE_SIZE = 5
+
+# Chunks are embedded in length-sorted batches sized by a token budget (batch size x longest
+# chunk in the batch, i.e. tokens including padding) instead of a fixed item count, so short
+# visual placeholders are not padded up to the length of 4,096-token chunks
+EMBEDDING_BATCH_TOKENS = 16384
+EMBEDDING_MAX_BATCH_SIZE = 64
+
+# Chunk vectors are cached on disk by (model, normalisation, text hash), so re-ingests and
+# chunks repeated across rulebook versions are only embedded once
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_DIR = "data/embedding_cache"
+
+# Embedding backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime on the CPU).
+# The ONNX model is exported from the same checkpoint on first use and cached in
+# ONNX_MODEL_DIR; ONNX_QUANTIZE stores its weights as int8 (dynamic quantisation)
+EMBEDDING_BACKEND = "torch"
+ONNX_MODEL_DIR = "data/onnx_models"
+ONNX_QUANTIZE = True
+
+# Embedding worker processes on the CPU (0 = embed in the main process). Each worker loads
+# its own copy of the model (mind the RAM) and runs EMBEDDING_THREADS_PER_WORKER intra-op
+# threads (0 = CPU cores split evenly between workers). Ignored when a GPU is used
+EMBEDDING_WORKERS = 0
+EMBEDDING_THREADS_PER_WORKER = 0
+
 # The old character-based chunking parameters are no longer used.
 # CHUNK_SIZE = 1000
 # CHUNK_OVERLAP = 200
 
 # --- RAG Pipeline Configuration ---
+# Chunks retrieved per question
+RETRIEVAL_TOP_K = 10
+# Per-process LRU caches of the retriever: normalised question -> query embedding and
+# -> retrieved chunk IDs. Both are dropped when an ingest run changes the collection,
+# which it records by replacing the stamp file at INGEST_STAMP_PATH
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+RETRIEVAL_RESULT_CACHE_SIZE = 1024
+INGEST_STAMP_PATH = "data/chroma_db/ingest_stamp"
+# Hybrid retrieval: a BM25 inverted index over the stored chunks (LEXICAL_INDEX_PATH) is
+# rebuilt after every ingest and its ranking is fused with the vector ranking by reciprocal
+# rank fusion (score = sum of 1 / (RRF_K + rank)), taking HYBRID_CANDIDATES chunks from each.
+# Keyword lookups of at most LEXICAL_FAST_PATH_MAX_TERMS words ("Article 12", "Tanding")
+# are answered from the lexical index alone, without embedding the query
+HYBRID_RETRIEVAL_ENABLED = True
+LEXICAL_INDEX_PATH = "data/chroma_db/lexical_index.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+HYBRID_CANDIDATES = 30
+LEXICAL_FAST_PATH_MAX_TERMS = 3
+# Page/article lookups: an index from page number, article and section headings and
+# content_type to chunk IDs (METADATA_INDEX_PATH), rebuilt after every ingest. Queries
+# naming "page 46" or "Article 7" are answered from it before any embedding or vector search
+METADATA_LOOKUP_ENABLED = True
+METADATA_INDEX_PATH = "data/chroma_db/metadata_index.json"
+# Vector search backend of the retriever: "chroma" (its approximate HNSW index) or "numpy"
+# (exact search over a memory-mapped copy of the normalised vectors in NUMPY_STORE_DIR,
+# exported from the Chroma collection after every ingest). Chroma stays the store ingest writes to
+VECTOR_BACKEND = "chroma"
+NUMPY_STORE_DIR = "data/chroma_db/numpy_store"
+
 # The local LLM to use for generating answers.
 # Make sure you have pulled this model with "ollama pull <model_name>"
 LLM_MODEL_NAME = "llama3"
+
+# Semantic answer cache: an earlier answer is returned without calling the LLM when its
+# question embedding has a cosine similarity of at least ANSWER_CACHE_SIMILARITY to the new
+# question's and the retrieved pages overlap the pages it was answered from by at least
+# ANSWER_CACHE_MIN_PAGE_OVERLAP (Jaccard; 1.0 = the same page set). Entries expire after
+# ANSWER_CACHE_TTL_SECONDS and whenever the collection is re-ingested
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_PATH = "data/answer_cache.jsonl"
+ANSWER_CACHE_SIMILARITY = 0.92
+ANSWER_CACHE_MIN_PAGE_OVERLAP = 1.0
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 3600
@@ -1,18 +1,26 @@
+import re
 import fitz
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def analyze_page_content(page: fitz.Page, text_content: str) -> Dict[str, Any]:
+# Path-painting operators: each one paints a path that get_drawings() reports as one drawing
+PAINT_OPERATORS = frozenset({b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*"})
+
+# Content-stream tokens that can contain operator-like bytes are matched first so they are skipped:
+# literal strings (one level of nested parentheses), hex strings, names, comments and inline image data.
+_CONTENT_TOKEN_RE = re.compile(
+    rb"\((?:[^()\\]|\\.|\((?:[^()\\]|\\.)*\))*\)"
+    rb"|<[0-9A-Fa-f\s]*>"
+    rb"|/[^\s/\[\]()<>{}%]*"
+    rb"|%[^\r\n]*"
+    rb"|\bID\s.*?\sEI\b"
+    rb"|[A-Za-z'\"*]+",
+    re.DOTALL
+)
+
+def _classify_content(text_length: int, image_count: int, drawing_count: int) -> Dict[str, Any]:
     """
-    Analyze a page to determine what type of content it contains.
-    Returns metadata about the page content type.
+    Determine the content type of a page from its text length and visual element counts.
     """
-    text_length = len(text_content.strip())
-    images = page.get_images(full=True)
-    drawings = page.get_drawings()
-    
-    # Count visual elements
-    image_count = len(images)
-    drawing_count = len(drawings)
     has_visual_elements = image_count > 0 or drawing_count > 0
     
     # Determine content type based on text-to-visual ratio
@@ -49,6 +57,51 @@ def analyze_page_content(page: fitz.Page, text_content: str) -> Dict[str, Any]:
         "has_visual_elements": has_visual_elements
     }
 
+def analyze_page_content(page: fitz.Page, text_content: str) -> Dict[str, Any]:
+    """
+    Analyze a page to determine what type of content it contains.
+    Returns metadata about the page content type.
+    """
+    text_length = len(text_content.strip())
+    images = page.get_images(full=True)
+    drawings = page.get_drawings()
+    
+    # Count visual elements
+    return _classify_content(text_length, len(images), len(drawings))
+
+def count_vector_drawings(page: fitz.Page, limit: Optional[int] = None) -> int:
+    """
+    Estimate the number of vector drawings on a page by counting path-painting
+    operators in its content streams (including form XObjects it draws),
+    without building the drawing dicts that page.get_drawings() returns.
+    Stops counting once `limit` is reached, if given.
+    """
+    streams = [page.read_contents()]
+    for xref, *_ in page.get_xobjects():
+        stream = page.parent.xref_stream(xref)
+        if stream:
+            streams.append(stream)
+    
+    count = 0
+    for stream in streams:
+        for match in _CONTENT_TOKEN_RE.finditer(stream):
+            if match.group() in PAINT_OPERATORS:
+                count += 1
+                if limit is not None and count >= limit:
+                    return count
+    return count
+
+def analyze_page_content_fast(page: fitz.Page, text_content: str, drawing_limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Same classification as analyze_page_content, but counts drawings from the raw
+    content stream instead of materialising page.get_drawings().
+    """
+    text_length = len(text_content.strip())
+    image_count = len(page.get_images(full=True))
+    drawing_count = count_vector_drawings(page, limit=drawing_limit)
+    
+    return _classify_content(text_length, image_count, drawing_count)
+
 def create_visual_content_placeholder(page_number: int, content_analysis: Dict[str, Any]) -> str:
     """
     Creates a meaningful text placeholder for pages with primarily visual content.
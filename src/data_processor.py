@@ -1,21 +1,47 @@
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import torch
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Chroma
 from langchain.docstore.document import Document
-from langchain.text_splitter import TokenTextSplitter
-from typing import List, Dict, Any
+from langchain.text_splitter import TextSplitter, TokenTextSplitter
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set
 
 from src.config import (CHROMA_DB_DIR, CHROMA_COLLECTION_NAME, 
-                       EMBEDDING_MODEL_NAME, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP)
+                       EMBEDDING_MODEL_NAME, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP,
+                       INGEST_BATCH_PAGES, INGEST_MAX_INFLIGHT_BATCHES, CHROMA_WRITE_BATCH_SIZE,
+                       EMBEDDING_CACHE_ENABLED,
+                       EMBEDDING_BACKEND, ONNX_QUANTIZE, EMBEDDING_WORKERS, PACK_PAGES,
+                       DEDUP_NEAR_DUPLICATES)
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_pool import EmbeddingPool
+from src.onnx_embeddings import OnnxTokenBudgetEmbeddings
+from src.token_chunker import ModelTokenTextSplitter
+from src.page_packing import pack_page_documents, split_packed_documents, splitter_token_counter
+from src.dedup import NearDuplicateIndex, covered_pages, update_collapsed_metadata, print_dedup_report
+from src.retrieval import bump_ingest_stamp
 
-def get_embeddings_model() -> HuggingFaceEmbeddings:
+# IDs per Chroma existence lookup; Chroma's SQLite backend rejects lookups binding ~32k or more IDs
+CHROMA_BATCH_SIZE = 5000
+
+def create_token_budget_embeddings(model_name: str = EMBEDDING_MODEL_NAME, backend: str = EMBEDDING_BACKEND,
+                                   device: Optional[str] = None, quantize: bool = ONNX_QUANTIZE,
+                                   model_dir: Optional[str] = None, threads: int = 0) -> TokenBudgetEmbeddings:
     """
-    Initializes the HuggingFace embeddings model with specific configurations
-    for advanced models like Qwen.
+    Loads the embedding model behind a token-budget scheduler, on the PyTorch ("torch")
+    or ONNX Runtime ("onnx") backend. `threads` limits ONNX Runtime's intra-op threads
+    (0 = its default). Used by get_embeddings_model and by embedding pool workers.
     """
-    # Automatically use GPU if available, otherwise CPU
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    print(f"Using device: {device}")
+    if backend not in ("torch", "onnx"):
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}': expected 'torch' or 'onnx'")
+    # Automatically use GPU if available, otherwise CPU (ONNX Runtime always runs on the CPU)
+    if device is None:
+        device = 'cuda' if torch.cuda.is_available() and backend == "torch" else 'cpu'
 
     # Models like Qwen require trusting remote code to run their custom architecture.
     # Normalizing embeddings is a best practice for retrieval tasks.
@@ -24,23 +50,71 @@ def get_embeddings_model() -> HuggingFaceEmbeddings:
         'trust_remote_code': True 
     }
     encode_kwargs = {'normalize_embeddings': True}
-    
-    return HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
+
+    if backend == "onnx":
+        # PyTorch only loads the model if it still has to be exported
+        return OnnxTokenBudgetEmbeddings.from_model_name(model_name, model_kwargs, encode_kwargs, quantize=quantize,
+                                                         model_dir=model_dir, threads=threads)
+    huggingface_embeddings = HuggingFaceEmbeddings(
+        model_name=model_name,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
     )
+    return TokenBudgetEmbeddings(huggingface_embeddings)
 
-def get_token_text_splitter() -> TokenTextSplitter:
+def get_embeddings_model(num_workers: Optional[int] = None) -> Embeddings:
+    """
+    Initializes the HuggingFace embeddings model with specific configurations
+    for advanced models like Qwen. Documents are embedded through a token-budget
+    scheduler (EMBEDDING_BATCH_TOKENS) that batches chunks of similar length and,
+    with EMBEDDING_CACHE_ENABLED, a persistent cache so known texts are not re-embedded.
+    EMBEDDING_BACKEND selects PyTorch ("torch") or ONNX Runtime on the CPU ("onnx").
+    On the CPU, num_workers (default EMBEDDING_WORKERS) > 0 spreads document batches over
+    that many worker processes; bulk re-embedding jobs can ask for more than ingestion uses.
+    """
+    if num_workers is None:
+        num_workers = EMBEDDING_WORKERS
+    embeddings = create_token_budget_embeddings()
+    device = str(embeddings.embeddings.client.device)
+    print(f"Using device: {device}" + (" (ONNX Runtime)" if EMBEDDING_BACKEND == "onnx" else ""))
+
+    if num_workers > 0 and device == "cpu":
+        # Queries stay in this process; the workers load the (already exported) model themselves
+        embeddings.pool = EmbeddingPool(EMBEDDING_MODEL_NAME, num_workers, backend=EMBEDDING_BACKEND,
+                                        quantize=ONNX_QUANTIZE)
+
+    if EMBEDDING_CACHE_ENABLED:
+        # Quantised vectors differ slightly, so they get their own cache entries
+        cache_model_name = EMBEDDING_MODEL_NAME
+        if EMBEDDING_BACKEND == "onnx":
+            cache_model_name = f"{EMBEDDING_MODEL_NAME}|onnx{'-int8' if ONNX_QUANTIZE else ''}"
+        normalize = embeddings.embeddings.encode_kwargs['normalize_embeddings']
+        embeddings = CachedEmbeddings(embeddings, cache_model_name, normalize)
+    return embeddings
+
+def _find_token_budget_embeddings(embedding_model: Optional[Embeddings]) -> Optional[TokenBudgetEmbeddings]:
+    """Looks through wrappers (such as the embedding cache) for the token-budget embedder."""
+    while embedding_model is not None and not isinstance(embedding_model, TokenBudgetEmbeddings):
+        embedding_model = getattr(embedding_model, "embeddings", None)
+    return embedding_model
+
+def get_token_text_splitter(embedding_model: Optional[Embeddings] = None) -> TextSplitter:
     """
     Initializes a token-based text splitter, which is more precise for models
     with large context windows.
+    
+    Given the embedding model from get_embeddings_model(), chunks are counted in the
+    model's own tokens and their token IDs are reused for embedding. Otherwise tiktoken
+    tokens are used as an approximation.
     """
+    token_budget_embeddings = _find_token_budget_embeddings(embedding_model)
+    if token_budget_embeddings is not None:
+        return ModelTokenTextSplitter(
+            token_budget_embeddings,
+            chunk_size=TOKEN_CHUNK_SIZE,
+            chunk_overlap=TOKEN_CHUNK_OVERLAP
+        )
     return TokenTextSplitter(
-        # The model_name parameter is not directly supported in all versions,
-        # but the splitter will use the default tokenizer for tiktoken if not specified,
-        # which is a reasonable default. For more precise token counting,
-        # one might need to load the tokenizer explicitly.
         chunk_size=TOKEN_CHUNK_SIZE,
         chunk_overlap=TOKEN_CHUNK_OVERLAP
     )
@@ -54,30 +128,317 @@ def prepare_documents_for_chroma(extracted_pages_data: List[Dict[str, Any]]) ->
         ) for page_data in extracted_pages_data
     ]
 
-def process_and_store_data(extracted_pages_data: List[Dict[str, Any]]):
-    """Orchestrates chunking, embedding, and storage of documents in ChromaDB."""
-    print("Initializing components for data processing...")
-    embedding_model = get_embeddings_model()
-    text_splitter = get_token_text_splitter()
-
-    print(f"Preparing {len(extracted_pages_data)} pages into LangChain Documents...")
-    initial_docs = prepare_documents_for_chroma(extracted_pages_data)
+def split_pages(extracted_pages_data: List[Dict[str, Any]], text_splitter: TextSplitter,
+                pack_pages: bool = PACK_PAGES) -> List[Document]:
+    """
+    Splits page data into chunks. With pack_pages, consecutive pages are first packed up to
+    the splitter's chunk size, and each chunk records the page span it covers.
+    """
+    if not pack_pages:
+        return text_splitter.split_documents(prepare_documents_for_chroma(extracted_pages_data))
+    packed = pack_page_documents(extracted_pages_data, text_splitter._chunk_size,
+                                 splitter_token_counter(text_splitter))
+    print(f"  Packed {len(extracted_pages_data)} pages into {len(packed)} documents")
+    return split_packed_documents(text_splitter, packed)
 
-    print(f"Splitting {len(initial_docs)} documents into token-based chunks...")
-    chunks = text_splitter.split_documents(initial_docs)
-    print(f"  Split into {len(chunks)} chunks.")
-    
-    print("Initializing ChromaDB for vector storage...")
-    vector_store = Chroma(
+def get_vector_store(embedding_model: Embeddings) -> Chroma:
+    """Opens the persistent ChromaDB collection used by the ingestion and query pipelines."""
+    return Chroma(
         collection_name=CHROMA_COLLECTION_NAME,
         persist_directory=CHROMA_DB_DIR,
         embedding_function=embedding_model
     )
+
+def chunk_id(chunk: Document) -> str:
+    """
+    Deterministic chunk ID built from the source document, the page (or packed page span,
+    e.g. "p23-24") and a hash of the chunk text.
+    """
+    metadata = chunk.metadata
+    content_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:32]
+    pages = metadata.get('page_number')
+    if metadata.get('page_end', pages) != pages:
+        pages = f"{metadata['page_start']}-{metadata['page_end']}"
+    return f"{metadata.get('source_document', 'unknown')}:p{pages}:{content_hash}"
+
+def assign_chunk_ids(chunks: List[Document], seen: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Returns the deterministic ID of each chunk. Identical chunks on the same page get
+    an occurrence suffix ("#1", "#2", ...); pass the same `seen` dict across batches
+    of one document so the numbering continues.
+    """
+    seen = {} if seen is None else seen
+    ids = []
+    for chunk in chunks:
+        base_id = chunk_id(chunk)
+        occurrence = seen.get(base_id, 0)
+        seen[base_id] = occurrence + 1
+        ids.append(base_id if occurrence == 0 else f"{base_id}#{occurrence}")
+    return ids
+
+def write_chunks(vector_store: Chroma, chunks: List[Document], ids: List[str],
+                 batch_size: int = CHROMA_WRITE_BATCH_SIZE, journal=None) -> Dict[str, float]:
+    """
+    Embeds chunks with the store's embedding model and writes the precomputed vectors
+    straight to the Chroma collection, batch_size chunks at a time. A writer thread stores
+    each batch while the next one is embedded. Written batches are recorded in the
+    ingestion journal when one is given, and the ingest stamp is bumped so retrieval
+    caches are dropped. Prints and returns the timings.
+    """
+    if not chunks:
+        return {"chunks": 0, "batches": 0, "embed_seconds": 0.0, "write_seconds": 0.0, "seconds": 0.0}
+    collection = vector_store._collection
+    batch_size = max(1, min(batch_size, vector_store._client.get_max_batch_size()))
+    timings = {"embed_seconds": 0.0, "write_seconds": 0.0}
+
+    def write(batch_ids: List[str], batch_chunks: List[Document], vectors: List[List[float]]):
+        write_start = time.perf_counter()
+        collection.upsert(ids=batch_ids, embeddings=vectors,
+                          documents=[chunk.page_content for chunk in batch_chunks],
+                          metadatas=[chunk.metadata or None for chunk in batch_chunks])
+        timings["write_seconds"] += time.perf_counter() - write_start
+        if journal is not None:
+            journal.record("written", chunks=len(batch_ids))
+
+    start = time.perf_counter()
+    batches = 0
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer") as writer:
+        pending = None
+        for offset in range(0, len(chunks), batch_size):
+            batch_chunks = chunks[offset:offset + batch_size]
+            embed_start = time.perf_counter()
+            vectors = vector_store.embeddings.embed_documents([chunk.page_content for chunk in batch_chunks])
+            timings["embed_seconds"] += time.perf_counter() - embed_start
+            # One write in flight: wait for the previous batch before queueing this one
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(write, ids[offset:offset + batch_size], batch_chunks, vectors)
+            batches += 1
+        pending.result()
+    bump_ingest_stamp()
+
+    seconds = time.perf_counter() - start
+    write_seconds = timings["write_seconds"]
+    print(f"  Stored {len(chunks)} chunks in {batches} batches: "
+          f"{len(chunks) / write_seconds if write_seconds else 0:.0f} chunks/s insert, "
+          f"embedding {timings['embed_seconds']:.1f}s + writing {write_seconds:.1f}s in {seconds:.1f}s")
+    return {"chunks": len(chunks), "batches": batches, **timings, "seconds": seconds}
+
+def add_new_chunks(vector_store: Chroma, chunks: List[Document], ids: List[str], journal=None) -> int:
+    """Embeds and writes only the chunks whose IDs are not in the collection yet. Returns how many were added."""
+    if not chunks:
+        return 0
+    existing = set()
+    for id_batch in _batched(ids, CHROMA_BATCH_SIZE):
+        existing.update(vector_store.get(ids=id_batch, include=[])["ids"])
+    new = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing]
+    if new:
+        write_chunks(vector_store, [chunk for _, chunk in new], [chunk_id for chunk_id, _ in new], journal=journal)
+    return len(new)
+
+def delete_stale_chunks(vector_store: Chroma, source_documents: Set[str], keep_ids: Set[str],
+                        page_scope: Optional[Set[int]] = None) -> int:
+    """
+    Deletes chunks of the given documents that are not in keep_ids. With a page_scope,
+    only chunks lying entirely within those pages are considered, so a partial re-ingest
+    leaves other pages alone (a packed or collapsed chunk reaching outside the scope is kept).
+    Returns how many chunks were deleted.
+    """
+    stale_ids = []
+    for source_document in sorted(source_documents):
+        stored = vector_store.get(where={"source_document": source_document}, include=["metadatas"])
+        for stored_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            in_scope = page_scope is None or all(page in page_scope for page in covered_pages(metadata))
+            if in_scope and stored_id not in keep_ids:
+                stale_ids.append(stored_id)
+    if stale_ids:
+        for id_batch in _batched(stale_ids, CHROMA_BATCH_SIZE):
+            vector_store.delete(ids=id_batch)
+        bump_ingest_stamp()
+    return len(stale_ids)
+
+def _record_upsert(upsert_stats: Optional[Dict[str, int]], total: int, added: int, deleted: int):
+    """Prints the upsert outcome and copies it into upsert_stats when given."""
+    print(f"  Upsert: {added} new, {total - added} unchanged, {deleted} stale chunks deleted")
+    if upsert_stats is not None:
+        upsert_stats.update({"added": added, "unchanged": total - added, "deleted": deleted})
+
+def _finish_dedup(vector_store: Chroma, dedup_index: Optional[NearDuplicateIndex],
+                  dedup_stats: Optional[Dict[str, Any]]):
+    """Stores the final page lists of collapsed chunks and reports the savings."""
+    if dedup_index is None:
+        return
+    if update_collapsed_metadata(vector_store, dedup_index):
+        bump_ingest_stamp()
+    report = dedup_index.report()
+    print_dedup_report(report)
+    if dedup_stats is not None:
+        dedup_stats.update(report)
+
+def _batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Groups an iterable into lists of at most batch_size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _prefetch(items: Iterable[Any], max_inflight: int) -> Iterator[Any]:
+    """
+    Consumes an iterable in a background thread, keeping at most max_inflight items
+    queued ahead of the caller. Exceptions raised by the producer are re-raised here.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_inflight))
+    stop = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as exc:
+            put((done, exc))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join(timeout=1)
+
+def stream_and_store_data(pages: Iterable[Dict[str, Any]],
+                          batch_pages: int = INGEST_BATCH_PAGES,
+                          max_inflight: int = INGEST_MAX_INFLIGHT_BATCHES,
+                          embedding_model: Optional[Embeddings] = None,
+                          vector_store: Optional[Chroma] = None,
+                          page_scope: Optional[Set[int]] = None,
+                          upsert_stats: Optional[Dict[str, int]] = None,
+                          pack_pages: bool = PACK_PAGES,
+                          journal=None,
+                          dedup: bool = DEDUP_NEAR_DUPLICATES,
+                          dedup_stats: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Streams extracted pages through chunking, embedding, and storage in bounded batches.
+    Parsing keeps running in the background while earlier batches are embedded, and at
+    most max_inflight parsed batches wait in memory. With pack_pages, pages are packed
+    within each batch. With dedup, near-duplicates of any chunk seen earlier in the
+    stream are collapsed into it (see NearDuplicateIndex).
+    
+    With an ingestion journal, every stored batch is committed to it, and the chunks of
+    batches committed by an interrupted run count as part of the document; batch numbers
+    continue after the last committed one.
+    
+    Storage is an upsert: only chunks with new IDs are embedded and written, and once the
+    stream ends, stale chunks of the same documents (within page_scope, if given) are
+    deleted. Returns the IDs of the document's current chunks.
+    """
+    print("Initializing components for streaming data processing...")
+    if embedding_model is None:
+        embedding_model = get_embeddings_model()
+    text_splitter = get_token_text_splitter(embedding_model)
+    if vector_store is None:
+        vector_store = get_vector_store(embedding_model)
+
+    total_pages = 0
+    chunk_ids = list(journal.committed_chunk_ids) if journal is not None else []
+    added = 0
+    seen_ids = {}
+    # The journal's document is known even when every page was committed by an earlier run
+    source_documents = {journal.source_document} if journal is not None else set()
+    first_batch = journal.last_batch + 1 if journal is not None else 1
+    dedup_index = NearDuplicateIndex() if dedup else None
+    for batch_number, page_batch in enumerate(_prefetch(_batched(pages, batch_pages), max_inflight),
+                                              start=first_batch):
+        chunks = split_pages(page_batch, text_splitter, pack_pages)
+        batch_ids = assign_chunk_ids(chunks, seen_ids)
+        if dedup_index is not None:
+            chunks, batch_ids = dedup_index.collapse(chunks, batch_ids)
+        batch_added = add_new_chunks(vector_store, chunks, batch_ids, journal=journal)
+        if journal is not None:
+            journal.commit_batch(batch_number, [page["page_number"] for page in page_batch], batch_ids, batch_added)
+        chunk_ids.extend(batch_ids)
+        added += batch_added
+        source_documents.update(page.get("source_document", "unknown") for page in page_batch)
+
+        total_pages += len(page_batch)
+        print(f"  Batch {batch_number}: {len(chunks)} chunks from {len(page_batch)} pages, {batch_added} new "
+              f"({len(chunk_ids)} chunks / {total_pages} pages so far)")
+
+    _finish_dedup(vector_store, dedup_index, dedup_stats)
+    deleted = delete_stale_chunks(vector_store, source_documents, set(chunk_ids), page_scope)
+    _record_upsert(upsert_stats, len(chunk_ids), added, deleted)
+
+    # Chroma 0.4+ writes through to disk, so no explicit persist() is needed here
+    print(f"Successfully streamed {len(chunk_ids)} chunks from {total_pages} pages into ChromaDB.")
+    return chunk_ids
+
+def process_and_store_data(extracted_pages_data: List[Dict[str, Any]],
+                           embedding_model: Optional[Embeddings] = None,
+                           vector_store: Optional[Chroma] = None,
+                           page_scope: Optional[Set[int]] = None,
+                           upsert_stats: Optional[Dict[str, int]] = None,
+                           pack_pages: bool = PACK_PAGES,
+                           journal=None,
+                           dedup: bool = DEDUP_NEAR_DUPLICATES,
+                           dedup_stats: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Orchestrates chunking, embedding, and storage of documents in ChromaDB.
+    With pack_pages, consecutive pages are packed into shared chunks (see split_pages),
+    and with dedup, near-duplicate chunks are stored once (see NearDuplicateIndex).
+    With an ingestion journal, the chunking stage and every written batch are recorded.
+    
+    Chunks get deterministic IDs and are upserted: new chunks are embedded and added,
+    unchanged ones are left alone, and stale chunks of the same documents (within
+    page_scope, if given) are deleted. Returns the IDs of the document's current chunks.
+    """
+    print("Initializing components for data processing...")
+    if embedding_model is None:
+        embedding_model = get_embeddings_model()
+    text_splitter = get_token_text_splitter(embedding_model)
+
+    print(f"Splitting {len(extracted_pages_data)} pages into token-based chunks...")
+    chunks = split_pages(extracted_pages_data, text_splitter, pack_pages)
+    print(f"  Split into {len(chunks)} chunks.")
     
-    print(f"Adding {len(chunks)} chunks to ChromaDB. This may take some time...")
-    vector_store.add_documents(chunks)
+    if vector_store is None:
+        print("Initializing ChromaDB for vector storage...")
+        vector_store = get_vector_store(embedding_model)
     
-    print("Persisting the database to disk...")
-    vector_store.persist()
+    print(f"Upserting {len(chunks)} chunks into ChromaDB. This may take some time...")
+    chunk_ids = assign_chunk_ids(chunks)
+    dedup_index = NearDuplicateIndex() if dedup else None
+    if dedup_index is not None:
+        chunks, chunk_ids = dedup_index.collapse(chunks, chunk_ids)
+    if journal is not None:
+        journal.record("chunked", chunks=len(chunks))
+    added = add_new_chunks(vector_store, chunks, chunk_ids, journal=journal)
+    _finish_dedup(vector_store, dedup_index, dedup_stats)
+    source_documents = {page.get("source_document", "unknown") for page in extracted_pages_data}
+    deleted = delete_stale_chunks(vector_store, source_documents, set(chunk_ids), page_scope)
+    _record_upsert(upsert_stats, len(chunk_ids), added, deleted)
     
-    print(f"Successfully added {len(chunks)} chunks to ChromaDB.")
+    # Chroma 0.4+ writes through to disk, so no explicit persist() is needed here
+    print(f"Successfully stored {len(chunks)} chunks in ChromaDB.")
+    return chunk_ids
@@ -0,0 +1,166 @@
+import json
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+import mmh3
+import numpy as np
+from langchain.docstore.document import Document
+
+from src.config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE
+
+# Universal hashing (a * h + b) mod p over the 32-bit shingle hashes; a * h + b fits in 64 bits
+_MERSENNE_PRIME = (1 << 31) - 1
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_SIZE) -> List[str]:
+    """Distinct character shingles of the lowercased, whitespace-collapsed text."""
+    normalized = re.sub(r"\s+", " ", text.lower()).strip()
+    if len(normalized) <= size:
+        return [normalized]
+    return list({normalized[i:i + size] for i in range(len(normalized) - size + 1)})
+
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Fixed hash permutation coefficients, so signatures are comparable across runs."""
+    rng = np.random.RandomState(1)
+    a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signature(text: str, num_perm: int = DEDUP_NUM_PERM,
+                      shingle_size: int = DEDUP_SHINGLE_SIZE) -> np.ndarray:
+    """
+    MinHash signature of a text's character shingles: per permutation, the minimum of
+    (a * mmh3(shingle) + b) mod p. The share of equal positions in two signatures
+    estimates the Jaccard similarity of the shingle sets.
+    """
+    a, b = _permutations(num_perm)
+    hashes = np.array([mmh3.hash(shingle, signed=False) for shingle in shingles(text, shingle_size)],
+                      dtype=np.uint64)
+    return ((np.outer(hashes, a) + b) % _MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+def estimated_similarity(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+def covered_pages(metadata: Dict[str, Any]) -> List[int]:
+    """
+    Pages a chunk stands for: the covered_pages of a collapsed chunk, otherwise its
+    packed page span or just its page_number.
+    """
+    if "covered_pages" in metadata:
+        return json.loads(metadata["covered_pages"])
+    page_start = metadata.get("page_start", metadata.get("page_number"))
+    if page_start is None:
+        return []
+    return list(range(page_start, metadata.get("page_end", page_start) + 1))
+
+class NearDuplicateIndex:
+    """
+    Collapses near-duplicate chunks (visual placeholders, repeated boilerplate) into one
+    stored chunk. Signatures are split into `bands` LSH bands; chunks sharing a band
+    bucket are candidates, and a candidate whose estimated similarity reaches `threshold`
+    is collapsed into the first chunk of its group. That chunk is stored once and lists
+    every page of the group in its covered_pages metadata (a JSON list, since Chroma
+    metadata must be scalar).
+
+    Only chunks of the same source document and kind (text or visual placeholder) are
+    compared. The index keeps signatures, not texts, so one index can follow a whole
+    streamed document batch by batch.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = DEDUP_NUM_PERM,
+                 bands: int = DEDUP_BANDS, shingle_size: int = DEDUP_SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.buckets: Dict[Tuple, List[int]] = {}
+        self.signatures: List[np.ndarray] = []
+        self.representative_ids: List[str] = []
+        self.representative_metadata: List[Dict[str, Any]] = []
+        self.stats = {"chunks": 0, "kept": 0, "collapsed": 0, "text_bytes_saved": 0}
+
+    def _band_keys(self, signature: np.ndarray, group: Tuple) -> List[Tuple]:
+        return [(group, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def _find_representative(self, signature: np.ndarray, keys: List[Tuple]) -> Optional[int]:
+        """Most similar earlier representative at or above the threshold, if any."""
+        candidates = {index for key in keys for index in self.buckets.get(key, [])}
+        best, best_similarity = None, self.threshold
+        for index in sorted(candidates):
+            similarity = estimated_similarity(signature, self.signatures[index])
+            if similarity >= best_similarity:
+                best, best_similarity = index, similarity
+        return best
+
+    def collapse(self, chunks: List[Document], ids: List[str]) -> Tuple[List[Document], List[str]]:
+        """
+        Returns the chunks (and IDs) to store: chunks that are not near-duplicates of an
+        earlier chunk. A near-duplicate adds its pages to its representative's metadata,
+        which may belong to a chunk from an earlier call.
+        """
+        kept_chunks, kept_ids = [], []
+        for chunk, chunk_id in zip(chunks, ids):
+            self.stats["chunks"] += 1
+            metadata = chunk.metadata
+            group = (metadata.get("source_document", "unknown"), bool(metadata.get("is_visual_reference", False)))
+            signature = minhash_signature(chunk.page_content, self.num_perm, self.shingle_size)
+            keys = self._band_keys(signature, group)
+
+            representative = self._find_representative(signature, keys)
+            if representative is not None:
+                rep_metadata = self.representative_metadata[representative]
+                pages = sorted(set(covered_pages(rep_metadata)) | set(covered_pages(metadata)))
+                rep_metadata["covered_pages"] = json.dumps(pages)
+                rep_metadata["duplicate_count"] = rep_metadata.get("duplicate_count", 0) + 1
+                self.stats["collapsed"] += 1
+                self.stats["text_bytes_saved"] += len(chunk.page_content.encode("utf-8"))
+                continue
+
+            index = len(self.signatures)
+            self.signatures.append(signature)
+            self.representative_ids.append(chunk_id)
+            self.representative_metadata.append(metadata)
+            for key in keys:
+                self.buckets.setdefault(key, []).append(index)
+            self.stats["kept"] += 1
+            kept_chunks.append(chunk)
+            kept_ids.append(chunk_id)
+        return kept_chunks, kept_ids
+
+    def collapsed_representatives(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """IDs and current metadata of the stored chunks that absorbed near-duplicates."""
+        merged = [(chunk_id, metadata) for chunk_id, metadata
+                  in zip(self.representative_ids, self.representative_metadata) if "covered_pages" in metadata]
+        return [chunk_id for chunk_id, _ in merged], [metadata for _, metadata in merged]
+
+    def report(self) -> Dict[str, Any]:
+        """What collapsing saved: chunks (and so vectors) not stored, and their text bytes."""
+        groups = len(self.collapsed_representatives()[0])
+        chunks = self.stats["chunks"]
+        return {
+            **self.stats,
+            "groups": groups,
+            "vectors_saved": self.stats["collapsed"],
+            "saved_share": round(self.stats["collapsed"] / chunks, 4) if chunks else 0.0
+        }
+
+def update_collapsed_metadata(vector_store, index: NearDuplicateIndex) -> int:
+    """
+    Writes the final covered_pages of collapsed chunks to the collection. A representative
+    may have been stored before its later duplicates were seen, or by an earlier run.
+    Returns how many chunks were updated.
+    """
+    ids, metadatas = index.collapsed_representatives()
+    if ids:
+        vector_store._collection.update(ids=ids, metadatas=metadatas)
+    return len(ids)
+
+def print_dedup_report(report: Dict[str, Any]):
+    """Prints how many near-duplicates were collapsed and the space saved."""
+    print(f"  Near-duplicates: collapsed {report['collapsed']} of {report['chunks']} chunks "
+          f"({report['saved_share']:.1%}) into {report['groups']} stored chunks; "
+          f"{report['vectors_saved']} vectors and {report['text_bytes_saved'] / 1024:.1f} KB of text not stored")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import List, Dict, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.config import EMBEDDING_CACHE_DIR
+
+# Bump when the way vectors are produced changes without the model name changing
+EMBEDDING_CACHE_VERSION = 1
+
+DIGEST_SIZE = 32  # sha256
+
+def text_digest(text: str) -> bytes:
+    """Content address of a chunk text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent, content-addressed cache in front of an embedding model.
+
+    Each (model name, normalisation) pair gets its own directory holding two
+    append-only files: vectors.f32, a float32 matrix read through a memory map,
+    and keys.bin, the sha256 of the text of each row. Only texts that have never
+    been embedded reach the wrapped model. Query embeddings are not cached.
+    One process should write to a cache directory at a time; threads can share an instance.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, normalize: bool,
+                 cache_dir: Optional[str] = None):
+        self.embeddings = embeddings
+        namespace = hashlib.sha256(f"{EMBEDDING_CACHE_VERSION}|{model_name}|{normalize}".encode("utf-8")).hexdigest()
+        self.cache_dir = os.path.join(cache_dir or EMBEDDING_CACHE_DIR, namespace[:16])
+        self.model_name = model_name
+        self.normalize = normalize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._rows: Optional[Dict[bytes, int]] = None
+        self._row_count = 0
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, "vectors.f32")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.cache_dir, "keys.bin")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.cache_dir, "meta.json")
+
+    def _load(self):
+        """Reads the key file into memory on first use. Call with the lock held."""
+        if self._rows is not None:
+            return
+        self._rows = {}
+        # meta.json is written after the first rows, so without all three files the cache
+        # was never complete and the next append starts it over
+        if not all(os.path.exists(path) for path in (self._meta_path, self._keys_path, self._vectors_path)):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self._dim = json.load(f)["dim"]
+        with open(self._keys_path, "rb") as f:
+            keys = f.read()
+        # A row only counts once its vector and its key are both complete. Anything past
+        # that (an interrupted append) is cut off so later appends stay aligned.
+        self._row_count = min(len(keys) // DIGEST_SIZE, os.path.getsize(self._vectors_path) // (4 * self._dim))
+        os.truncate(self._keys_path, self._row_count * DIGEST_SIZE)
+        os.truncate(self._vectors_path, self._row_count * 4 * self._dim)
+        for row in range(self._row_count):
+            self._rows[keys[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE]] = row
+
+    def _matrix_view(self) -> np.memmap:
+        """Memory map over the stored vectors, reopened after appends. Call with the lock held."""
+        if self._matrix is None:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self._row_count, self._dim))
+        return self._matrix
+
+    def _append(self, digests: List[bytes], vectors: List[List[float]]):
+        """Appends new rows to the vector and key files. Call with the lock held."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        new_cache = self._dim is None
+        if new_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        elif matrix.shape[1] != self._dim:
+            raise ValueError(f"Embedding dimension changed from {self._dim} to {matrix.shape[1]} "
+                             f"for model {self.model_name}; clear {self.cache_dir}")
+
+        # Vectors first, keys second: a key never points at a missing vector.
+        # A new cache overwrites whatever an interrupted first write left behind.
+        mode = "wb" if new_cache else "ab"
+        with open(self._vectors_path, mode) as f:
+            f.write(matrix.tobytes())
+        with open(self._keys_path, mode) as f:
+            f.write(b"".join(digests))
+        if new_cache:
+            # Written last, so its presence means the data files exist
+            self._dim = matrix.shape[1]
+            temporary_meta = f"{self._meta_path}.{uuid.uuid4().hex}.tmp"
+            with open(temporary_meta, "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "normalize": self.normalize,
+                           "dim": self._dim, "version": EMBEDDING_CACHE_VERSION}, f)
+            os.replace(temporary_meta, self._meta_path)
+        for digest in digests:
+            self._rows[digest] = self._row_count
+            self._row_count += 1
+        self._matrix = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests = [text_digest(text) for text in texts]
+        with self._lock:
+            self._load()
+            # Each distinct unseen text is embedded once, even if it repeats within the call
+            missing = {digest: text for digest, text in zip(digests, texts) if digest not in self._rows}
+
+        if missing:
+            # Embedding runs outside the lock so concurrent documents can overlap
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            with self._lock:
+                fresh = [(digest, vector) for digest, vector in zip(missing, new_vectors) if digest not in self._rows]
+                if fresh:
+                    self._append([digest for digest, _ in fresh], [vector for _, vector in fresh])
+
+        with self._lock:
+            matrix = self._matrix_view() if texts else None
+            vectors = [matrix[self._rows[digest]].tolist() for digest in digests]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        print(f"  Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} embedded")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator, Optional
+
+from src.config import (EMBEDDING_WORKERS, EMBEDDING_THREADS_PER_WORKER, EMBEDDING_BACKEND,
+                        ONNX_QUANTIZE)
+
+# Per-process state for pool workers: the worker's own copy of the embedding model
+_worker_embeddings = None
+
+def _init_embedding_worker(model_name: str, backend: str, quantize: bool, model_dir: Optional[str],
+                           threads: int):
+    """Pool initializer: pins the thread count, then loads this worker's copy of the model."""
+    global _worker_embeddings
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    from src.data_processor import create_token_budget_embeddings
+    _worker_embeddings = create_token_budget_embeddings(model_name, backend, device="cpu", quantize=quantize,
+                                                        model_dir=model_dir, threads=threads)
+
+def _encode_batch_worker(batch_ids: List[List[int]]) -> List[List[float]]:
+    """Pool task: one forward pass over a planned batch of token IDs."""
+    return _worker_embeddings._encode_token_ids(batch_ids)
+
+class EmbeddingPool:
+    """
+    Worker processes that each hold a copy of the embedding model and run forward passes
+    on batches of token IDs. Tokenization and batch planning stay in the calling process
+    (see TokenBudgetEmbeddings), so only token IDs and vectors cross process boundaries.
+
+    Workers start on first use. Batches are queued to whichever worker is free and the
+    vectors come back in submission order.
+    """
+
+    def __init__(self, model_name: str, num_workers: int = EMBEDDING_WORKERS,
+                 threads_per_worker: int = EMBEDDING_THREADS_PER_WORKER, backend: str = EMBEDDING_BACKEND,
+                 quantize: bool = ONNX_QUANTIZE, model_dir: Optional[str] = None):
+        cores = os.cpu_count() or 1
+        self.model_name = model_name
+        self.num_workers = max(1, num_workers)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.num_workers)
+        self.backend = backend
+        self.quantize = quantize
+        self.model_dir = model_dir
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                if self.backend == "onnx":
+                    # Export here, once; workers starting together would each export the model
+                    from src.onnx_embeddings import export_missing_onnx_model
+                    export_missing_onnx_model(self.model_name, {"device": "cpu", "trust_remote_code": True},
+                                              self.quantize, self.model_dir)
+                print(f"  Starting {self.num_workers} embedding workers "
+                      f"({self.threads_per_worker} threads each, {self.backend})")
+                # Spawn rather than fork: forking a process that already runs torch threads can deadlock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_embedding_worker,
+                    initargs=(self.model_name, self.backend, self.quantize, self.model_dir,
+                              self.threads_per_worker)
+                )
+            return self._executor
+
+    def encode_batches(self, batches: Iterable[List[List[int]]]) -> Iterator[List[List[float]]]:
+        """Embeds batches of token IDs (without special tokens) across the workers, in order."""
+        return self._get_executor().map(_encode_batch_worker, batches)
+
+    def close(self):
+        """Stops the worker processes. The pool starts them again if it is used afterwards."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
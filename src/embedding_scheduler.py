@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import torch
+from langchain_core.embeddings import Embeddings
+
+from src.config import EMBEDDING_BATCH_TOKENS, EMBEDDING_MAX_BATCH_SIZE
+
+# Token IDs handed over by the chunker and not yet embedded; the oldest are dropped first
+# (e.g. chunks the embedding cache answered), and those texts are simply tokenized again
+MAX_PRETOKENIZED_TEXTS = 8192
+
+def plan_token_batches(token_counts: List[int], max_batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+                       max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE) -> List[List[int]]:
+    """
+    Groups text indices into batches of similar length.
+    Texts are taken longest first, and a batch grows while its padded size
+    (items x longest item) stays within max_batch_tokens. A text longer than the
+    budget gets a batch of its own.
+    """
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i], reverse=True)
+    batches = []
+    batch = []
+    for i in order:
+        # Sorted longest first, so the first item sets the padded length of the batch
+        padded_length = token_counts[batch[0]] if batch else token_counts[i]
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * padded_length > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class TokenBudgetEmbeddings(Embeddings):
+    """
+    Wraps a HuggingFaceEmbeddings model and embeds documents in length-sorted,
+    token-budgeted batches, returning vectors in the original order.
+
+    Texts are tokenized once: token IDs registered by the chunker through
+    remember_token_ids() are fed to the model as they are, and other texts are
+    tokenized here. Batches run through the SentenceTransformer forward pass directly, or,
+    with a `pool` (src/embedding_pool.py), in worker processes holding their own model copy.
+    Throughput (tokens/s and padding overhead) is printed per call and accumulated in `stats`.
+    """
+
+    def __init__(self, embeddings, max_batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+                 max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE, pool=None):
+        self.embeddings = embeddings
+        self.pool = pool
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.stats = {"texts": 0, "tokens": 0, "padded_tokens": 0, "batches": 0, "seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        self._token_ids: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._token_ids_lock = threading.Lock()
+        self._special_tokens: Optional[Tuple[List[int], List[int]]] = None
+
+    @staticmethod
+    def prepare_text(text: str) -> str:
+        """Same newline handling as HuggingFaceEmbeddings.embed_documents, so vectors match."""
+        return text.replace("\n", " ")
+
+    @property
+    def tokenizer(self):
+        """The embedding model's own (fast) tokenizer."""
+        return self.embeddings.client.tokenizer
+
+    @property
+    def special_tokens(self) -> Tuple[List[int], List[int]]:
+        """
+        (prefix, suffix) token IDs the tokenizer puts around every text, e.g. ([CLS], [SEP])
+        for BERT or ([], [<|endoftext|>]) for Qwen3. Read off an encoded probe text: fast
+        tokenizers add them in their post-processor, which build_inputs_with_special_tokens
+        bypasses.
+        """
+        if self._special_tokens is None:
+            content = self.tokenizer("a", add_special_tokens=False)["input_ids"]
+            full = self.tokenizer("a")["input_ids"]
+            for start in range(len(full) - len(content) + 1):
+                if full[start:start + len(content)] == content:
+                    self._special_tokens = (full[:start], full[start + len(content):])
+                    break
+            else:
+                raise ValueError(f"Cannot locate the text among the special tokens of {full}")
+        return self._special_tokens
+
+    @property
+    def special_token_count(self) -> int:
+        """Tokens the model adds around every text (e.g. [CLS]/[SEP] or an end-of-text token)."""
+        prefix, suffix = self.special_tokens
+        return len(prefix) + len(suffix)
+
+    def with_special_tokens(self, token_ids: List[int]) -> List[int]:
+        """Model input IDs of a text: its token IDs wrapped in the special tokens, as the tokenizer does."""
+        prefix, suffix = self.special_tokens
+        return prefix + list(token_ids) + suffix
+
+    @property
+    def max_content_tokens(self) -> int:
+        """Longest text, in tokens and without special tokens, the model embeds without truncation."""
+        max_length = self.embeddings.client.max_seq_length or self.tokenizer.model_max_length
+        return max_length - self.special_token_count
+
+    def remember_token_ids(self, text: str, token_ids: List[int]):
+        """
+        Registers the token IDs (of prepare_text(text), without special tokens) of a text that
+        will be passed to embed_documents, so it is not tokenized again.
+        """
+        with self._token_ids_lock:
+            self._token_ids[text] = token_ids
+            while len(self._token_ids) > MAX_PRETOKENIZED_TEXTS:
+                self._token_ids.popitem(last=False)
+
+    def token_ids(self, texts: List[str]) -> List[List[int]]:
+        """
+        Token IDs of each text without special tokens, truncated like the model would.
+        Registered IDs are used (and released) first; the rest are tokenized in one call.
+        """
+        with self._token_ids_lock:
+            known = [self._token_ids.pop(text, None) for text in texts]
+        missing = [i for i, ids in enumerate(known) if ids is None]
+        if missing:
+            encoded = self.tokenizer([self.prepare_text(texts[i]) for i in missing], add_special_tokens=False,
+                                     verbose=False)
+            for i, ids in zip(missing, encoded["input_ids"]):
+                known[i] = ids
+        limit = self.max_content_tokens
+        return [ids[:limit] for ids in known]
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token count of each text as the model sees it, special tokens included and truncation applied."""
+        return [len(ids) + self.special_token_count for ids in self.token_ids(texts)]
+
+    def _encode_token_ids(self, batch_ids: List[List[int]]) -> List[List[float]]:
+        """Encodes one planned batch of token IDs in a single forward pass."""
+        client = self.embeddings.client
+        features = self.tokenizer.pad(
+            {"input_ids": [self.with_special_tokens(ids) for ids in batch_ids]},
+            padding=True, return_tensors="pt"
+        )
+        features = {name: tensor.to(client.device) for name, tensor in features.items()}
+        with torch.inference_mode():
+            vectors = client(features)["sentence_embedding"]
+        if self.embeddings.encode_kwargs.get("normalize_embeddings", False):
+            vectors = torch.nn.functional.normalize(vectors, p=2, dim=1)
+        return vectors.float().cpu().numpy().tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        all_ids = self.token_ids(texts)
+        token_counts = [len(ids) + self.special_token_count for ids in all_ids]
+        batches = plan_token_batches(token_counts, self.max_batch_tokens, self.max_batch_size)
+
+        batch_ids = [[all_ids[i] for i in batch] for batch in batches]
+        if self.pool is not None:
+            encoded = self.pool.encode_batches(batch_ids)
+        else:
+            encoded = map(self._encode_token_ids, batch_ids)
+
+        vectors: List[Any] = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, encoded):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        elapsed = time.perf_counter() - start
+        tokens = sum(token_counts)
+        padded_tokens = sum(len(batch) * token_counts[batch[0]] for batch in batches)
+        with self._stats_lock:
+            self.stats["texts"] += len(texts)
+            self.stats["tokens"] += tokens
+            self.stats["padded_tokens"] += padded_tokens
+            self.stats["batches"] += len(batches)
+            self.stats["seconds"] += elapsed
+        print(f"  Embedded {len(texts)} chunks ({tokens} tokens) in {len(batches)} batches: "
+              f"{tokens / elapsed if elapsed else 0:.0f} tokens/s, "
+              f"{1 - tokens / padded_tokens if padded_tokens else 0:.0%} padding")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def throughput(self) -> Dict[str, float]:
+        """Cumulative tokens/s and padding share over every embed_documents call so far."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            "tokens_per_second": stats["tokens"] / stats["seconds"] if stats["seconds"] else 0.0,
+            "padding_ratio": 1 - stats["tokens"] / stats["padded_tokens"] if stats["padded_tokens"] else 0.0
+        }
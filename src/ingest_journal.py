@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from src.config import INGEST_JOURNAL_DIR
+
+def file_sha256(path: str) -> str:
+    """Content hash of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestJournal:
+    """
+    Append-only JSON-lines journal of one document's ingestion run, kept in
+    INGEST_JOURNAL_DIR. Every record is flushed to disk before the pipeline moves on,
+    so after a crash the journal says which stages and batches were committed.
+
+    A run is identified by `fingerprint` (the PDF's content hash plus the settings that
+    shape chunk IDs); a journal left by a different fingerprint is never resumed.
+    """
+
+    def __init__(self, source_document: str, fingerprint: Dict[str, Any], journal_dir: Optional[str] = None):
+        self.source_document = source_document
+        self.fingerprint = fingerprint
+        self.path = os.path.join(journal_dir or INGEST_JOURNAL_DIR, f"{os.path.splitext(source_document)[0]}.jsonl")
+        self.committed_pages: Set[int] = set()
+        self.committed_chunk_ids: List[str] = []
+        self.last_batch = 0
+        self.written_chunks = 0
+        self.resumed = False
+
+    def _read_records(self) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Records of the journal on disk and the byte length they take up.
+        A torn last line from a crash is left out of both.
+        """
+        records = []
+        valid_bytes = 0
+        if not os.path.exists(self.path):
+            return records, valid_bytes
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated record")
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_bytes += len(line)
+        return records, valid_bytes
+
+    def start(self, resume: bool = False) -> bool:
+        """
+        Opens the journal for a run. With resume, an unfinished journal of the same
+        fingerprint is continued and its committed batches are loaded; otherwise the
+        journal starts over. Returns whether the run resumes.
+        """
+        records, valid_bytes = self._read_records()
+        resumable = (resume and records and records[0].get("event") == "start"
+                     and records[0].get("fingerprint") == self.fingerprint
+                     and records[-1].get("event") != "completed")
+        if resume and records and not resumable:
+            print(f"  Journal for {self.source_document} is finished or from a different file/settings; starting over")
+
+        if resumable:
+            # Drop a torn record, so new records start on a line of their own
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+            for record in records:
+                if record.get("event") == "batch":
+                    self.committed_pages.update(record["pages"])
+                    self.committed_chunk_ids.extend(record["chunk_ids"])
+                    self.last_batch = max(self.last_batch, record["batch"])
+                elif record.get("event") == "written":
+                    self.written_chunks += record["chunks"]
+            self.resumed = True
+            self.record("resume", committed_pages=len(self.committed_pages),
+                        committed_chunks=len(self.committed_chunk_ids))
+        else:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+            self.record("start", fingerprint=self.fingerprint)
+        return self.resumed
+
+    def record(self, event: str, **fields: Any):
+        """Appends one record and forces it to disk."""
+        entry = {"event": event, "at": datetime.now().isoformat(timespec="seconds"), **fields}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def commit_batch(self, batch_number: int, pages: List[int], chunk_ids: List[str], added: int):
+        """Records a batch of pages whose chunks are embedded and written to the collection."""
+        self.record("batch", batch=batch_number, pages=pages, chunk_ids=chunk_ids, added=added)
+        self.committed_pages.update(pages)
+        self.committed_chunk_ids.extend(chunk_ids)
+        self.last_batch = max(self.last_batch, batch_number)
+
+    def complete(self, **fields: Any):
+        """Marks the run as finished, so a later --resume starts a fresh run."""
+        self.record("completed", **fields)
@@ -0,0 +1,245 @@
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import fitz  # PyMuPDF
+
+from src.config import (EXTRACTION_WORKERS, INGEST_MAX_CONCURRENT_DOCUMENTS, MANIFEST_DIR, PACK_PAGES,
+                        DEDUP_NEAR_DUPLICATES, DEDUP_THRESHOLD, HYBRID_RETRIEVAL_ENABLED, METADATA_LOOKUP_ENABLED,
+                        VECTOR_BACKEND, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+from src.pdf_parser import extract_text_with_metadata, iter_text_with_metadata
+from src.ingest_journal import IngestJournal, file_sha256
+from src.lexical_index import build_lexical_index
+from src.metadata_index import build_metadata_index
+from src.numpy_store import export_numpy_store
+from src.retrieval import read_ingest_stamp
+from src.page_selection import select_pages, spec_pages, document_key
+from src.data_processor import (get_embeddings_model, get_vector_store, delete_stale_chunks,
+                                process_and_store_data, stream_and_store_data)
+from src.pipeline_utils import (create_summary_stats, update_summary_stats, track_summary_stats,
+                                display_page_samples)
+
+def resolve_pdf_paths(inputs: List[str]) -> List[str]:
+    """
+    Expands files, directories and glob patterns into a sorted, de-duplicated list of PDF paths.
+    Directories contribute every *.pdf file directly inside them.
+    Raises ValueError if two of the PDFs would be stored under the same document name
+    (see document_key), since they would overwrite each other's chunks, manifest and journal.
+    """
+    pdf_paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(glob.glob(os.path.join(item, "*.pdf")))
+        elif glob.has_magic(item):
+            matches = sorted(path for path in glob.glob(item, recursive=True) if path.lower().endswith(".pdf"))
+        else:
+            matches = [item]
+        pdf_paths.extend(matches)
+
+    # Keep the first occurrence of each file
+    seen = set()
+    unique_paths = []
+    for path in pdf_paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique_paths.append(path)
+
+    by_document = {}
+    for path in unique_paths:
+        other = by_document.setdefault(document_key(path), path)
+        if other != path:
+            raise ValueError(f"{other} and {path} would both be stored as '{document_key(path)}'; "
+                             f"rename one or move them under DOCUMENT_ROOT")
+    return unique_paths
+
+def manifest_path(source_document: str, manifest_dir: str = MANIFEST_DIR) -> str:
+    """Path of the manifest written for a source document ("v7/rules.pdf" -> <manifest_dir>/v7/rules.json)."""
+    return os.path.join(manifest_dir, f"{os.path.splitext(source_document)[0]}.json")
+
+def write_manifest(manifest: Dict[str, Any], manifest_dir: str = MANIFEST_DIR) -> str:
+    """Writes a document manifest as JSON and returns its path."""
+    path = manifest_path(manifest["source_document"], manifest_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return path
+
+def run_fingerprint(pdf_path: str, stream: bool, page_spec: Optional[str], pack_pages: bool,
+                    dedup: bool = DEDUP_NEAR_DUPLICATES) -> Dict[str, Any]:
+    """The PDF's content hash plus every setting that changes which chunks a run stores."""
+    return {
+        "sha256": file_sha256(pdf_path),
+        "mode": "streaming" if stream else "batch",
+        "page_spec": page_spec,
+        "pack_pages": pack_pages,
+        "dedup_threshold": DEDUP_THRESHOLD if dedup else None,
+        "chunk_size": TOKEN_CHUNK_SIZE,
+        "chunk_overlap": TOKEN_CHUNK_OVERLAP,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "embedding_backend": EMBEDDING_BACKEND
+    }
+
+def ingest_document(pdf_path: str, embedding_model, vector_store, stream: bool = False,
+                    num_workers: Optional[int] = None, show_samples: bool = False,
+                    page_spec: Optional[str] = None, pack_pages: bool = PACK_PAGES,
+                    resume: bool = False, journal_dir: Optional[str] = None,
+                    dedup: bool = DEDUP_NEAR_DUPLICATES) -> Dict[str, Any]:
+    """
+    Extracts, chunks, embeds and stores a single PDF into the shared collection.
+    page_spec limits ingestion to a page selection such as "200-260,!230",
+    pack_pages packs consecutive pages into shared chunks, and dedup stores
+    near-duplicate chunks once.
+    Progress is journaled; with resume, an interrupted run of the same file and settings
+    continues where it stopped (streaming mode skips the pages already stored).
+    Returns the document manifest: page counts, timings and the IDs of the stored chunks.
+    """
+    source_document = document_key(pdf_path)
+    started_at = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+
+    journal = IngestJournal(source_document, run_fingerprint(pdf_path, stream, page_spec, pack_pages, dedup),
+                            journal_dir)
+    if journal.start(resume):
+        print(f"  Resuming {source_document}: {len(journal.committed_chunk_ids)} chunks from "
+              f"{len(journal.committed_pages)} pages and {journal.written_chunks} written chunks in the journal")
+
+    with fitz.open(pdf_path) as doc:
+        total_pdf_pages = len(doc)
+    selected_pages = len(select_pages(total_pdf_pages, page_spec, source_document))
+    # Stale chunks are only removed from the pages this run was asked to cover
+    page_scope = set(spec_pages(total_pdf_pages, page_spec)) if page_spec else None
+    upsert_stats = {"added": 0, "unchanged": 0, "deleted": 0}
+    dedup_stats = {}
+
+    stats = create_summary_stats()
+    extraction_seconds = None
+    storage_seconds = None
+
+    if stream:
+        # Extraction and storage overlap, so only the total time is meaningful
+        pages = track_summary_stats(iter_text_with_metadata(pdf_path, num_workers=num_workers, page_spec=page_spec,
+                                                             exclude_pages=journal.committed_pages), stats)
+        chunk_ids = stream_and_store_data(pages, embedding_model=embedding_model, vector_store=vector_store,
+                                          page_scope=page_scope, upsert_stats=upsert_stats,
+                                          pack_pages=pack_pages, journal=journal,
+                                          dedup=dedup, dedup_stats=dedup_stats)
+    else:
+        # A resumed batch run extracts again, but is served by the page and embedding caches,
+        # and chunks already in the collection are not written twice
+        extracted_data = extract_text_with_metadata(pdf_path, num_workers=num_workers, page_spec=page_spec)
+        extraction_seconds = time.perf_counter() - start
+        journal.record("extracted", pages=len(extracted_data))
+        for page in extracted_data:
+            update_summary_stats(stats, page)
+
+        chunk_ids = []
+        if extracted_data:
+            storage_start = time.perf_counter()
+            chunk_ids = process_and_store_data(extracted_data, embedding_model=embedding_model,
+                                               vector_store=vector_store, page_scope=page_scope,
+                                               upsert_stats=upsert_stats, pack_pages=pack_pages,
+                                               journal=journal, dedup=dedup, dedup_stats=dedup_stats)
+            storage_seconds = time.perf_counter() - storage_start
+        else:
+            # Nothing left to store, but chunks of pages that are now empty or skipped must go
+            upsert_stats["deleted"] = delete_stale_chunks(vector_store, {source_document}, set(), page_scope)
+
+        if show_samples:
+            # Display page samples (first, middle, last)
+            display_page_samples(extracted_data, sample_size=3) # smaller sample for brevity
+
+    journal.complete(chunk_count=len(chunk_ids), upsert=upsert_stats)
+    return {
+        "source_document": source_document,
+        "pdf_path": os.path.abspath(pdf_path),
+        "mode": "streaming" if stream else "batch",
+        "page_spec": page_spec,
+        "pack_pages": pack_pages,
+        "resumed": journal.resumed,
+        "status": "completed" if stats["total_pages"] or chunk_ids else "empty",
+        "started_at": started_at,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "timings": {
+            "extraction_seconds": extraction_seconds,
+            "storage_seconds": storage_seconds,
+            "total_seconds": time.perf_counter() - start
+        },
+        "pages": {
+            "total_in_pdf": total_pdf_pages,
+            "selected": selected_pages,
+            "included": stats["total_pages"],
+            "visual_references": stats["visual_references"],
+            "pages_with_images": stats["pages_with_images"],
+            "content_types": stats["content_types"]
+        },
+        "summary_stats": stats,
+        "chunk_count": len(chunk_ids),
+        "upsert": upsert_stats,
+        "dedup": dedup_stats or None,
+        "chunk_ids": chunk_ids
+    }
+
+def ingest_documents(pdf_paths: List[str], stream: bool = False,
+                     max_concurrent: int = INGEST_MAX_CONCURRENT_DOCUMENTS,
+                     manifest_dir: str = MANIFEST_DIR, page_spec: Optional[str] = None,
+                     pack_pages: bool = PACK_PAGES, resume: bool = False,
+                     dedup: bool = DEDUP_NEAR_DUPLICATES) -> List[Dict[str, Any]]:
+    """
+    Ingests several PDFs into the same collection, at most max_concurrent at a time.
+    page_spec, if given, applies to every document on top of its DOCUMENT_PAGE_RULES entry.
+    With resume, each document continues its interrupted run, if any (see ingest_document).
+    The embedding model and vector store are loaded once and shared by every document.
+    A failure in one document is recorded in its manifest and does not stop the others.
+    Afterwards the lexical index for hybrid retrieval and the page/article metadata index
+    are rebuilt from the collection.
+    Returns the manifests in the order of pdf_paths.
+    """
+    max_concurrent = max(1, min(max_concurrent, len(pdf_paths)))
+
+    # Split the CPU cores between documents instead of starting a full pool per document
+    num_workers = EXTRACTION_WORKERS or max(1, (os.cpu_count() or 1) // max_concurrent)
+
+    embedding_model = get_embeddings_model()
+    vector_store = get_vector_store(embedding_model)
+    show_samples = len(pdf_paths) == 1 and not stream
+
+    def run(pdf_path: str) -> Dict[str, Any]:
+        try:
+            manifest = ingest_document(pdf_path, embedding_model, vector_store, stream=stream,
+                                       num_workers=num_workers, show_samples=show_samples,
+                                       page_spec=page_spec, pack_pages=pack_pages, resume=resume,
+                                       dedup=dedup)
+        except Exception as e:
+            traceback.print_exc()
+            manifest = {
+                "source_document": document_key(pdf_path),
+                "pdf_path": os.path.abspath(pdf_path),
+                "mode": "streaming" if stream else "batch",
+                "page_spec": page_spec,
+                "pack_pages": pack_pages,
+                "status": "failed",
+                "error": f"{type(e).__name__}: {e}",
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "chunk_count": 0,
+                "chunk_ids": []
+            }
+        manifest["manifest_path"] = write_manifest(manifest, manifest_dir)
+        return manifest
+
+    print(f"Ingesting {len(pdf_paths)} document(s), up to {max_concurrent} at a time...")
+    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        manifests = list(executor.map(run, pdf_paths))
+
+    if HYBRID_RETRIEVAL_ENABLED:
+        build_lexical_index(vector_store, read_ingest_stamp())
+    if METADATA_LOOKUP_ENABLED:
+        build_metadata_index(vector_store, read_ingest_stamp())
+    if VECTOR_BACKEND == "numpy":
+        export_numpy_store(vector_store, read_ingest_stamp())
+    return manifests
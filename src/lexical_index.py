@@ -0,0 +1,143 @@
+import os
+import re
+import uuid
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.config import (LEXICAL_INDEX_PATH, BM25_K1, BM25_B, RRF_K, LEXICAL_FAST_PATH_MAX_TERMS)
+
+# Chunks read from the collection per request while building the index
+READ_BATCH_SIZE = 5000
+
+QUESTION_WORDS = {"what", "how", "why", "when", "where", "who", "whom", "which", "can", "could", "is", "are",
+                  "was", "were", "do", "does", "did", "should", "must", "may", "explain", "describe", "list"}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and number tokens ("Article 12" -> ["article", "12"])."""
+    return re.findall(r"\w+", text.lower())
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the stored chunks, kept in compressed-sparse-row form:
+    the postings of term t are doc_ids/term_freqs[offsets[t]:offsets[t + 1]].
+    Saved as one .npz file next to the Chroma collection, together with the ingest
+    stamp of the collection state it was built from.
+    """
+
+    def __init__(self, chunk_ids: List[str], terms: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray, ingest_stamp: Optional[str] = None):
+        self.chunk_ids = chunk_ids
+        self.term_index = {term: i for i, term in enumerate(terms)}
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.ingest_stamp = ingest_stamp
+        self.average_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunk_ids: List[str], texts: List[str], ingest_stamp: Optional[str] = None) -> "LexicalIndex":
+        """Indexes chunk texts; chunk_ids[i] is the Chroma ID of texts[i]."""
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            doc_ids[offsets[i]:offsets[i + 1]] = list(postings[term].keys())
+            term_freqs[offsets[i]:offsets[i + 1]] = list(postings[term].values())
+        return cls(list(chunk_ids), terms, offsets, doc_ids, term_freqs, doc_lengths, ingest_stamp)
+
+    def save(self, path: Optional[str] = None) -> str:
+        path = path or LEXICAL_INDEX_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez_compressed(temporary_path, chunk_ids=np.array(self.chunk_ids, dtype=str),
+                            terms=np.array(self.terms, dtype=str), offsets=self.offsets, doc_ids=self.doc_ids,
+                            term_freqs=self.term_freqs, doc_lengths=self.doc_lengths,
+                            ingest_stamp=np.array(self.ingest_stamp or "", dtype=str))
+        os.replace(temporary_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["LexicalIndex"]:
+        """The saved index, or None if there is none."""
+        path = path or LEXICAL_INDEX_PATH
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["chunk_ids"].tolist(), data["terms"].tolist(), data["offsets"], data["doc_ids"],
+                       data["term_freqs"], data["doc_lengths"], str(data["ingest_stamp"]) or None)
+
+    def known_terms(self, query: str) -> List[str]:
+        return [token for token in tokenize(query) if token in self.term_index]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (chunk ID, BM25 score) pairs; chunks matching no query term are left out."""
+        if not self.chunk_ids:
+            return []
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float64)
+        document_count = len(self.chunk_ids)
+        for token in set(self.known_terms(query)):
+            start, stop = self.offsets[self.term_index[token]], self.offsets[self.term_index[token] + 1]
+            doc_ids, term_freqs = self.doc_ids[start:stop], self.term_freqs[start:stop]
+            idf = np.log(1 + (document_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_ids] / (self.average_length or 1))
+            scores[doc_ids] += idf * term_freqs * (BM25_K1 + 1) / (term_freqs + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.chunk_ids[i], float(scores[i])) for i in ranked]
+
+    def is_keyword_query(self, query: str) -> bool:
+        """
+        Whether a query is an obvious keyword lookup ("Article 12", "Tanding"): at most
+        LEXICAL_FAST_PATH_MAX_TERMS words, not phrased as a question, all in the index.
+        """
+        tokens = tokenize(query)
+        return (0 < len(tokens) <= LEXICAL_FAST_PATH_MAX_TERMS and "?" not in query
+                and tokens[0] not in QUESTION_WORDS and len(self.known_terms(query)) == len(tokens))
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int, rrf_k: int = RRF_K) -> List[str]:
+    """Fuses ranked ID lists by summing 1 / (rrf_k + rank) per list; returns the top k IDs."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:k]
+
+def build_lexical_index(vector_store, ingest_stamp: Optional[str], path: Optional[str] = None) -> LexicalIndex:
+    """Indexes every chunk in the collection and saves the index with the given ingest stamp."""
+    chunk_ids, texts = [], []
+    offset = 0
+    while True:
+        batch = vector_store.get(include=["documents"], limit=READ_BATCH_SIZE, offset=offset)
+        chunk_ids.extend(batch["ids"])
+        texts.extend(batch["documents"])
+        if len(batch["ids"]) < READ_BATCH_SIZE:
+            break
+        offset += READ_BATCH_SIZE
+    index = LexicalIndex.build(chunk_ids, texts, ingest_stamp)
+    saved_path = index.save(path)
+    print(f"Lexical index: {len(chunk_ids)} chunks, {len(index.terms)} terms ({saved_path})")
+    return index
+
+def load_lexical_index(vector_store, ingest_stamp: Optional[str], path: Optional[str] = None) -> LexicalIndex:
+    """The saved index if it was built for this ingest stamp; otherwise it is rebuilt."""
+    index = LexicalIndex.load(path)
+    if index is not None and index.ingest_stamp == ingest_stamp:
+        return index
+    return build_lexical_index(vector_store, ingest_stamp, path)
@@ -0,0 +1,221 @@
+import json
+import os
+import re
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+from src.config import METADATA_INDEX_PATH
+from src.dedup import covered_pages
+from src.lexical_index import QUESTION_WORDS
+
+# Chunks read from the collection per request while building the index
+READ_BATCH_SIZE = 5000
+
+# Headings at the start of a line: "Article 7", "Art. 7a", "Chapter III", "Section 2.1"
+ARTICLE_HEADING = re.compile(r"^\s*(?:article|art\.)\s*(\d+[a-z]?)\b", re.IGNORECASE | re.MULTILINE)
+SECTION_HEADING = re.compile(r"^\s*(chapter|section|part)\s+(\d+(?:\.\d+)*|[a-z]+)\b", re.IGNORECASE | re.MULTILINE)
+
+# References anywhere in a query: "page 46", "p. 46", "pages 46-48", "pages 4 and 10", "Article 7", "section 2.1"
+PAGE_REFERENCE = re.compile(r"\b(?:pages?|pg\.?|p\.)\s*(\d+(?:\s*(?:-|to|,|and|&)\s*\d+)*)", re.IGNORECASE)
+PAGE_TERM = re.compile(r"(\d+)(?:\s*(?:-|to)\s*(\d+))?")
+ARTICLE_REFERENCE = re.compile(r"\b(?:article|art\.)\s*(\d+[a-z]?)\b", re.IGNORECASE)
+SECTION_REFERENCE = re.compile(r"\b(chapter|section|part)\s+(\d+(?:\.\d+)*|[a-z]+)\b", re.IGNORECASE)
+ROMAN_NUMERAL = re.compile(r"(?=[MDCLXVI])M{0,3}(?:CM|CD|D?C{0,3})(?:XC|XL|L?X{0,3})(?:IX|IV|V?I{0,3})")
+# Nothing but punctuation between a reference and the end of its clause
+CLAUSE_END = re.compile(r"\s*(?:$|[^\w\s])")
+
+# Query words asking for the visual content of a page
+VISUAL_WORDS = re.compile(r"\b(?:tables?|diagrams?|charts?|forms?|figures?|images?|visual)\b", re.IGNORECASE)
+VISUAL_CONTENT_TYPES = {"visual_heavy", "mixed_content"}
+
+# Longest page range a single reference may ask for
+MAX_PAGE_RANGE = 20
+
+# Words besides the references (and question, filler and visual words) a query may carry and
+# still be answered from the index alone; longer questions go through the search
+MAX_OTHER_WORDS = 2
+FILLER_WORDS = {"the", "a", "an", "on", "in", "of", "to", "for", "about", "at", "from", "me", "say", "says",
+                "show", "shows", "tell", "give", "there", "this", "that", "it", "its", "and", "or", "please",
+                "rule", "rules", "text", "content", "contents", "whole", "full"}
+
+def _section_number(number: str, rest: str) -> Optional[str]:
+    """
+    The key part of a section number: "2.1", or a roman numeral such as "iii". A numeral
+    that could be an ordinary word ("I" in "section I can find", any lower-case one) only
+    counts at the end of its clause ("chapter iii?").
+    """
+    if number[0].isdigit():
+        return number
+    if not ROMAN_NUMERAL.fullmatch(number.upper()):
+        return None
+    if (number != number.upper() or number == "I") and not CLAUSE_END.match(rest):
+        return None
+    return number.lower()
+
+def _find_references(query: str) -> List[Tuple[int, int, Tuple[str, str]]]:
+    """(start, end, (field, key)) of every reference in a query, in query order."""
+    found = []
+    for match in PAGE_REFERENCE.finditer(query):
+        for term in PAGE_TERM.finditer(match.group(1)):
+            first = int(term.group(1))
+            last = int(term.group(2)) if term.group(2) else first
+            if first <= last <= first + MAX_PAGE_RANGE:
+                found.extend((match.start(), match.end(), ("page", str(page))) for page in range(first, last + 1))
+    for match in ARTICLE_REFERENCE.finditer(query):
+        found.append((match.start(), match.end(), ("article", match.group(1).lower())))
+    for match in SECTION_REFERENCE.finditer(query):
+        number = _section_number(match.group(2), query[match.end():])
+        if number:
+            found.append((match.start(), match.end(), ("section", f"{match.group(1).lower()} {number}")))
+    return sorted(found, key=lambda item: item[0])
+
+def parse_references(query: str) -> List[Tuple[str, str]]:
+    """(field, key) pairs a query names, e.g. [("page", "46"), ("article", "7")], in query order."""
+    return [reference for _, _, reference in _find_references(query)]
+
+def other_words(query: str) -> List[str]:
+    """The words of a query outside its references, minus question, filler and visual words."""
+    for start, end, _ in sorted(_find_references(query), key=lambda item: -item[0]):
+        query = query[:start] + " " + query[end:]
+    return [word for word in re.findall(r"[a-z]+", query.lower())
+            if word not in QUESTION_WORDS and word not in FILLER_WORDS and not VISUAL_WORDS.fullmatch(word)]
+
+def document_names(source_document: str) -> List[str]:
+    """Ways a query may name a document, longest first: "archive/rules_v6.pdf", "rules_v6.pdf", "rules_v6"."""
+    name = source_document.replace("\\", "/").lower()
+    basename = name.rsplit("/", 1)[-1]
+    return list(dict.fromkeys([name, basename, os.path.splitext(basename)[0]]))
+
+def _document_mention(query: str, source_document: str) -> Optional[re.Match]:
+    """Where the query names the document, if it does."""
+    for name in document_names(source_document):
+        match = re.search(rf"(?<![\w/]){re.escape(name)}(?![\w/])", query, re.IGNORECASE)
+        if match:
+            return match
+    return None
+
+def chunk_keys(text: str, metadata: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """The (field, key) entries a chunk is indexed under."""
+    keys = [("page", str(page)) for page in covered_pages(metadata)]
+    if metadata.get("source_document"):
+        keys.append(("document", metadata["source_document"]))
+    keys.extend(("article", number.lower()) for number in ARTICLE_HEADING.findall(text))
+    keys.extend(("section", f"{kind.lower()} {number.lower()}") for kind, number in SECTION_HEADING.findall(text)
+                if number[0].isdigit() or ROMAN_NUMERAL.fullmatch(number.upper()))
+    if metadata.get("content_type"):
+        keys.append(("content_type", metadata["content_type"]))
+    return list(dict.fromkeys(keys))
+
+class MetadataIndex:
+    """
+    Exact lookup tables from page number, article and section headings, content_type and
+    source document to chunk IDs, so a query naming "page 46" or "Article 7" is answered
+    with dictionary lookups and one fetch by ID, without embedding it or searching the
+    vector index. Articles and sections are indexed by the chunks whose lines start with
+    their heading. Saved as JSON next to the Chroma collection with the ingest stamp it
+    was built from.
+    """
+
+    def __init__(self, entries: Dict[str, Dict[str, List[str]]], ingest_stamp: Optional[str] = None):
+        self.entries = entries
+        self.ingest_stamp = ingest_stamp
+        self.document_of = {chunk_id: source_document
+                            for source_document, chunk_ids in entries.get("document", {}).items()
+                            for chunk_id in chunk_ids}
+
+    @classmethod
+    def build(cls, chunk_ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]],
+              ingest_stamp: Optional[str] = None) -> "MetadataIndex":
+        entries: Dict[str, Dict[str, List[str]]] = {"page": {}, "article": {}, "section": {}, "content_type": {},
+                                                    "document": {}}
+        # Page order, so a lookup returns a page's chunks before the next page's
+        order = sorted(range(len(chunk_ids)), key=lambda i: (metadatas[i].get("source_document", ""),
+                                                             metadatas[i].get("page_number", 0), chunk_ids[i]))
+        for i in order:
+            for field, key in chunk_keys(texts[i], metadatas[i] or {}):
+                entries[field].setdefault(key, []).append(chunk_ids[i])
+        return cls(entries, ingest_stamp)
+
+    def save(self, path: Optional[str] = None) -> str:
+        path = path or METADATA_INDEX_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"ingest_stamp": self.ingest_stamp, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(temporary_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["MetadataIndex"]:
+        """The saved index, or None if there is none."""
+        path = path or METADATA_INDEX_PATH
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "document" not in data["entries"]:
+            return None  # Saved before chunks were indexed by document; rebuilt
+        return cls(data["entries"], data["ingest_stamp"])
+
+    def chunk_ids(self, field: str, key: str) -> List[str]:
+        return self.entries.get(field, {}).get(key, [])
+
+    def lookup(self, query: str, k: int) -> Optional[List[str]]:
+        """
+        IDs of the chunks on the pages, articles and sections the query names (at most k),
+        or None if it names none that are indexed, or asks about more than the references
+        (more than MAX_OTHER_WORDS other words), which is left to the search. Asking for
+        tables, diagrams etc. narrows the result to visual content when a named page has any.
+
+        Page numbers and headings repeat across documents. A query naming a document
+        ("page 46 of circular_2024.pdf") is answered from that document only; when the
+        references match chunks of several documents and the query names none of them,
+        it is left to the search rather than answered from whichever document sorts first.
+        """
+        named = []
+        rest = query
+        for source_document in self.entries.get("document", {}):
+            mention = _document_mention(query, source_document)
+            if mention:
+                named.append(source_document)
+                rest = rest.replace(mention.group(0), " ")
+        if len(other_words(rest)) > MAX_OTHER_WORDS:
+            return None
+        ids = []
+        for field, key in parse_references(rest):
+            ids.extend(self.chunk_ids(field, key))
+        ids = list(dict.fromkeys(ids))
+        if named:
+            ids = [chunk_id for chunk_id in ids if self.document_of.get(chunk_id) in named]
+        if not ids or len({self.document_of.get(chunk_id) for chunk_id in ids}) > 1:
+            return None
+        if VISUAL_WORDS.search(query):
+            visual = {chunk_id for content_type in VISUAL_CONTENT_TYPES
+                      for chunk_id in self.chunk_ids("content_type", content_type)}
+            ids = [chunk_id for chunk_id in ids if chunk_id in visual] or ids
+        return ids[:k]
+
+def build_metadata_index(vector_store, ingest_stamp: Optional[str], path: Optional[str] = None) -> MetadataIndex:
+    """Indexes every chunk in the collection and saves the index with the given ingest stamp."""
+    chunk_ids, texts, metadatas = [], [], []
+    offset = 0
+    while True:
+        batch = vector_store.get(include=["documents", "metadatas"], limit=READ_BATCH_SIZE, offset=offset)
+        chunk_ids.extend(batch["ids"])
+        texts.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        if len(batch["ids"]) < READ_BATCH_SIZE:
+            break
+        offset += READ_BATCH_SIZE
+    index = MetadataIndex.build(chunk_ids, texts, metadatas, ingest_stamp)
+    saved_path = index.save(path)
+    print(f"Metadata index: {len(index.entries['page'])} pages, {len(index.entries['article'])} articles, "
+          f"{len(index.entries['section'])} sections in {len(index.entries['document'])} documents ({saved_path})")
+    return index
+
+def load_metadata_index(vector_store, ingest_stamp: Optional[str], path: Optional[str] = None) -> MetadataIndex:
+    """The saved index if it was built for this ingest stamp; otherwise it is rebuilt."""
+    index = MetadataIndex.load(path)
+    if index is not None and index.ingest_stamp == ingest_stamp:
+        return index
+    return build_metadata_index(vector_store, ingest_stamp, path)
@@ -0,0 +1,194 @@
+import glob
+import json
+import os
+import uuid
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from src.config import NUMPY_STORE_DIR
+
+# Chunks read from the Chroma collection per request while exporting
+READ_BATCH_SIZE = 5000
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class NumpyVectorStore:
+    """
+    Exact vector search over a few thousand chunks without an ANN index.
+
+    The normalised embeddings live in a vectors-*.npy file, opened as a read-only memory
+    map, and the IDs, texts, metadata and ingest stamp in sidecar.json, which names the
+    vectors file. Each write goes to a new vectors file, so processes still mapping the
+    old one are not disturbed. A query is one
+    matrix-vector product plus argpartition for the top k; a batch of queries is one
+    matrix-matrix product. Similarities are cosine, reported as distances 1 - cosine.
+
+    The store is a read-only copy of the Chroma collection, exported after each ingest.
+    Given a `source` (a callable returning the Chroma store), refresh() re-exports it
+    when the ingest stamp moves on. get() and query() mirror the parts of Chroma's
+    collection API the retriever uses, so it can stand in for the collection.
+    """
+
+    def __init__(self, directory: Optional[str] = None, source: Optional[Callable[[], Any]] = None):
+        self.directory = directory or NUMPY_STORE_DIR
+        self.source = source
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ingest_stamp: Optional[str] = None
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.row_of: Dict[str, int] = {}
+        self.vectors_file: Optional[str] = None
+        if os.path.exists(self._sidecar_path):
+            self._open()
+
+    @property
+    def _sidecar_path(self) -> str:
+        return os.path.join(self.directory, "sidecar.json")
+
+    @property
+    def _collection(self) -> "NumpyVectorStore":
+        return self
+
+    def _open(self):
+        with open(self._sidecar_path, encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids = sidecar["ids"]
+        self.documents = sidecar["documents"]
+        self.metadatas = sidecar["metadatas"]
+        self.ingest_stamp = sidecar["ingest_stamp"]
+        self.vectors_file = sidecar["vectors_file"]
+        self.matrix = (np.load(os.path.join(self.directory, self.vectors_file), mmap_mode="r")
+                       if self.ids else np.zeros((0, 0), dtype=np.float32))
+        self.row_of = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def write(self, ids: List[str], vectors: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]],
+              ingest_stamp: Optional[str] = None):
+        """Replaces the stored chunks. Vectors are normalised; the sidecar is swapped in atomically."""
+        os.makedirs(self.directory, exist_ok=True)
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+        np.save(os.path.join(self.directory, vectors_file), matrix)
+        temporary_sidecar = f"{self._sidecar_path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_sidecar, "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "documents": list(documents),
+                       "metadatas": [metadata or {} for metadata in metadatas], "ingest_stamp": ingest_stamp,
+                       "vectors_file": vectors_file}, f, ensure_ascii=False)
+        os.replace(temporary_sidecar, self._sidecar_path)
+        self._open()
+        self._remove_old_vectors()
+
+    def _remove_old_vectors(self):
+        """
+        Deletes the vectors files older than the one the sidecar names. Newer ones may
+        belong to a concurrent write whose sidecar has not been swapped in yet.
+        """
+        try:
+            current = os.stat(os.path.join(self.directory, self.vectors_file)).st_mtime_ns
+        except OSError:
+            return  # Replaced by a concurrent write, which cleans up after itself
+        for old_file in glob.glob(os.path.join(self.directory, "vectors-*.npy")):
+            try:
+                if os.stat(old_file).st_mtime_ns < current:
+                    os.remove(old_file)
+            except OSError:
+                pass  # Still mapped by another process (Windows), or already removed; a later write retries
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[tuple]]:
+        """Exact top-k (row, cosine similarity) pairs, best first, for each query row."""
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if not self.ids:
+            return [[] for _ in queries]
+        k = min(k, len(self.ids))
+        similarities = queries @ self.matrix.T
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row_similarities, candidates in zip(similarities, top):
+            ranked = candidates[np.argsort(-row_similarities[candidates], kind="stable")]
+            results.append([(int(row), float(row_similarities[row])) for row in ranked])
+        return results
+
+    def search(self, query_vector: List[float], k: int) -> List[tuple]:
+        """Exact top-k (row, cosine similarity) pairs for one query."""
+        return self.search_batch(np.asarray(query_vector, dtype=np.float32)[None, :], k)[0]
+
+    def _rows_result(self, rows: List[int], include: Optional[List[str]]) -> Dict[str, Any]:
+        include = include or []
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows] if "documents" in include else None,
+            "metadatas": [self.metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": np.asarray(self.matrix[rows]) if "embeddings" in include else None
+        }
+
+    def query(self, query_embeddings: List[List[float]], n_results: int,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chroma-shaped results (one list per query) of an exact batch search."""
+        results: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for ranked in self.search_batch(np.asarray(query_embeddings, dtype=np.float32), n_results):
+            rows = [row for row, _ in ranked]
+            found = self._rows_result(rows, include)
+            for key in ("ids", "documents", "metadatas"):
+                results[key].append(found[key])
+            results["distances"].append([1.0 - similarity for _, similarity in ranked])
+        return results
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None,
+            limit: Optional[int] = None, offset: int = 0, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Chroma-shaped lookup by IDs (unknown IDs are left out) or by metadata equality, paged."""
+        if ids is not None:
+            rows = [self.row_of[chunk_id] for chunk_id in ids if chunk_id in self.row_of]
+        else:
+            rows = [row for row, metadata in enumerate(self.metadatas)
+                    if all(metadata.get(key) == value for key, value in (where or {}).items())]
+            rows = rows[offset or 0:(offset or 0) + limit] if limit else rows[offset or 0:]
+        return self._rows_result(rows, include)
+
+    def refresh(self, ingest_stamp: Optional[str]) -> bool:
+        """
+        Brings the copy up to ingest_stamp: reopens the files if another process (an ingest
+        run) already exported it, else re-exports from the source collection. Returns
+        whether it re-exported.
+        """
+        if self.ingest_stamp != ingest_stamp and os.path.exists(self._sidecar_path):
+            self._open()
+        if self.ingest_stamp == ingest_stamp and os.path.exists(self._sidecar_path):
+            return False
+        if self.source is None:
+            raise RuntimeError(f"The NumPy store in {self.directory} is out of date and has no source to export from")
+        export_numpy_store(self.source(), ingest_stamp, self)
+        return True
+
+def export_numpy_store(vector_store, ingest_stamp: Optional[str],
+                       store: Optional[NumpyVectorStore] = None) -> NumpyVectorStore:
+    """Copies every chunk of the Chroma collection, vectors included, into a NumPy store."""
+    store = store or NumpyVectorStore()
+    ids, vectors, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = vector_store.get(include=["embeddings", "documents", "metadatas"], limit=READ_BATCH_SIZE, offset=offset)
+        ids.extend(batch["ids"])
+        vectors.extend(batch["embeddings"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        if len(batch["ids"]) < READ_BATCH_SIZE:
+            break
+        offset += READ_BATCH_SIZE
+    store.write(ids, np.array(vectors, dtype=np.float32), documents, metadatas, ingest_stamp)
+    size_mb = store.matrix.nbytes / (1024 * 1024) if ids else 0.0
+    print(f"NumPy store: {len(ids)} vectors ({size_mb:.1f} MB) in {store.directory}")
+    return store
+
+def load_numpy_store(source: Callable[[], Any], ingest_stamp: Optional[str],
+                     directory: Optional[str] = None) -> NumpyVectorStore:
+    """Opens the NumPy store, exporting it from source() first if it is missing or out of date."""
+    store = NumpyVectorStore(directory, source=source)
+    store.refresh(ingest_stamp)
+    return store
@@ -0,0 +1,173 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+from src.config import (OCR_CONFIDENCE_THRESHOLD, TESSERACT_PATH,
+                        OCR_WORKERS, OCR_CACHE_DIR, OCR_LANGUAGE,
+                        OCR_TARGET_LONG_SIDE_PX, OCR_MIN_DPI, OCR_MAX_DPI, WORKER_START_METHOD)
+from src.page_cache import load_cached_page, store_cached_page
+
+# Bump when the OCR post-processing below changes
+OCR_CACHE_VERSION = 1
+
+# Per-process state for pool workers: open documents by path
+_worker_documents: Dict[str, fitz.Document] = {}
+
+def tesseract_available() -> bool:
+    """Points pytesseract at the configured Tesseract binary and reports whether one is usable."""
+    if os.path.exists(TESSERACT_PATH):
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+        return True
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+def adaptive_dpi(page: fitz.Page) -> int:
+    """
+    Picks a rasterisation DPI so the longer page side comes out near OCR_TARGET_LONG_SIDE_PX.
+    Small pages are rendered sharper, large pages are not blown up to huge bitmaps.
+    """
+    long_side_inches = max(page.rect.width, page.rect.height) / 72
+    dpi = OCR_TARGET_LONG_SIDE_PX / long_side_inches if long_side_inches else OCR_MAX_DPI
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, dpi)))
+
+def render_page_image(page: fitz.Page) -> Tuple[Image.Image, str]:
+    """Rasterises a page in grayscale at an adaptive DPI. Returns the image and its content hash."""
+    pixmap = page.get_pixmap(dpi=adaptive_dpi(page), colorspace=fitz.csGRAY)
+    digest = hashlib.sha256()
+    digest.update(f"{pixmap.width}x{pixmap.height}".encode("ascii"))
+    digest.update(pixmap.samples)
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    return image, digest.hexdigest()
+
+def ocr_cache_key(image_hash: str) -> str:
+    """Cache key for an OCR result: the page image plus the settings that affect recognition."""
+    settings = f"{OCR_CACHE_VERSION}|{OCR_LANGUAGE}|{OCR_CONFIDENCE_THRESHOLD}"
+    return hashlib.sha256(f"{settings}|{image_hash}".encode("ascii")).hexdigest()
+
+def recognize_image(image: Image.Image) -> Dict[str, Any]:
+    """
+    Runs Tesseract on an image and keeps only words at or above OCR_CONFIDENCE_THRESHOLD.
+    Returns the recognised text (one line per OCR line) and the mean word confidence.
+    """
+    data = pytesseract.image_to_data(image, lang=OCR_LANGUAGE, output_type=pytesseract.Output.DICT)
+
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if not word.strip() or confidence < OCR_CONFIDENCE_THRESHOLD:
+            continue
+        line_key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line_key, []).append(word.strip())
+        confidences.append(confidence)
+
+    return {
+        "text": "\n".join(" ".join(words) for words in lines.values()),
+        "confidence": sum(confidences) / len(confidences) if confidences else 0.0
+    }
+
+def ocr_page(page: fitz.Page, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    OCRs a single page, reusing the disk cache (OCR_CACHE_DIR by default) keyed by the
+    rendered page image hash. Returns the OCR text, mean confidence and whether the
+    result came from the cache.
+    """
+    cache_dir = cache_dir or OCR_CACHE_DIR
+    image, image_hash = render_page_image(page)
+    key = ocr_cache_key(image_hash)
+
+    cached = load_cached_page(cache_dir, key)
+    if cached is not None:
+        return {**cached, "cache_hit": True}
+
+    result = recognize_image(image)
+    store_cached_page(cache_dir, key, result)
+    return {**result, "cache_hit": False}
+
+def ocr_page_images(page: fitz.Page, doc: Optional[fitz.Document] = None) -> str:
+    """Returns the OCR text of a page. `doc` is accepted for compatibility and not needed."""
+    return ocr_page(page)["text"]
+
+def _init_ocr_worker():
+    """Pool initializer: one single-threaded Tesseract per worker process, so workers map onto cores."""
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    tesseract_available()
+
+def _ocr_page_worker(pdf_path: str, page_number: int, cache_dir: Optional[str]) -> Dict[str, Any]:
+    """Pool task: OCR one page of a PDF, keeping the document open for the worker's next task."""
+    doc = _worker_documents.get(pdf_path)
+    if doc is None:
+        doc = _worker_documents[pdf_path] = fitz.open(pdf_path)
+    return ocr_page(doc[page_number - 1], cache_dir)
+
+def _needs_ocr(page_data: Dict[str, Any]) -> bool:
+    """
+    Only visual-heavy pages are worth OCRing. Their text layer is already below
+    OCR_MIN_TEXT_THRESHOLD, which is why they were classified as visual-heavy.
+    """
+    return page_data.get("content_type") == "visual_heavy"
+
+def _attach_ocr_result(page_data: Dict[str, Any], result: Dict[str, Any]):
+    """Appends OCR text below the visual placeholder, which stays as the page's guidance text."""
+    page_data["ocr_applied"] = bool(result["text"].strip())
+    page_data["ocr_confidence"] = round(result["confidence"], 1)
+    if page_data["ocr_applied"]:
+        page_data["text"] = (f"{page_data['text']}\n\n"
+                             f"OCR TEXT (automatically recognised, may contain errors):\n{result['text']}")
+
+def apply_ocr(pages: Iterable[Dict[str, Any]], pdf_path: str, num_workers: Optional[int] = None,
+              cache_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams pages through an OCR stage. Visual-heavy pages are OCRed by a process pool
+    while later pages keep flowing; pages are yielded in their original order.
+    """
+    cache_dir = cache_dir or OCR_CACHE_DIR
+    if num_workers is None:
+        num_workers = OCR_WORKERS
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+
+    ocr_pages = 0
+    cache_hits = 0
+
+    def finish(page_data: Dict[str, Any], result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        nonlocal ocr_pages, cache_hits
+        if result is not None:
+            _attach_ocr_result(page_data, result)
+            ocr_pages += 1
+            cache_hits += result["cache_hit"]
+        return page_data
+
+    if num_workers == 1:
+        doc = fitz.open(pdf_path)
+        try:
+            for page_data in pages:
+                result = ocr_page(doc[page_data["page_number"] - 1], cache_dir) if _needs_ocr(page_data) else None
+                yield finish(page_data, result)
+        finally:
+            doc.close()
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD),
+                                 initializer=_init_ocr_worker) as executor:
+            pending = deque()
+            for page_data in pages:
+                future = None
+                if _needs_ocr(page_data):
+                    future = executor.submit(_ocr_page_worker, pdf_path, page_data["page_number"], cache_dir)
+                pending.append((page_data, future))
+                # Bound the look-ahead so memory stays flat on long documents
+                while len(pending) > num_workers * 4:
+                    page_data, future = pending.popleft()
+                    yield finish(page_data, future.result() if future else None)
+            while pending:
+                page_data, future = pending.popleft()
+                yield finish(page_data, future.result() if future else None)
+
+    print(f"  OCR applied to {ocr_pages} visual-heavy pages ({cache_hits} from the OCR cache)")
@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import uuid
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from src.config import ONNX_MODEL_DIR, ONNX_QUANTIZE
+from src.embedding_scheduler import TokenBudgetEmbeddings
+
+class _SentenceEmbeddingModule(torch.nn.Module):
+    """Exposes a SentenceTransformer as (input_ids, attention_mask) -> sentence embedding for export."""
+
+    def __init__(self, sentence_transformer):
+        super().__init__()
+        self.sentence_transformer = sentence_transformer
+
+    def forward(self, input_ids, attention_mask):
+        features = {"input_ids": input_ids, "attention_mask": attention_mask}
+        return self.sentence_transformer(features)["sentence_embedding"]
+
+def onnx_model_path(model_name: str, quantize: bool, model_dir: Optional[str] = None) -> str:
+    """Where the exported (and optionally int8-quantised) model for model_name is cached."""
+    model_slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+    return os.path.join(model_dir or ONNX_MODEL_DIR, model_slug, "model.int8.onnx" if quantize else "model.onnx")
+
+def export_onnx_model(sentence_transformer, path: str):
+    """
+    Exports a SentenceTransformer (transformer + pooling) to ONNX with dynamic batch and
+    sequence axes. The output is the pooled embedding before normalisation.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    auto_model = sentence_transformer[0].auto_model
+    if hasattr(auto_model.config, "use_cache"):
+        # Decoder-style models (like Qwen) would otherwise return a KV cache
+        auto_model.config.use_cache = False
+    dummy = torch.ones((2, 8), dtype=torch.long, device=sentence_transformer.device)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    torch.onnx.export(
+        _SentenceEmbeddingModule(sentence_transformer).eval(),
+        (dummy, dummy),
+        tmp_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["sentence_embedding"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "sentence_embedding": {0: "batch"}
+        },
+        opset_version=17,
+        dynamo=False
+    )
+    os.replace(tmp_path, path)
+
+def quantize_onnx_model(path: str, quantized_path: str):
+    """Int8 dynamic quantisation of the weights; activations are quantised on the fly at inference."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    tmp_path = f"{quantized_path}.{uuid.uuid4().hex}.tmp"
+    quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, quantized_path)
+
+def ensure_onnx_model(sentence_transformer, model_name: str, quantize: bool = ONNX_QUANTIZE,
+                      model_dir: Optional[str] = None) -> str:
+    """Returns the cached ONNX model for model_name, exporting (and quantising) it first if needed."""
+    path = onnx_model_path(model_name, quantize, model_dir)
+    if os.path.exists(path):
+        return path
+
+    fp32_path = onnx_model_path(model_name, False, model_dir)
+    if not os.path.exists(fp32_path):
+        print(f"Exporting {model_name} to ONNX at {fp32_path} (one-off)...")
+        export_onnx_model(sentence_transformer, fp32_path)
+    if quantize:
+        print(f"Quantising {fp32_path} to int8 (one-off)...")
+        quantize_onnx_model(fp32_path, path)
+    return path
+
+def export_missing_onnx_model(model_name: str, model_kwargs: Dict[str, Any], quantize: bool = ONNX_QUANTIZE,
+                              model_dir: Optional[str] = None) -> str:
+    """
+    Returns the cached ONNX model for model_name, loading the PyTorch model only if it
+    still has to be exported. Call it once before starting processes that use the model,
+    so they don't all export it at the same time.
+    """
+    path = onnx_model_path(model_name, quantize, model_dir)
+    if not os.path.exists(path):
+        huggingface_embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs)
+        ensure_onnx_model(huggingface_embeddings.client, model_name, quantize, model_dir)
+        del huggingface_embeddings
+    return path
+
+class TokenizerOnlyEmbeddings:
+    """
+    Stands in for HuggingFaceEmbeddings once the ONNX model exists: the SentenceTransformer's
+    tokenizer and max_seq_length, without loading its weights into PyTorch.
+    """
+
+    def __init__(self, model_name: str, encode_kwargs: Dict[str, Any], trust_remote_code: bool = False):
+        from sentence_transformers.util import load_file_path
+        from transformers import AutoTokenizer
+
+        # The Transformer module's folder inside the SentenceTransformer ("" for most models)
+        subfolder = ""
+        modules_path = load_file_path(model_name, "modules.json")
+        if modules_path:
+            with open(modules_path, encoding="utf-8") as f:
+                modules = json.load(f)
+            subfolder = next((module["path"] for module in modules if module["type"].endswith(".Transformer")), "")
+        max_seq_length = None
+        config_path = load_file_path(model_name, "sentence_bert_config.json", subfolder=subfolder)
+        if config_path:
+            with open(config_path, encoding="utf-8") as f:
+                max_seq_length = json.load(f).get("max_seq_length")
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name, subfolder=subfolder, trust_remote_code=trust_remote_code)
+        self.client = SimpleNamespace(tokenizer=tokenizer, max_seq_length=max_seq_length, device="cpu")
+        self.encode_kwargs = encode_kwargs
+
+class OnnxTokenBudgetEmbeddings(TokenBudgetEmbeddings):
+    """
+    Token-budget embedder that runs the model with ONNX Runtime on the CPU.
+    Tokenization, batch planning and token-ID reuse are shared with the PyTorch backend;
+    only the forward pass differs. Query embeddings use the ONNX model as well.
+    """
+
+    @classmethod
+    def from_model_name(cls, model_name: str, model_kwargs: Dict[str, Any], encode_kwargs: Dict[str, Any],
+                        quantize: bool = ONNX_QUANTIZE, model_dir: Optional[str] = None, threads: int = 0,
+                        **kwargs) -> "OnnxTokenBudgetEmbeddings":
+        """
+        Loads the PyTorch model only to export a missing ONNX model. Otherwise just the
+        tokenizer is loaded, so the weights are held once, by ONNX Runtime.
+        """
+        export_missing_onnx_model(model_name, model_kwargs, quantize, model_dir)
+        embeddings = TokenizerOnlyEmbeddings(model_name, encode_kwargs,
+                                             trust_remote_code=model_kwargs.get("trust_remote_code", False))
+        return cls(embeddings, model_name, quantize=quantize, model_dir=model_dir, threads=threads, **kwargs)
+
+    def __init__(self, embeddings, model_name: str, quantize: bool = ONNX_QUANTIZE,
+                 model_dir: Optional[str] = None, threads: int = 0, **kwargs):
+        super().__init__(embeddings, **kwargs)
+        self.model_path = ensure_onnx_model(embeddings.client, model_name, quantize, model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads  # 0 = ONNX Runtime's default (all cores)
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+    def _encode_token_ids(self, batch_ids: List[List[int]]) -> List[List[float]]:
+        features = self.tokenizer.pad(
+            {"input_ids": [self.with_special_tokens(ids) for ids in batch_ids]},
+            padding=True, return_tensors="np"
+        )
+        vectors = self.session.run(["sentence_embedding"], {
+            "input_ids": features["input_ids"].astype(np.int64),
+            "attention_mask": features["attention_mask"].astype(np.int64)
+        })[0]
+        if self.embeddings.encode_kwargs.get("normalize_embeddings", False):
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_token_ids(self.token_ids([text]))[0]
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import uuid
+import fitz  # PyMuPDF
+from typing import Dict, Any, Optional
+
+from src.config import BOILERPLATE_PATTERNS, FAST_VISUAL_ANALYSIS, DRAWING_COUNT_LIMIT
+
+# Bump when the cleaning, analysis or placeholder code changes in a way the config does not capture
+PAGE_CACHE_VERSION = 1
+
+def extraction_config_fingerprint() -> str:
+    """Hash of every setting that changes the per-page extraction output."""
+    config = {
+        "version": PAGE_CACHE_VERSION,
+        "pymupdf": fitz.VersionBind,
+        "boilerplate_patterns": BOILERPLATE_PATTERNS,
+        "fast_visual_analysis": FAST_VISUAL_ANALYSIS,
+        "drawing_count_limit": DRAWING_COUNT_LIMIT,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+def page_cache_key(page: fitz.Page, page_number: int, config_fingerprint: str) -> str:
+    """
+    Builds the cache key for a page from its raw content and the extraction configuration.
+    Covers the content streams, the form XObjects they draw and the font/image objects
+    the page uses, so an edit to any of them changes the key.
+    """
+    doc = page.parent
+    digest = hashlib.sha256()
+    digest.update(config_fingerprint.encode("ascii"))
+    # Placeholders mention the page number, so it is part of the key
+    digest.update(str(page_number).encode("ascii"))
+    digest.update(page.read_contents())
+    for xref, *_ in page.get_xobjects():
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    for xref, *_ in page.get_images(full=True):
+        digest.update(doc.xref_object(xref, compressed=True).encode("utf-8"))
+    for xref, *_ in page.get_fonts(full=True):
+        digest.update(doc.xref_object(xref, compressed=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    """Cache entries are spread over 256 sub-directories by key prefix."""
+    return os.path.join(cache_dir, key[:2], f"{key}.json")
+
+def load_cached_page(cache_dir: str, key: str) -> Optional[Dict[str, Any]]:
+    """Returns the cached extraction entry for a key, or None on a miss or unreadable entry."""
+    try:
+        with open(_cache_path(cache_dir, key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def store_cached_page(cache_dir: str, key: str, entry: Dict[str, Any]):
+    """Writes a cache entry atomically, so concurrent workers and threads never see a partial file."""
+    path = _cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,125 @@
+import json
+from typing import List, Dict, Any, Callable, Tuple
+
+from langchain.docstore.document import Document
+from langchain.text_splitter import TextSplitter
+
+PAGE_SEPARATOR = "\n\n"
+
+def splitter_token_counter(text_splitter: TextSplitter) -> Callable[[str], int]:
+    """The length function a splitter budgets chunks with (tiktoken tokens for TokenTextSplitter)."""
+    tokenizer = getattr(text_splitter, "_tokenizer", None)
+    if tokenizer is not None:
+        return lambda text: len(tokenizer.encode(text))
+    return text_splitter._length_function
+
+def _can_pack(page_data: Dict[str, Any]) -> bool:
+    """Visual-heavy placeholders stay on their own so their visual note applies to one page."""
+    return not page_data.get("is_visual_reference", False)
+
+def _packed_document(group: List[Dict[str, Any]]) -> Document:
+    """Joins a run of consecutive pages into one Document with page-span metadata."""
+    texts = [page_data["text"] for page_data in group]
+    offsets = []
+    position = 0
+    for page_data, text in zip(group, texts):
+        offsets.append([page_data["page_number"], position])
+        position += len(text) + len(PAGE_SEPARATOR)
+
+    metadata = {k: v for k, v in group[0].items() if k != "text"}
+    if len(group) > 1:
+        content_types = {page_data.get("content_type") for page_data in group}
+        descriptions = [page_data.get("content_description") for page_data in group]
+        merged = {
+            "has_images": any(page_data.get("has_images", False) for page_data in group),
+            "content_type": "mixed_content" if "mixed_content" in content_types else metadata.get("content_type"),
+            "content_description": "; ".join(dict.fromkeys(d for d in descriptions if d))
+        }
+        # Chroma metadata values cannot be None
+        metadata.update({key: value for key, value in merged.items() if value is not None})
+    metadata.update({
+        "page_number": group[0]["page_number"],
+        "page_start": group[0]["page_number"],
+        "page_end": group[-1]["page_number"],
+        "page_offsets": json.dumps(offsets)
+    })
+    return Document(page_content=PAGE_SEPARATOR.join(texts), metadata=metadata)
+
+def pack_page_documents(extracted_pages_data: List[Dict[str, Any]], max_tokens: int,
+                        count_tokens: Callable[[str], int]) -> List[Document]:
+    """
+    Concatenates consecutive pages of the same document into Documents of at most
+    max_tokens tokens. A gap in page numbers, a new document or a visual-heavy page
+    starts a new Document; pages longer than the budget become Documents of their own.
+    """
+    documents = []
+    group: List[Dict[str, Any]] = []
+    group_tokens = 0
+    separator_tokens = count_tokens(PAGE_SEPARATOR)
+    for page_data in extracted_pages_data:
+        tokens = count_tokens(page_data["text"])
+        if group:
+            previous = group[-1]
+            continues = (_can_pack(page_data) and _can_pack(previous)
+                         and page_data["page_number"] == previous["page_number"] + 1
+                         and page_data.get("source_document") == previous.get("source_document")
+                         and group_tokens + separator_tokens + tokens <= max_tokens)
+            if continues:
+                group.append(page_data)
+                group_tokens += separator_tokens + tokens
+                continue
+            documents.append(_packed_document(group))
+        group = [page_data]
+        group_tokens = tokens
+    if group:
+        documents.append(_packed_document(group))
+    return documents
+
+def _chunk_span_metadata(document: Document, start: int, length: int) -> Dict[str, Any]:
+    """Page span and in-chunk page offsets of the slice [start, start + length) of a packed Document."""
+    page_offsets = json.loads(document.metadata["page_offsets"])
+    pages = []
+    for i, (page_number, page_start) in enumerate(page_offsets):
+        page_stop = page_offsets[i + 1][1] if i + 1 < len(page_offsets) else len(document.page_content)
+        if page_start < start + length and page_stop > start:
+            pages.append([page_number, max(0, page_start - start)])
+    return {
+        "page_number": pages[0][0],
+        "page_start": pages[0][0],
+        "page_end": pages[-1][0],
+        "page_offsets": json.dumps(pages)
+    }
+
+def split_packed_documents(text_splitter: TextSplitter, documents: List[Document]) -> List[Document]:
+    """
+    Splits packed Documents and narrows each chunk's page span to the pages it actually
+    contains, with page_offsets relative to the chunk text.
+    """
+    chunks = []
+    for document in documents:
+        search_from = 0
+        for text in text_splitter.split_text(document.page_content):
+            start = document.page_content.find(text, search_from)
+            metadata = dict(document.metadata)
+            if start >= 0:
+                metadata.update(_chunk_span_metadata(document, start, len(text)))
+                search_from = start + 1
+            else:
+                # The splitter rewrote the text (e.g. a tokenizer round trip): keep the whole span
+                metadata["page_offsets"] = json.dumps([[metadata["page_start"], 0]])
+            chunks.append(Document(page_content=text, metadata=metadata))
+    return chunks
+
+def page_segments(metadata: Dict[str, Any], text: str) -> List[Tuple[Any, str]]:
+    """
+    Splits a chunk's text back into (page_number, text) segments using its page_offsets.
+    Chunks without page_offsets come back as one segment for their page_number.
+    """
+    if "page_offsets" not in metadata:
+        return [(metadata.get("page_number", "N/A"), text)]
+    page_offsets = json.loads(metadata["page_offsets"])
+    segments = []
+    for i, (page_number, start) in enumerate(page_offsets):
+        stop = page_offsets[i + 1][1] if i + 1 < len(page_offsets) else len(text)
+        segments.append((page_number, text[start:stop].strip()))
+    return segments
@@ -0,0 +1,94 @@
+import os
+from typing import List, Optional, Tuple
+from src.config import PAGES_TO_SKIP, DOCUMENT_PAGE_RULES, DOCUMENT_ROOT
+
+# Inclusive, 1-indexed page range; an end of None means "to the last page"
+PageRange = Tuple[int, Optional[int]]
+
+def _parse_term(term: str) -> PageRange:
+    """Parses one term of a page spec: "7", "200-260", "300-" or "-10"."""
+    start_text, separator, end_text = term.partition("-")
+    if not term or term == "-":
+        raise ValueError("Empty page term in page spec")
+    try:
+        start = int(start_text) if start_text.strip() else 1
+        if not separator:
+            end = start
+        else:
+            end = int(end_text) if end_text.strip() else None
+    except ValueError:
+        raise ValueError(f"Invalid page term '{term}': expected N, A-B, A- or -B")
+    if start < 1 or (end is not None and end < start):
+        raise ValueError(f"Invalid page range '{term}': pages start at 1 and ranges must not be reversed")
+    return start, end
+
+def parse_page_spec(spec: Optional[str]) -> Tuple[List[PageRange], List[PageRange]]:
+    """
+    Parses a page-selection spec into (included ranges, excluded ranges).
+    Terms are comma-separated: "7", "200-260", "300-" (to the end) or "-10" (from the start);
+    a leading "!" excludes the term. Without included terms every page is included.
+    Raises ValueError on malformed specs.
+    """
+    included = []
+    excluded = []
+    for term in (spec or "").split(","):
+        term = term.strip()
+        if not term:
+            continue
+        if term.startswith("!"):
+            excluded.append(_parse_term(term[1:].strip()))
+        else:
+            included.append(_parse_term(term))
+    return included, excluded
+
+def _apply_spec(selected: List[bool], spec: Optional[str]):
+    """Narrows a per-page selection mask (index 0 unused) in place by a spec."""
+    total_pages = len(selected) - 1
+    included, excluded = parse_page_spec(spec)
+    if included:
+        wanted = [False] * len(selected)
+        for start, end in included:
+            for page_number in range(start, min(end or total_pages, total_pages) + 1):
+                wanted[page_number] = True
+        for page_number in range(1, total_pages + 1):
+            selected[page_number] = selected[page_number] and wanted[page_number]
+    for start, end in excluded:
+        for page_number in range(start, min(end or total_pages, total_pages) + 1):
+            selected[page_number] = False
+
+def spec_pages(total_pages: int, spec: Optional[str]) -> List[int]:
+    """Pages matched by the spec alone, ignoring DOCUMENT_PAGE_RULES and PAGES_TO_SKIP."""
+    selected = [False] + [True] * total_pages
+    _apply_spec(selected, spec)
+    return [page_number for page_number in range(1, total_pages + 1) if selected[page_number]]
+
+def document_key(pdf_path: str, root: Optional[str] = None) -> str:
+    """
+    The name a PDF is stored under: its path relative to DOCUMENT_ROOT with "/" separators
+    ("rules.pdf", "v7/rules.pdf"), or its file name if it lies outside DOCUMENT_ROOT.
+    """
+    path = os.path.abspath(pdf_path)
+    root = os.path.abspath(root or DOCUMENT_ROOT)
+    try:
+        inside = os.path.commonpath([path, root]) == root
+    except ValueError:  # On another drive (Windows)
+        inside = False
+    if not inside:
+        return os.path.basename(path)
+    return os.path.relpath(path, root).replace(os.sep, "/")
+
+def select_pages(total_pages: int, spec: Optional[str] = None,
+                 source_document: Optional[str] = None) -> List[int]:
+    """
+    Returns the sorted 1-indexed pages of a document to extract, before any page is loaded.
+    A page must match `spec` and the document's rule in DOCUMENT_PAGE_RULES, and must not
+    be in PAGES_TO_SKIP.
+    """
+    selected = [False] + [True] * total_pages
+    _apply_spec(selected, spec)
+    if source_document in DOCUMENT_PAGE_RULES:
+        _apply_spec(selected, DOCUMENT_PAGE_RULES[source_document])
+    for page_number in PAGES_TO_SKIP:
+        if 0 < page_number <= total_pages:
+            selected[page_number] = False
+    return [page_number for page_number in range(1, total_pages + 1) if selected[page_number]]
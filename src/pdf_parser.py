@@ -1,82 +1,262 @@
 import fitz  # PyMuPDF
-import re
-from typing import List, Dict, Any
-from PIL import Image
-import pytesseract
-import io
+import multiprocessing
 import os
-from src.config import (BOILERPLATE_PATTERNS, PAGES_TO_SKIP, OCR_ENABLED, 
-                       OCR_MIN_TEXT_THRESHOLD, OCR_CONFIDENCE_THRESHOLD, TESSERACT_PATH)
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+from src.config import (OCR_ENABLED, OCR_WORKERS, EXTRACTION_WORKERS, EXTRACTION_MIN_PAGES_PER_WORKER,
+                        EXTRACTION_SHARD_PAGES, FAST_VISUAL_ANALYSIS, DRAWING_COUNT_LIMIT, PAGE_CACHE_ENABLED,
+                        PAGE_CACHE_DIR, WORKER_START_METHOD)
+from src.text_processor import clean_text, filter_page
+from src.page_selection import select_pages, document_key
+from src.page_cache import extraction_config_fingerprint, page_cache_key, load_cached_page, store_cached_page
+from src.ocr import apply_ocr, ocr_page_images, tesseract_available
+from src.content_analyzer import (analyze_page_content, analyze_page_content_fast,
+                                  create_visual_content_placeholder)
 
-# Configure pytesseract to point to your Tesseract installation
-if OCR_ENABLED and os.path.exists(TESSERACT_PATH):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+def _analyze_page(page: fitz.Page, page_number: int) -> Dict[str, Any]:
+    """
+    Runs text extraction, content analysis and cleaning on a single page.
+    This is the expensive, cacheable part of extraction.
+    """
+    # 1. Get text from PDF layer
+    text_from_pdf_layer = page.get_text()
+    
+    # 2. Analyze page content
+    if FAST_VISUAL_ANALYSIS:
+        content_analysis = analyze_page_content_fast(page, text_from_pdf_layer, drawing_limit=DRAWING_COUNT_LIMIT)
+    else:
+        content_analysis = analyze_page_content(page, text_from_pdf_layer)
+    
+    # 3. Clean the text
+    cleaned_text = clean_text(text_from_pdf_layer)
+    
+    # Create a meaningful placeholder instead of OCR gibberish
+    placeholder = None
+    if content_analysis["content_type"] == "visual_heavy":
+        placeholder = create_visual_content_placeholder(page_number, content_analysis)
+    
+    return {
+        "cleaned_text": cleaned_text,
+        "content_analysis": content_analysis,
+        "placeholder": placeholder
+    }
 
-import fitz
-from typing import List, Dict, Any
-from src.text_processor import clean_text, filter_page
-from src.content_analyzer import analyze_page_content, create_visual_content_placeholder
+def _build_page_data(page_number: int, analyzed: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Applies filtering to an analyzed page and builds its page data.
+    Returns the page data (or None) and its status: 'skipped', 'visual_heavy', 'included' or 'empty'.
+    """
+    content_analysis = analyzed["content_analysis"]
+    
+    # 4. Apply filtering
+    if not filter_page(page_number, analyzed["cleaned_text"]):
+        return None, "skipped"
+    
+    # 5. Handle different content types
+    if content_analysis["content_type"] == "visual_heavy":
+        final_text = analyzed["placeholder"]
+        status = "visual_heavy"
+    else:
+        # Use the cleaned PDF text
+        final_text = analyzed["cleaned_text"]
+        status = "included"
+    
+    # 6. Store the page data
+    if not final_text.strip():
+        return None, "empty"
+    
+    return {
+        "text": final_text,
+        "page_number": page_number,
+        "has_images": content_analysis["has_visual_elements"],
+        "content_type": content_analysis["content_type"],
+        "content_description": content_analysis["content_description"],
+        "is_visual_reference": content_analysis["content_type"] == "visual_heavy"
+    }, status
 
-def extract_text_with_metadata(pdf_path: str) -> List[Dict[str, Any]]:
+def _page_cache_settings() -> Optional[Tuple[str, str]]:
     """
-    Extracts text and metadata from PDF pages with smart handling of visual content.
+    The page cache directory and extraction config fingerprint, or None when the cache is
+    disabled. Resolved in the parent, since spawned workers only see the config module.
     """
-    documents = []
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
-    skipped_pages = []
-    visual_heavy_pages = []
+    return (PAGE_CACHE_DIR, extraction_config_fingerprint()) if PAGE_CACHE_ENABLED else None
+
+def _extract_page(page: fitz.Page, page_number: int,
+                  page_cache: Optional[Tuple[str, str]] = None) -> Tuple[Optional[Dict[str, Any]], str, bool]:
+    """
+    Extracts a single page, reusing the on-disk page cache when its settings are given.
+    Returns the page data (or None), its status and whether it came from the cache.
+    """
+    if page_cache is None:
+        return (*_build_page_data(page_number, _analyze_page(page, page_number)), False)
     
-    print(f"Processing {total_pages} pages with smart visual content handling...")
+    cache_dir, config_fingerprint = page_cache
+    key = page_cache_key(page, page_number, config_fingerprint)
+    analyzed = load_cached_page(cache_dir, key)
+    cache_hit = analyzed is not None
+    if not cache_hit:
+        analyzed = _analyze_page(page, page_number)
+        store_cached_page(cache_dir, key, analyzed)
     
-    for page_num, page in enumerate(doc):
-        page_number_1_indexed = page_num + 1
-        
+    return (*_build_page_data(page_number, analyzed), cache_hit)
+
+def _iter_pages(doc: fitz.Document, page_numbers: List[int],
+                page_cache: Optional[Tuple[str, str]]) -> Iterator[Tuple[Optional[Dict[str, Any]], str, int, bool]]:
+    """Yields (page data, status, page number, cache hit) for the given 1-indexed pages of an open document."""
+    total_pages = len(doc)
+    for page_number_1_indexed in page_numbers:
         if page_number_1_indexed % 50 == 0:  # Progress indicator
             print(f"  Processed {page_number_1_indexed}/{total_pages} pages...")
         
-        # 1. Get text from PDF layer
-        text_from_pdf_layer = page.get_text()
-        
-        # 2. Analyze page content
-        content_analysis = analyze_page_content(page, text_from_pdf_layer)
-        
-        # 3. Clean the text
-        cleaned_text = clean_text(text_from_pdf_layer)
-        
-        # 4. Apply filtering
-        if not filter_page(page_number_1_indexed, cleaned_text):
-            skipped_pages.append(page_number_1_indexed)
-            continue
-        
-        # 5. Handle different content types
-        final_text = ""
-        
-        if content_analysis["content_type"] == "visual_heavy":
-            # Create a meaningful placeholder instead of OCR gibberish
-            final_text = create_visual_content_placeholder(page_number_1_indexed, content_analysis)
-            visual_heavy_pages.append(page_number_1_indexed)
-        else:
-            # Use the cleaned PDF text
-            final_text = cleaned_text
+        page_data, status, cache_hit = _extract_page(doc[page_number_1_indexed - 1], page_number_1_indexed,
+                                                     page_cache)
+        yield page_data, status, page_number_1_indexed, cache_hit
+
+def _extract_pages(pdf_path: str, page_numbers: List[int],
+                   page_cache: Optional[Tuple[str, str]]) -> List[Tuple[Optional[Dict[str, Any]], str, int, bool]]:
+    """
+    Extracts the given 1-indexed pages from the PDF.
+    Opens its own document so it can run inside a worker process.
+    """
+    with fitz.open(pdf_path) as doc:
+        return list(_iter_pages(doc, page_numbers, page_cache))
+
+def _resolve_worker_count(num_workers: Optional[int], total_pages: int) -> int:
+    """Works out how many extraction processes to use for a document of this size."""
+    if num_workers is None:
+        num_workers = EXTRACTION_WORKERS
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+    
+    max_useful_workers = total_pages // max(1, EXTRACTION_MIN_PAGES_PER_WORKER)
+    return max(1, min(num_workers, max_useful_workers))
+
+def _shard_pages(page_numbers: List[int], num_shards: int) -> List[List[int]]:
+    """Splits the selected pages into num_shards contiguous runs of near-equal size."""
+    shard_size, remainder = divmod(len(page_numbers), num_shards)
+    shards = []
+    start = 0
+    for shard in range(num_shards):
+        stop = start + shard_size + (1 if shard < remainder else 0)
+        shards.append(page_numbers[start:stop])
+        start = stop
+    return shards
+
+def _iter_extraction_results(pdf_path: str, page_numbers: List[int], workers: int) -> Iterator[Tuple[Optional[Dict[str, Any]], str, int, bool]]:
+    """
+    Yields per-page extraction results for the selected pages, in page order.
+    In parallel mode only a bounded window of shards is in flight, so memory stays flat.
+    """
+    page_cache = _page_cache_settings()
+    if workers == 1:
+        with fitz.open(pdf_path) as doc:
+            yield from _iter_pages(doc, page_numbers, page_cache)
+        return
+    
+    num_shards = max(workers, -(-len(page_numbers) // max(1, EXTRACTION_SHARD_PAGES)))
+    shards = _shard_pages(page_numbers, num_shards)
+    print(f"  Extracting in parallel with {workers} worker processes ({len(shards)} shards)...")
+    
+    with ProcessPoolExecutor(max_workers=workers,
+                             mp_context=multiprocessing.get_context(WORKER_START_METHOD)) as executor:
+        pending = deque()
+        next_shard = 0
+        while pending or next_shard < len(shards):
+            # Keep every worker busy with one shard queued behind it
+            while next_shard < len(shards) and len(pending) < workers * 2:
+                pending.append(executor.submit(_extract_pages, pdf_path, shards[next_shard], page_cache))
+                next_shard += 1
+            # Results are consumed in submission order, so pages stay sorted
+            yield from pending.popleft().result()
+
+def _iter_extracted_pages(pdf_path: str, num_workers: Optional[int] = None,
+                          page_spec: Optional[str] = None,
+                          exclude_pages: Optional[Set[int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams page data from the PDF one page at a time, in page order.
+    
+    Only pages selected by page_spec, the document's DOCUMENT_PAGE_RULES entry and
+    PAGES_TO_SKIP are loaded, minus exclude_pages (pages a resumed run already stored).
+    With more than one worker, the selected pages are split into contiguous shards that
+    are extracted by separate processes and merged back in page order.
+    """
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+    
+    source_document = document_key(pdf_path)
+    page_numbers = select_pages(total_pages, page_spec, source_document)
+    selected = set(page_numbers)
+    if exclude_pages:
+        page_numbers = [page_number for page_number in page_numbers if page_number not in exclude_pages]
+        print(f"  Resuming: {len(selected) - len(page_numbers)} pages were already stored")
+    workers = _resolve_worker_count(num_workers, len(page_numbers))
+    skipped_pages = [page_number for page_number in range(1, total_pages + 1) if page_number not in selected]
+    visual_heavy_pages = []
+    included_pages = 0
+    cache_hits = 0
+    
+    print(f"Processing {len(page_numbers)} of {total_pages} pages of {source_document} "
+          f"with smart visual content handling...")
+    
+    for page_data, status, page_number, cache_hit in _iter_extraction_results(pdf_path, page_numbers, workers):
+        cache_hits += cache_hit
+        if status == "skipped":
+            skipped_pages.append(page_number)
+        elif status == "visual_heavy":
+            visual_heavy_pages.append(page_number)
         
-        # 6. Store the page data
-        if final_text.strip():
-            documents.append({
-                "text": final_text,
-                "page_number": page_number_1_indexed,
-                "has_images": content_analysis["has_visual_elements"],
-                "content_type": content_analysis["content_type"],
-                "content_description": content_analysis["content_description"],
-                "is_visual_reference": content_analysis["content_type"] == "visual_heavy"
-            })
-    
-    doc.close()
+        if page_data is not None:
+            included_pages += 1
+            page_data["source_document"] = source_document
+            yield page_data
     
     print(f"\nProcessing complete:")
     print(f"  Total pages: {total_pages}")
     print(f"  Skipped pages: {len(skipped_pages)} {skipped_pages[:10]}{'...' if len(skipped_pages) > 10 else ''}")
     print(f"  Visual-heavy pages (with reference placeholders): {len(visual_heavy_pages)}")
-    print(f"  Final included pages: {len(documents)}")
+    print(f"  Final included pages: {included_pages}")
+    if PAGE_CACHE_ENABLED:
+        print(f"  Page cache hits: {cache_hits}/{len(page_numbers)} ({PAGE_CACHE_DIR})")
+
+def _ocr_worker_count(num_workers: Optional[int]) -> Optional[int]:
+    """
+    OCR workers for a document given its extraction worker count: the same share of the
+    cores, capped by OCR_WORKERS when that is set. None (no count given) leaves it to apply_ocr.
+    """
+    if num_workers is None:
+        return None
+    if num_workers <= 0:
+        num_workers = os.cpu_count() or 1
+    return min(num_workers, OCR_WORKERS) if OCR_WORKERS > 0 else num_workers
+
+def iter_text_with_metadata(pdf_path: str, num_workers: Optional[int] = None,
+                            ocr: Optional[bool] = None, page_spec: Optional[str] = None,
+                            exclude_pages: Optional[Set[int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streams page data from the PDF one page at a time, in page order.
+    page_spec narrows extraction to a page selection such as "200-260,!230",
+    and exclude_pages leaves out individual pages.
+    When OCR is enabled (OCR_ENABLED by default) and Tesseract is installed,
+    visual-heavy pages also pass through the parallel, cached OCR stage, which
+    gets the same number of workers (see _ocr_worker_count).
+    """
+    pages = _iter_extracted_pages(pdf_path, num_workers=num_workers, page_spec=page_spec,
+                                  exclude_pages=exclude_pages)
     
-    return documents
+    if ocr is None:
+        ocr = OCR_ENABLED
+    if ocr and not tesseract_available():
+        print("  OCR is enabled but Tesseract was not found; keeping visual placeholders only.")
+        ocr = False
+    if ocr:
+        pages = apply_ocr(pages, pdf_path, num_workers=_ocr_worker_count(num_workers))
+    
+    yield from pages
+
+def extract_text_with_metadata(pdf_path: str, num_workers: Optional[int] = None,
+                               ocr: Optional[bool] = None, page_spec: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Extracts text and metadata from PDF pages with smart handling of visual content.
+    """
+    return list(iter_text_with_metadata(pdf_path, num_workers=num_workers, ocr=ocr, page_spec=page_spec))
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 
 def display_page_samples(extracted_data: List[Dict[str, Any]], sample_size: int = 7):
     """
@@ -60,36 +60,46 @@ def display_page_samples(extracted_data: List[Dict[str, Any]], sample_size: int
             
             print(f"{'-'*60}")
 
-def generate_summary_stats(extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Generate summary statistics about the extracted data."""
-    total_pages = len(extracted_data)
+def create_summary_stats() -> Dict[str, Any]:
+    """Create an empty summary statistics record to be filled page by page."""
+    return {
+        'total_pages': 0,
+        'content_types': {},
+        'visual_references': 0,
+        'pages_with_images': 0,
+        'total_text_length': 0,
+        'average_text_length': 0
+    }
+
+def update_summary_stats(stats: Dict[str, Any], page: Dict[str, Any]):
+    """Fold a single extracted page into the running summary statistics."""
+    stats['total_pages'] += 1
     
     # Count by content type
-    content_types = {}
-    visual_references = 0
-    pages_with_images = 0
-    total_text_length = 0
+    content_type = page.get('content_type', 'unknown')
+    stats['content_types'][content_type] = stats['content_types'].get(content_type, 0) + 1
     
-    for page in extracted_data:
-        content_type = page.get('content_type', 'unknown')
-        content_types[content_type] = content_types.get(content_type, 0) + 1
-        
-        if page.get('is_visual_reference', False):
-            visual_references += 1
-        
-        if page.get('has_images', False):
-            pages_with_images += 1
-        
-        total_text_length += len(page['text'])
+    if page.get('is_visual_reference', False):
+        stats['visual_references'] += 1
     
-    return {
-        'total_pages': total_pages,
-        'content_types': content_types,
-        'visual_references': visual_references,
-        'pages_with_images': pages_with_images,
-        'total_text_length': total_text_length,
-        'average_text_length': total_text_length / total_pages if total_pages > 0 else 0
-    }
+    if page.get('has_images', False):
+        stats['pages_with_images'] += 1
+    
+    stats['total_text_length'] += len(page['text'])
+    stats['average_text_length'] = stats['total_text_length'] / stats['total_pages']
+
+def track_summary_stats(pages: Iterable[Dict[str, Any]], stats: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Pass pages through unchanged while updating the summary statistics, for streaming runs."""
+    for page in pages:
+        update_summary_stats(stats, page)
+        yield page
+
+def generate_summary_stats(extracted_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Generate summary statistics about the extracted data."""
+    stats = create_summary_stats()
+    for page in extracted_data:
+        update_summary_stats(stats, page)
+    return stats
 
 def print_summary_stats(stats: Dict[str, Any]):
     """Print formatted summary statistics."""
@@ -0,0 +1,224 @@
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from src.config import (RETRIEVAL_TOP_K, QUERY_EMBEDDING_CACHE_SIZE, RETRIEVAL_RESULT_CACHE_SIZE,
+                        INGEST_STAMP_PATH, HYBRID_CANDIDATES)
+from src.lexical_index import LexicalIndex, load_lexical_index, reciprocal_rank_fusion
+from src.metadata_index import MetadataIndex, load_metadata_index
+from src.numpy_store import NumpyVectorStore
+
+# Retrieval paths that answer a query without embedding it
+LOOKUP_PATHS = {"metadata", "lexical"}
+
+def normalize_query(query: str) -> str:
+    """Cache key of a question: lowercased, whitespace collapsed, trailing ?/./! dropped."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?.! ")
+
+def read_ingest_stamp() -> Optional[str]:
+    """The stamp of the last ingest run that changed the collection, or None if there was none."""
+    try:
+        with open(INGEST_STAMP_PATH, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def bump_ingest_stamp():
+    """
+    Records that the collection changed. The stamp is replaced atomically, so retrievers
+    in other processes (e.g. the Streamlit app) see either the old or the new stamp.
+    """
+    os.makedirs(os.path.dirname(INGEST_STAMP_PATH) or ".", exist_ok=True)
+    temporary_path = f"{INGEST_STAMP_PATH}.{uuid.uuid4().hex}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.write(f"{datetime.now().isoformat()} {uuid.uuid4().hex}")
+    os.replace(temporary_path, INGEST_STAMP_PATH)
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache with hit and miss counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+class CachedRetriever(BaseRetriever):
+    """
+    Top-k retriever over the Chroma collection that caches, per normalised question,
+    the query embedding and the IDs of the retrieved chunks. A repeated question is
+    answered with one lookup by ID instead of an embedding pass and a vector search.
+
+    With metadata_lookup, a query naming a page, article or section ("page 46",
+    "Article 7") is answered first from the metadata index, by dictionary lookups.
+    With hybrid, the vector ranking is fused with a BM25 ranking from the lexical index
+    by reciprocal rank fusion, and keyword lookups such as "Tanding" are answered
+    from the lexical index alone, without embedding the query.
+
+    vector_store is the Chroma store or a NumpyVectorStore copy of it for exact search.
+    The caches are dropped, and the indexes and NumPy copy reloaded, whenever the ingest stamp
+    changes, i.e. after an ingest run wrote to or deleted from the collection (possibly
+    with another embedding model).
+    """
+    vector_store: Any
+    embeddings: Embeddings
+    k: int = RETRIEVAL_TOP_K
+    embedding_cache: LRUCache
+    result_cache: LRUCache
+    ingest_stamp: Optional[str] = None
+    invalidations: int = 0
+    hybrid: bool = False
+    lexical_index: Optional[LexicalIndex] = None
+    metadata_lookup: bool = False
+    metadata_index: Optional[MetadataIndex] = None
+    searches: Dict[str, int] = {}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def __init__(self, vector_store, embeddings: Embeddings, k: int = RETRIEVAL_TOP_K,
+                 embedding_cache_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 result_cache_size: int = RETRIEVAL_RESULT_CACHE_SIZE, hybrid: bool = False,
+                 metadata_lookup: bool = False, **kwargs: Any):
+        ingest_stamp = read_ingest_stamp()
+        super().__init__(vector_store=vector_store, embeddings=embeddings, k=k,
+                         embedding_cache=LRUCache(embedding_cache_size),
+                         result_cache=LRUCache(result_cache_size),
+                         ingest_stamp=ingest_stamp, hybrid=hybrid,
+                         lexical_index=load_lexical_index(vector_store, ingest_stamp) if hybrid else None,
+                         metadata_lookup=metadata_lookup,
+                         metadata_index=load_metadata_index(vector_store, ingest_stamp) if metadata_lookup else None,
+                         searches={"metadata": 0, "lexical": 0, "vector": 0, "hybrid": 0}, **kwargs)
+
+    def _check_ingest_stamp(self):
+        """Drops both caches, and reloads the indexes and vectors, if the collection changed since they were filled."""
+        stamp = read_ingest_stamp()
+        if stamp != self.ingest_stamp:
+            self.embedding_cache.clear()
+            self.result_cache.clear()
+            self.ingest_stamp = stamp
+            self.invalidations += 1
+            if isinstance(self.vector_store, NumpyVectorStore):
+                self.vector_store.refresh(stamp)
+            if self.hybrid:
+                self.lexical_index = load_lexical_index(self.vector_store, stamp)
+            if self.metadata_lookup:
+                self.metadata_index = load_metadata_index(self.vector_store, stamp)
+
+    def _fetch_by_ids(self, ids: List[str]) -> Optional[List[Document]]:
+        """The cached chunks in their ranked order, or None if any of them is gone."""
+        found = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {chunk_id: Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+                 for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])}
+        if len(by_id) != len(ids):
+            return None
+        return [by_id[chunk_id] for chunk_id in ids]
+
+    def embed_query(self, query: str) -> List[float]:
+        """The question's embedding, from the cache when it was asked before."""
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.embedding_cache.put(key, vector)
+        return vector
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.retrieve(query)[0]
+
+    def retrieve(self, query: str) -> Tuple[List[Document], str]:
+        """
+        The chunks for a query and the path that served them: "metadata" or "lexical"
+        (LOOKUP_PATHS, the query was not embedded), "vector" or "hybrid". A result served
+        from the cache reports the path that first produced it.
+        """
+        self._check_ingest_stamp()
+        if self.metadata_lookup:
+            ids = self.metadata_index.lookup(query, self.k)
+            documents = self._fetch_by_ids(ids) if ids else None
+            if documents is not None:
+                self.searches["metadata"] += 1
+                return documents, "metadata"
+
+        key = normalize_query(query)
+
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            ids, path = cached
+            documents = self._fetch_by_ids(ids)
+            if documents is not None:
+                return documents, path
+
+        documents = None
+        if self.hybrid:
+            ids, path = self._hybrid_search(query)
+            # None if the collection changed under the lexical index; then search by vector alone
+            documents = self._fetch_by_ids(ids) if ids else []
+        if documents is None:
+            documents, path = self._vector_search(query), "vector"
+        self.result_cache.put(key, ([document.id for document in documents], path))
+        return documents, path
+
+    def _vector_search(self, query: str) -> List[Document]:
+        self.searches["vector"] += 1
+        results = self.vector_store._collection.query(query_embeddings=[self.embed_query(query)], n_results=self.k,
+                                                      include=["documents", "metadatas"])
+        return [Document(page_content=text, metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata
+                in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])]
+
+    def _hybrid_search(self, query: str) -> Tuple[List[str], str]:
+        """Ranked chunk IDs and the path: BM25 alone for keyword lookups, else BM25 and vector ranks fused."""
+        if self.lexical_index.is_keyword_query(query):
+            lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, self.k)]
+            if lexical_ids:
+                self.searches["lexical"] += 1
+                return lexical_ids, "lexical"
+
+        self.searches["hybrid"] += 1
+        depth = max(self.k, HYBRID_CANDIDATES)
+        lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, depth)]
+        results = self.vector_store._collection.query(query_embeddings=[self.embed_query(query)],
+                                                      n_results=depth, include=[])
+        return reciprocal_rank_fusion([results["ids"][0], lexical_ids], self.k), "hybrid"
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit and miss counters of both caches, how often they were invalidated and the searches run."""
+        return {"query_embeddings": self.embedding_cache.stats(), "results": self.result_cache.stats(),
+                "invalidations": self.invalidations, "searches": dict(self.searches)}
@@ -1,26 +1,116 @@
 import re
-from typing import Dict, Any
-from src.config import BOILERPLATE_PATTERNS
+from typing import Dict, Any, List
+from src.config import BOILERPLATE_PATTERNS, PAGES_TO_SKIP
+
+_REGEX_METACHARACTERS = set(".^$*+?{}[]()|\\")
+_QUANTIFIERS = set("*+?{")
+_COUNTED_QUANTIFIER_RE = re.compile(r"\{\d*(,\d*)?\}")
+# Escapes followed by a code point or group number, and how many characters it may take
+_NUMBERED_ESCAPES = {"x": 2, "u": 4, "U": 8}
+
+def required_literal(pattern: str) -> str:
+    """
+    Longest run of plain characters that every match of `pattern` must contain, or ""
+    when none can be proven (top-level alternation, character classes only, ...).
+    Used as a cheap substring pre-check before running the regex.
+    """
+    if re.compile(pattern).flags & re.VERBOSE:
+        return ""  # Whitespace in the pattern is not literal
+    runs = []
+    current = []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            # \. \( etc. are literal; \d \s \b etc. are classes or assertions
+            literal = escaped if not escaped.isalnum() else None
+            i += 2
+            # \x41, \u00e9, \N{...}, \0 and \1 are single characters or backreferences;
+            # they end the run, and their digits or names are not literal text
+            if escaped in _NUMBERED_ESCAPES:
+                i += _NUMBERED_ESCAPES[escaped]
+            elif escaped == "N" and pattern.startswith("{", i):
+                i = pattern.find("}", i) + 1 or len(pattern)
+            elif escaped.isdigit():
+                while i < len(pattern) and pattern[i].isdigit():
+                    i += 1
+        else:
+            if char == "|" and depth == 0:
+                return ""
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == "{":
+                # {m,n} is a quantifier; anything else is a brace we don't try to read
+                quantifier = _COUNTED_QUANTIFIER_RE.match(pattern, i)
+                if quantifier is None:
+                    return ""
+                i = quantifier.end() - 1
+            elif char == "[":
+                # Skip the whole character class; a leading "]" or "^]" belongs to it
+                i += 2 if pattern.startswith("^", i + 1) else 1
+                if pattern.startswith("]", i):
+                    i += 1
+                while i < len(pattern) and pattern[i] != "]":
+                    i += 2 if pattern[i] == "\\" else 1
+                if i >= len(pattern):
+                    return ""
+            elif char not in _REGEX_METACHARACTERS:
+                literal = char
+            i += 1
+
+        if literal is not None and depth == 0:
+            if i < len(pattern) and pattern[i] in _QUANTIFIERS:
+                # The quantified character is optional or repeated: it ends the run
+                runs.append("".join(current))
+                current = []
+            else:
+                current.append(literal)
+        else:
+            runs.append("".join(current))
+            current = []
+    runs.append("".join(current))
+    return max(runs, key=len)
+
+# Compiled once at import. Patterns stay separate and run in order: a combined
+# alternation is slower in Python's re because it loses the literal-prefix search
+# each footer pattern gets on its own, and it could miss matches that only appear
+# once an earlier pattern has been removed. Each pattern is paired with its
+# casefolded required literal so pages that cannot match skip the scan.
+_BOILERPLATE_RES = [(re.compile(pattern, re.IGNORECASE | re.MULTILINE), required_literal(pattern).casefold())
+                    for pattern in BOILERPLATE_PATTERNS]
+_BLANK_LINES_RE = re.compile(r'\n\s*\n')
+# Tabs are turned into spaces first, so only runs of two or more spaces need the regex
+_SPACE_RUNS_RE = re.compile(r'  +')
+_PAGES_TO_SKIP = frozenset(PAGES_TO_SKIP)
 
 def clean_text(text: str) -> str:
     """Removes boilerplate patterns from the extracted text."""
     cleaned = text
-    for pattern in BOILERPLATE_PATTERNS:
-        cleaned = re.sub(pattern, "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
-    
+    folded = text.casefold()
+    for pattern, literal in _BOILERPLATE_RES:
+        if literal in folded:
+            cleaned = pattern.sub("", cleaned)
+
     # Remove excessive whitespace and normalize
-    cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)  # Normalize multiple newlines
-    cleaned = re.sub(r'[ \t]+', ' ', cleaned)      # Normalize spaces and tabs
-    cleaned = cleaned.strip()
-    
-    return cleaned
+    cleaned = _BLANK_LINES_RE.sub('\n\n', cleaned)  # Normalize multiple newlines
+    cleaned = cleaned.replace('\t', ' ')              # Normalize spaces and tabs
+    if '  ' in cleaned:
+        cleaned = _SPACE_RUNS_RE.sub(' ', cleaned)
+    return cleaned.strip()
+
+def clean_texts(texts: List[str]) -> List[str]:
+    """Cleans a batch of page texts. Same output as calling clean_text on each one."""
+    return [clean_text(text) for text in texts]
 
 def filter_page(page_number: int, text_content: str) -> bool:
     """Determines if a page should be included based on content and page number."""
-    from src.config import PAGES_TO_SKIP
-    
     # Check if page is in the explicit skip list
-    if page_number in PAGES_TO_SKIP:
+    if page_number in _PAGES_TO_SKIP:
         return False  # Skip this page
     
     return True  # Include this page
@@ -0,0 +1,49 @@
+from typing import List, Any
+
+from langchain.text_splitter import TextSplitter
+
+from src.embedding_scheduler import TokenBudgetEmbeddings
+
+class ModelTokenTextSplitter(TextSplitter):
+    """
+    Splits text into windows of the embedding model's own tokens.
+
+    The text is tokenized once with the model's fast tokenizer; chunk boundaries come
+    from the offset mapping, so every chunk is an exact slice of the original text.
+    The token IDs of each chunk are handed to the embeddings, which feed them to the
+    model directly instead of tokenizing the chunk again. Chunks never exceed the
+    model's input length once its special tokens are added.
+    """
+
+    def __init__(self, embeddings: TokenBudgetEmbeddings, chunk_size: int, chunk_overlap: int, **kwargs: Any):
+        # Leave room for the special tokens the model adds around every chunk; a capped chunk
+        # keeps the configured overlap ratio rather than overlapping almost entirely
+        capped_size = min(chunk_size, embeddings.max_content_tokens)
+        chunk_overlap = chunk_overlap * capped_size // chunk_size
+        kwargs.setdefault("length_function", self.count_tokens)
+        self.embeddings = embeddings
+        super().__init__(chunk_size=capped_size, chunk_overlap=min(chunk_overlap, capped_size - 1), **kwargs)
+
+    def count_tokens(self, text: str) -> int:
+        """Length of a text in model tokens, without special tokens or truncation."""
+        return len(self.embeddings.tokenizer(self.embeddings.prepare_text(text), add_special_tokens=False,
+                                             verbose=False)["input_ids"])
+
+    def split_text(self, text: str) -> List[str]:
+        # Whole pages are longer than the model input on purpose, so the length warning is silenced
+        encoding = self.embeddings.tokenizer(self.embeddings.prepare_text(text), add_special_tokens=False,
+                                             return_offsets_mapping=True, verbose=False)
+        token_ids = encoding["input_ids"]
+        offsets = encoding["offset_mapping"]
+
+        chunks = []
+        step = self._chunk_size - self._chunk_overlap
+        for start in range(0, len(token_ids), step):
+            stop = min(start + self._chunk_size, len(token_ids))
+            chunk = text[offsets[start][0]:offsets[stop - 1][1]]
+            if chunk.strip():
+                self.embeddings.remember_token_ids(chunk, token_ids[start:stop])
+                chunks.append(chunk)
+            if stop == len(token_ids):
+                break
+        return chunks
@@ -0,0 +1,32 @@
+import pytest
+import src.answer_cache as answer_cache
+import src.embedding_cache as embedding_cache
+import src.ingest_journal as ingest_journal
+import src.lexical_index as lexical_index
+import src.metadata_index as metadata_index
+import src.numpy_store as numpy_store
+import src.ocr as ocr
+import src.pdf_parser as pdf_parser
+import src.retrieval as retrieval
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Keep on-disk caches written during tests out of the real data/ directory."""
+    monkeypatch.setattr(pdf_parser, "PAGE_CACHE_DIR", str(tmp_path / "page_cache"))
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_DIR", str(tmp_path / "embedding_cache"))
+    monkeypatch.setattr(ingest_journal, "INGEST_JOURNAL_DIR", str(tmp_path / "journals"))
+    monkeypatch.setattr(retrieval, "INGEST_STAMP_PATH", str(tmp_path / "ingest_stamp"))
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_PATH", str(tmp_path / "answer_cache.jsonl"))
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_PATH", str(tmp_path / "lexical_index.npz"))
+    monkeypatch.setattr(metadata_index, "METADATA_INDEX_PATH", str(tmp_path / "metadata_index.json"))
+    monkeypatch.setattr(numpy_store, "NUMPY_STORE_DIR", str(tmp_path / "numpy_store"))
+
+@pytest.fixture(scope="session")
+def tiny_embedding_model_dir(tmp_path_factory):
+    """
+    A randomly initialised 2-layer BERT saved as a SentenceTransformer (64-token inputs),
+    so embedding code runs against a real tokenizer and model without downloads.
+    """
+    from benchmarks.synthetic_model import build_tiny_sentence_transformer
+    return build_tiny_sentence_transformer(str(tmp_path_factory.mktemp("tiny_model")))
@@ -0,0 +1,164 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.runnables import RunnableLambda
+import src.data_processor as data_processor
+from src.answer_cache import AnswerCache, retrieved_pages
+from src.lexical_index import build_lexical_index
+from src.metadata_index import build_metadata_index
+from src.retrieval import CachedRetriever, bump_ingest_stamp, read_ingest_stamp
+from rag_chain import cached_answer_chain
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+def docs(*pages):
+    return [Document(page_content=f"Article {page}", metadata={"page_number": page, "source_document": "rulebook.pdf"})
+            for page in pages]
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "answers.jsonl")
+
+def test_similar_question_over_the_same_pages_hits(cache_path, clock):
+    cache = AnswerCache(cache_path, similarity=0.9, clock=clock)
+    cache.store("What are the legal targets?", [1.0, 0.0, 0.1], docs(30, 31), "The torso. Source: Page 30")
+
+    hit = cache.lookup([1.0, 0.05, 0.1], docs(31, 30))
+    assert hit["answer"] == "The torso. Source: Page 30" and hit["similarity"] > 0.99
+    assert cache.lookup([0.0, 1.0, 0.0], docs(30, 31)) is None
+    assert cache.lookup([1.0, 0.05, 0.1], docs(30, 32)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_entries_expire_and_persist(cache_path, clock):
+    AnswerCache(cache_path, ttl_seconds=60, clock=clock).store("q", [1.0, 0.0], docs(30), "a")
+
+    assert AnswerCache(cache_path, ttl_seconds=60, clock=clock).lookup([1.0, 0.0], docs(30))["answer"] == "a"
+    assert AnswerCache(cache_path, namespace="other-llm", clock=clock).lookup([1.0, 0.0], docs(30)) is None
+    clock.now += 61
+    assert AnswerCache(cache_path, ttl_seconds=60, clock=clock).lookup([1.0, 0.0], docs(30)) is None
+    with open(cache_path, encoding="utf-8") as f:
+        assert f.read() == ""
+
+def test_reingest_invalidates_entries(cache_path, clock):
+    cache = AnswerCache(cache_path, clock=clock)
+    cache.store("q", [1.0, 0.0], docs(30), "a")
+    bump_ingest_stamp()
+    assert cache.lookup([1.0, 0.0], docs(30)) is None
+    assert cache.stats()["entries"] == 0
+
+def test_keyed_entries_need_the_same_question_and_pages(cache_path, clock):
+    cache = AnswerCache(cache_path, clock=clock)
+    cache.store("What is on page 30?", None, docs(30), "a")
+
+    assert cache.lookup(None, docs(30), "what is on page 30")["answer"] == "a"
+    assert cache.lookup(None, docs(30, 31), "What is on page 30?") is None
+    assert cache.lookup(None, docs(30), "What is on page 31?") is None
+    # Keyed entries have no embedding to compare against
+    assert cache.lookup([1.0, 0.0], docs(30)) is None
+
+def test_collapsed_chunks_count_all_their_pages():
+    document = Document(page_content="placeholder", metadata={"page_number": 46, "source_document": "rulebook.pdf",
+                                                              "covered_pages": "[46, 47, 52]"})
+    assert retrieved_pages([document]) == [("rulebook.pdf", 46), ("rulebook.pdf", 47), ("rulebook.pdf", 52)]
+
+def test_chain_skips_the_llm_for_a_repeated_question(tmp_path, monkeypatch, cache_path):
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    data_processor.process_and_store_data(
+        [{"text": f"Article {page}: bow to the referee.", "page_number": page, "source_document": "rulebook.pdf"}
+         for page in range(15, 20)], embedding_model=embeddings, vector_store=store)
+
+    prompts = []
+    generate = RunnableLambda(lambda inputs: prompts.append(inputs) or f"Answer {len(prompts)}")
+    chain = cached_answer_chain(CachedRetriever(store, embeddings, k=3), generate, AnswerCache(cache_path))
+
+    assert chain.invoke("Must I bow?") == "Answer 1"
+    assert chain.invoke("must i bow") == "Answer 1"
+    assert len(prompts) == 1 and "START OF DOCUMENT" in prompts[0]["context"]
+
+def test_chain_does_not_embed_lookup_queries(tmp_path, monkeypatch, cache_path):
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = CountingEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    data_processor.process_and_store_data(
+        [{"text": f"Article {page}: bow to the referee.", "page_number": page, "source_document": "rulebook.pdf"}
+         for page in range(15, 20)], embedding_model=embeddings, vector_store=store)
+    build_metadata_index(store, read_ingest_stamp())
+
+    prompts = []
+    generate = RunnableLambda(lambda inputs: prompts.append(inputs) or f"Answer {len(prompts)}")
+    retriever = CachedRetriever(store, embeddings, k=3, metadata_lookup=True)
+    chain = cached_answer_chain(retriever, generate, AnswerCache(cache_path))
+
+    assert chain.invoke("What is on page 16?") == "Answer 1"
+    assert chain.invoke("what is on page 16") == "Answer 1"
+    assert chain.invoke("What is on page 17?") == "Answer 2"
+    assert embeddings.queries == 0
+
+def test_chain_embeds_keyword_queries_so_paraphrases_share_an_answer(tmp_path, monkeypatch, cache_path):
+    class ParaphraseEmbeddings(CountingEmbeddings):
+        def embed_query(self, text):
+            return super().embed_query("legal targets" if text == "valid target areas" else text)
+
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = ParaphraseEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    texts = ["Article 15: legal targets are the valid target areas of the body.",
+             "Article 16: bow to the referee.", "Article 17: matches last three rounds."]
+    data_processor.process_and_store_data(
+        [{"text": text, "page_number": page, "source_document": "rulebook.pdf"} for page, text in enumerate(texts, 15)],
+        embedding_model=embeddings, vector_store=store)
+    build_lexical_index(store, read_ingest_stamp())
+
+    prompts = []
+    generate = RunnableLambda(lambda inputs: prompts.append(inputs) or f"Answer {len(prompts)}")
+    retriever = CachedRetriever(store, embeddings, k=3, hybrid=True)
+    chain = cached_answer_chain(retriever, generate, AnswerCache(cache_path))
+
+    assert retriever.retrieve("legal targets")[1] == "lexical"
+    assert retriever.retrieve("valid target areas")[1] == "lexical"
+    assert chain.invoke("legal targets") == "Answer 1"
+    assert chain.invoke("valid target areas") == "Answer 1"
+    assert len(prompts) == 1 and embeddings.queries == 2
+
+def test_concurrent_rewrites_do_not_collide(cache_path):
+    """Sessions on separate threads, each with its own cache object, rewrite the same file."""
+    caches = [AnswerCache(cache_path) for _ in range(4)]
+    for cache in caches:
+        cache.store("How long is a round?", [1.0, 0.0], docs(21), "Two minutes.")
+
+    def rewrite(cache):
+        for _ in range(200):
+            with cache._lock:
+                cache._rewrite()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(rewrite, caches))
+    assert AnswerCache(cache_path).lookup([1.0, 0.0], docs(21))["answer"] == "Two minutes."
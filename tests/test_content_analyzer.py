@@ -0,0 +1,54 @@
+import pytest
+import fitz  # PyMuPDF
+from PIL import Image
+from src.content_analyzer import analyze_page_content, analyze_page_content_fast, count_vector_drawings
+
+@pytest.fixture(scope="module")
+def mixed_pdf(tmp_path_factory):
+    """Open a PDF with one page of each content type the analyzer distinguishes."""
+    tmp_dir = tmp_path_factory.mktemp("analyzer")
+    img_path = str(tmp_dir / "image.png")
+    Image.new('RGB', (50, 50), color='blue').save(img_path)
+
+    diagram = fitz.open()
+    diagram_page = diagram.new_page()
+    shape = diagram_page.new_shape()
+    for i in range(300):
+        shape.draw_rect(fitz.Rect(10 + i % 30 * 15, 10 + i // 30 * 15, 20 + i % 30 * 15, 20 + i // 30 * 15))
+        shape.finish(color=(0, 0, 0), fill=(1, 0, 0) if i % 3 else None)
+    shape.commit()
+
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 72), "Text only. " * 40, fontsize=6)               # text_only
+    doc.new_page()                                                                     # minimal_content
+    doc.insert_pdf(diagram)                                                            # visual_heavy (drawings)
+    doc.new_page().insert_image(fitz.Rect(50, 50, 150, 150), filename=img_path)       # visual_heavy (image)
+    page = doc.new_page()                                                              # mixed_content
+    page.insert_text((50, 72), "Text with a line. " * 20, fontsize=6)
+    page.draw_line((50, 200), (300, 200))
+    doc.new_page().show_pdf_page(fitz.Rect(0, 0, 300, 400), diagram, 0)               # drawings in a form XObject
+
+    # Literal strings full of operator-like letters must not be counted as paths
+    page = doc.new_page()
+    page.insert_text((50, 50), "x", fontname="helv")
+    doc.update_stream(page.get_contents()[0], b"BT /helv 12 Tf 50 50 Td (f S B \\( b* \\) F) Tj ET")
+
+    yield doc
+    doc.close()
+
+def test_fast_analysis_matches_full_analysis(mixed_pdf):
+    """The fast classifier should give the same labels and counts as the get_drawings() version."""
+    for page in mixed_pdf:
+        text = page.get_text()
+        assert analyze_page_content_fast(page, text) == analyze_page_content(page, text), f"Page {page.number + 1}"
+
+def test_expected_labels(mixed_pdf):
+    """Sanity check the fixture covers the interesting content types."""
+    labels = [analyze_page_content_fast(page, page.get_text())["content_type"] for page in mixed_pdf]
+    assert labels[:6] == ["text_only", "minimal_content", "visual_heavy", "visual_heavy", "mixed_content", "visual_heavy"]
+
+def test_drawing_count_stops_at_limit(mixed_pdf):
+    """With a limit the scan exits early but still reports that drawings exist."""
+    assert count_vector_drawings(mixed_pdf[2]) == 300
+    assert count_vector_drawings(mixed_pdf[2], limit=25) == 25
+    assert analyze_page_content_fast(mixed_pdf[2], "", drawing_limit=1)["content_type"] == "visual_heavy"
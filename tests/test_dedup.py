@@ -0,0 +1,105 @@
+import json
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.content_analyzer import create_visual_content_placeholder
+from src.dedup import NearDuplicateIndex, minhash_signature, estimated_similarity, shingles
+from rag_chain import format_docs
+
+def placeholder_page(page_number, drawings=1200):
+    analysis = {"content_type": "visual_heavy", "content_description": "Contains 1 images; Has complex diagrams/tables",
+                "image_count": 1, "drawing_count": drawings}
+    return {"text": create_visual_content_placeholder(page_number, analysis), "page_number": page_number,
+            "source_document": "rulebook.pdf", "content_type": "visual_heavy", "is_visual_reference": True}
+
+def text_page(page_number, text):
+    return {"text": text, "page_number": page_number, "source_document": "rulebook.pdf",
+            "content_type": "text_only", "is_visual_reference": False}
+
+RULES = [
+    "Article 12: The pesilat loses a point when stepping out of the arena twice in one round.",
+    "Article 13: A punch to the chest counts as one point if it is delivered with power and balance.",
+    "Article 14: Referees meet before each session to agree on the warnings given so far.",
+]
+
+def test_signature_estimates_jaccard_similarity():
+    text_a = "the pesilat must bow to the referee before every round of tanding " * 4
+    text_b = text_a.replace("referee", "judges")
+    exact = len(set(shingles(text_a)) & set(shingles(text_b))) / len(set(shingles(text_a)) | set(shingles(text_b)))
+    estimate = estimated_similarity(minhash_signature(text_a), minhash_signature(text_b))
+    assert abs(estimate - exact) < 0.12
+    assert estimated_similarity(minhash_signature(text_a), minhash_signature(text_a)) == 1.0
+
+def test_placeholders_collapse_and_distinct_rules_stay():
+    pages = [placeholder_page(page) for page in (46, 47, 52)] + [text_page(60 + i, rule) for i, rule in enumerate(RULES)]
+    chunks = data_processor.prepare_documents_for_chroma(pages)
+    index = NearDuplicateIndex()
+    kept, kept_ids = index.collapse(chunks, [f"id{i}" for i in range(len(chunks))])
+
+    assert kept_ids == ["id0", "id3", "id4", "id5"]
+    assert json.loads(kept[0].metadata["covered_pages"]) == [46, 47, 52]
+    assert kept[0].metadata["duplicate_count"] == 2
+    report = index.report()
+    assert (report["chunks"], report["collapsed"], report["groups"]) == (6, 2, 1)
+    assert report["text_bytes_saved"] > 1000
+
+def test_text_never_collapses_into_placeholders():
+    """Only chunks of the same kind and document are compared."""
+    placeholder = placeholder_page(46)
+    chunks = data_processor.prepare_documents_for_chroma([placeholder, text_page(47, placeholder["text"])])
+    kept, _ = NearDuplicateIndex().collapse(chunks, ["a", "b"])
+    assert len(kept) == 2
+
+class UpdatingVectorStore:
+    """Stands in for Chroma, including metadata-only updates."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+
+    def __init__(self):
+        self.metadatas = {}
+
+    @property
+    def _collection(self):
+        return self
+
+    @property
+    def _client(self):
+        return self
+
+    def get_max_batch_size(self):
+        return 5461
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.metadatas.update(zip(ids, [dict(metadata) for metadata in metadatas]))
+
+    def update(self, ids, metadatas):
+        self.metadatas.update(zip(ids, [dict(metadata) for metadata in metadatas]))
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is not None:
+            return {"ids": [chunk_id for chunk_id in ids if chunk_id in self.metadatas], "metadatas": []}
+        found = [chunk_id for chunk_id, metadata in self.metadatas.items()
+                 if all(metadata.get(key) == value for key, value in where.items())]
+        return {"ids": found, "metadatas": [self.metadatas[chunk_id] for chunk_id in found]}
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.metadatas[chunk_id]
+
+def test_streamed_duplicates_update_earlier_chunks(monkeypatch):
+    """A duplicate in a later batch extends the covered_pages of the chunk already stored."""
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    store = UpdatingVectorStore()
+    pages = [placeholder_page(46), text_page(47, RULES[0]), placeholder_page(48, drawings=1300)]
+    dedup_stats = {}
+    chunk_ids = data_processor.stream_and_store_data(iter(pages), batch_pages=2, max_inflight=1,
+                                                     embedding_model=object(), vector_store=store,
+                                                     dedup=True, dedup_stats=dedup_stats)
+
+    assert len(chunk_ids) == 2 and set(store.metadatas) == set(chunk_ids)
+    assert json.loads(store.metadatas[chunk_ids[0]]["covered_pages"]) == [46, 48]
+    assert dedup_stats["collapsed"] == 1
+
+    context = format_docs([Document(page_content="placeholder", metadata=store.metadatas[chunk_ids[0]])])
+    assert "also appears on pages 48" in context
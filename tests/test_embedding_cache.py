@@ -0,0 +1,84 @@
+import os
+import pytest
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import CachedEmbeddings
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic 4-d vectors; records every text it is asked to embed."""
+    def __init__(self, dim=4):
+        self.dim = dim
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 0.5, -1.0][:self.dim] + [0.0] * (self.dim - 4)
+                for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_only_unseen_texts_are_embedded(tmp_path):
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base, "test-model", True, cache_dir=str(tmp_path))
+
+    first = cache.embed_documents(["Article 1", "Article 2", "Article 1"])
+    assert base.embedded == ["Article 1", "Article 2"]
+    assert first == base.embed_documents(["Article 1", "Article 2", "Article 1"])
+
+    base.embedded.clear()
+    assert cache.embed_documents(["Article 2", "Article 3"]) == [first[1], base.embed_documents(["Article 3"])[0]]
+    assert base.embedded == ["Article 3", "Article 3"]
+
+def test_cache_persists_across_instances(tmp_path):
+    texts = [f"Rule {i}: the pesilat bows to the referee." for i in range(50)]
+    vectors = CachedEmbeddings(CountingEmbeddings(), "test-model", True, cache_dir=str(tmp_path)).embed_documents(texts)
+
+    base = CountingEmbeddings()
+    reopened = CachedEmbeddings(base, "test-model", True, cache_dir=str(tmp_path))
+    assert reopened.embed_documents(texts[::-1]) == vectors[::-1]
+    assert base.embedded == []
+    assert reopened.hits == 50 and reopened.misses == 0
+
+def test_model_and_normalisation_are_part_of_the_key(tmp_path):
+    CachedEmbeddings(CountingEmbeddings(), "model-a", True, cache_dir=str(tmp_path)).embed_documents(["text"])
+
+    for model_name, normalize in [("model-b", True), ("model-a", False)]:
+        base = CountingEmbeddings()
+        CachedEmbeddings(base, model_name, normalize, cache_dir=str(tmp_path)).embed_documents(["text"])
+        assert base.embedded == ["text"]
+
+def test_interrupted_append_is_repaired(tmp_path):
+    cache = CachedEmbeddings(CountingEmbeddings(), "test-model", True, cache_dir=str(tmp_path))
+    vectors = cache.embed_documents(["a", "b"])
+    # Simulate a crash after half a vector was written and before its key
+    with open(os.path.join(cache.cache_dir, "vectors.f32"), "ab") as f:
+        f.write(b"\0" * 6)
+
+    base = CountingEmbeddings()
+    reopened = CachedEmbeddings(base, "test-model", True, cache_dir=str(tmp_path))
+    assert reopened.embed_documents(["a", "c", "b"])[::2] == vectors
+    assert base.embedded == ["c"]
+    assert CachedEmbeddings(CountingEmbeddings(), "test-model", True,
+                            cache_dir=str(tmp_path)).embed_documents(["c"]) == base.embed_documents(["c"])
+
+@pytest.mark.parametrize("lost_file", ["meta.json", "keys.bin", "vectors.f32"])
+def test_interrupted_first_write_starts_the_cache_over(tmp_path, lost_file):
+    cache = CachedEmbeddings(CountingEmbeddings(), "test-model", True, cache_dir=str(tmp_path))
+    cache.embed_documents(["a", "b"])
+    # Simulate a crash before the cache's first write was complete
+    os.remove(os.path.join(cache.cache_dir, lost_file))
+
+    base = CountingEmbeddings()
+    reopened = CachedEmbeddings(base, "test-model", True, cache_dir=str(tmp_path))
+    assert reopened.embed_documents(["b", "c"]) == base.embed_documents(["b", "c"])
+    assert base.embedded == ["b", "c"] * 2
+    assert os.path.getsize(os.path.join(cache.cache_dir, "keys.bin")) == 2 * 32
+
+    base = CountingEmbeddings()
+    CachedEmbeddings(base, "test-model", True, cache_dir=str(tmp_path)).embed_documents(["b", "c"])
+    assert base.embedded == []
+
+def test_dimension_change_is_an_error(tmp_path):
+    CachedEmbeddings(CountingEmbeddings(dim=4), "test-model", True, cache_dir=str(tmp_path)).embed_documents(["a"])
+    with pytest.raises(ValueError):
+        CachedEmbeddings(CountingEmbeddings(dim=6), "test-model", True, cache_dir=str(tmp_path)).embed_documents(["b"])
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pytest
+import src.onnx_embeddings as onnx_embeddings
+from src.data_processor import create_token_budget_embeddings
+from src.embedding_pool import EmbeddingPool
+from src.onnx_embeddings import onnx_model_path
+
+TEXTS = ["bow twice", "the pesilat must salute the referee", "the arena " * 30, "article 12",
+         "a technique scores when it lands cleanly on a legal target area", "page 7"]
+
+@pytest.fixture(scope="module")
+def local_embeddings(tiny_embedding_model_dir):
+    return create_token_budget_embeddings(tiny_embedding_model_dir, "torch", device="cpu")
+
+def test_pool_matches_in_process_embeddings(local_embeddings, tiny_embedding_model_dir):
+    expected = np.array(local_embeddings.embed_documents(TEXTS))
+
+    pooled = create_token_budget_embeddings(tiny_embedding_model_dir, "torch", device="cpu")
+    # Tiny batches so several are spread over the workers
+    pooled.max_batch_size = 2
+    with EmbeddingPool(tiny_embedding_model_dir, num_workers=2, threads_per_worker=1) as pool:
+        pooled.pool = pool
+        vectors = np.array(pooled.embed_documents(TEXTS))
+        assert pooled.stats["batches"] == 3
+        # Order is kept across calls on the same pool
+        again = np.array(pooled.embed_documents(list(reversed(TEXTS))))
+
+    assert np.allclose(vectors, expected, atol=1e-5)
+    assert np.allclose(again, expected[::-1], atol=1e-5)
+
+def test_pool_splits_cores_between_workers(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    assert EmbeddingPool("model", num_workers=3).threads_per_worker == 2
+    assert EmbeddingPool("model", num_workers=16).threads_per_worker == 1
+    assert EmbeddingPool("model", num_workers=2, threads_per_worker=3).threads_per_worker == 3
+
+def test_onnx_pool_exports_the_model_once_before_starting_workers(local_embeddings, tiny_embedding_model_dir,
+                                                                   tmp_path, monkeypatch):
+    exports = []
+    export = onnx_embeddings.export_onnx_model
+    monkeypatch.setattr(onnx_embeddings, "export_onnx_model", lambda *args: exports.append(args) or export(*args))
+
+    with EmbeddingPool(tiny_embedding_model_dir, num_workers=2, threads_per_worker=1, backend="onnx",
+                       quantize=False, model_dir=str(tmp_path)) as pool:
+        batches = [local_embeddings.token_ids(TEXTS[:3]), local_embeddings.token_ids(TEXTS[3:])]
+        vectors = np.array([vector for batch in pool.encode_batches(batches) for vector in batch])
+
+    # Exported in this process; the workers found it on disk
+    assert len(exports) == 1
+    assert os.path.exists(onnx_model_path(tiny_embedding_model_dir, False, str(tmp_path)))
+    expected = np.array(local_embeddings.embed_documents(TEXTS))
+    assert (np.sum(vectors * expected, axis=1) >= 0.9999).all()
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import PreTrainedTokenizerFast
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from src.embedding_scheduler import TokenBudgetEmbeddings, plan_token_batches
+
+@pytest.fixture
+def tiny_embeddings(tiny_embedding_model_dir):
+    """The tiny test model behind the same HuggingFaceEmbeddings settings get_embeddings_model() uses."""
+    return HuggingFaceEmbeddings(model_name=tiny_embedding_model_dir, model_kwargs={"device": "cpu"},
+                                 encode_kwargs={"normalize_embeddings": True})
+
+def test_plan_token_batches_respects_budget():
+    token_counts = [5, 400, 12, 390, 8, 7, 1000, 6]
+    batches = plan_token_batches(token_counts, max_batch_tokens=800, max_batch_size=3)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(token_counts)))
+    assert batches[0] == [6]  # Longer than the budget, so alone
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) == 1 or len(batch) * max(token_counts[i] for i in batch) <= 800
+    # Similar lengths end up together
+    assert [1, 3] in batches
+
+def test_embed_documents_matches_model_and_restores_order(tiny_embeddings):
+    embeddings = TokenBudgetEmbeddings(tiny_embeddings, max_batch_tokens=120, max_batch_size=4)
+    texts = ["the pesilat " * 10, "bow", "article 12:\nthe referee " * 12, "salute twice",
+             "rule 7 on legal\ntarget area " * 3, "a b", "the arena " * 40]
+
+    vectors = embeddings.embed_documents(texts)
+
+    reference = tiny_embeddings.embed_documents(texts)
+    assert np.allclose(vectors, reference, atol=1e-5)
+    # The longest text is truncated to the 64-token model input, like the model itself does
+    assert max(embeddings.count_tokens(texts)) == 64
+    assert embeddings.stats["texts"] == len(texts)
+    assert embeddings.stats["batches"] > 1
+    assert 0 <= embeddings.throughput()["padding_ratio"] < 1
+
+def test_remembered_token_ids_skip_tokenization(tiny_embeddings, monkeypatch):
+    embeddings = TokenBudgetEmbeddings(tiny_embeddings)
+    text = "the pesilat must salute the referee"
+    token_ids = embeddings.tokenizer(text, add_special_tokens=False)["input_ids"]
+    expected = embeddings.embed_documents([text])
+
+    embeddings.remember_token_ids(text, token_ids)
+    monkeypatch.setattr(type(tiny_embeddings.client.tokenizer), "__call__",
+                        lambda *args, **kwargs: pytest.fail("text was tokenized again"))
+    assert embeddings.embed_documents([text]) == expected
+
+def test_empty_input_and_query_passthrough(tiny_embeddings):
+    embeddings = TokenBudgetEmbeddings(tiny_embeddings)
+    assert embeddings.embed_documents([]) == []
+    assert embeddings.embed_query("what is a pesilat?") == tiny_embeddings.embed_query("what is a pesilat?")
+
+def test_special_tokens_come_from_the_post_processor():
+    """Qwen3-style tokenizers append their end-of-text token in the post-processor, not in Python."""
+    backend = Tokenizer(models.WordLevel({"<eos>": 0, "<pad>": 1, "bow": 2, "twice": 3, "salute": 4},
+                                         unk_token="<pad>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(single="$A <eos>", special_tokens=[("<eos>", 0)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, eos_token="<eos>", pad_token="<pad>")
+
+    model_inputs = []
+
+    class LastTokenClient:
+        device = "cpu"
+        max_seq_length = 16
+
+        def __init__(self):
+            self.tokenizer = tokenizer
+
+        def __call__(self, features):
+            model_inputs.extend(ids[mask.bool()].tolist() for ids, mask
+                                in zip(features["input_ids"], features["attention_mask"]))
+            return {"sentence_embedding": torch.ones(len(features["input_ids"]), 4)}
+
+    embeddings = TokenBudgetEmbeddings(SimpleNamespace(client=LastTokenClient(), encode_kwargs={}))
+    texts = ["bow twice", "salute"]
+    embeddings.embed_documents(texts)
+
+    assert embeddings.special_tokens == ([], [0])
+    assert sorted(model_inputs) == sorted(tokenizer(text)["input_ids"] for text in texts)
+    assert embeddings.count_tokens(texts) == [3, 2]
+    assert embeddings.max_content_tokens == 15
@@ -0,0 +1,139 @@
+import json
+from functools import partial
+import pytest
+import fitz  # PyMuPDF
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+import src.ingestion as ingestion
+from src.ingest_journal import IngestJournal
+from src.ingestion import ingest_document
+
+@pytest.fixture
+def rulebook_pdf_path(tmp_path):
+    """A 30-page text PDF; pages 1-14 fall in PAGES_TO_SKIP."""
+    pdf_path = str(tmp_path / "rulebook.pdf")
+    doc = fitz.open()
+    for page_index in range(30):
+        doc.new_page().insert_text((50, 72), f"Article {page_index + 1}: a pesilat must bow. " * 5, fontsize=8)
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
+
+# Placeholder for the shared embedding model; the store embeds with its own fake
+FAKE_EMBEDDINGS = object()
+
+class CrashingVectorStore:
+    """Stands in for Chroma; the write after `crash_after` writes raises, like a killed run."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.crash_on_delete = False
+        self.writes = []
+        self.ids = set()
+        self.metadatas = {}
+
+    @property
+    def _collection(self):
+        return self
+
+    @property
+    def _client(self):
+        return self
+
+    def get_max_batch_size(self):
+        return 5461
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if self.crash_after is not None and len(self.writes) == self.crash_after:
+            raise KeyboardInterrupt("killed")
+        self.writes.append([metadata["page_number"] for metadata in metadatas])
+        self.ids.update(ids)
+        self.metadatas.update(zip(ids, metadatas))
+
+    def get(self, ids=None, where=None, include=None):
+        if ids is None:
+            ids = [chunk_id for chunk_id in sorted(self.ids)
+                   if all(self.metadatas[chunk_id].get(key) == value for key, value in (where or {}).items())]
+        found = [chunk_id for chunk_id in ids if chunk_id in self.ids]
+        return {"ids": found, "metadatas": [self.metadatas[chunk_id] for chunk_id in found]}
+
+    def delete(self, ids):
+        if self.crash_on_delete:
+            raise KeyboardInterrupt("killed")
+        self.ids.difference_update(ids)
+
+@pytest.fixture
+def page_splitter(monkeypatch):
+    """One chunk per page, five pages per streamed batch."""
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    monkeypatch.setattr(ingestion, "stream_and_store_data",
+                        partial(data_processor.stream_and_store_data, batch_pages=5, max_inflight=1))
+
+def test_resume_skips_committed_batches(rulebook_pdf_path, page_splitter):
+    """An interrupted streaming run resumes after its last committed batch without rewriting chunks."""
+    store = CrashingVectorStore(crash_after=2)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1)
+    assert store.writes == [[15, 16, 17, 18, 19], [20, 21, 22, 23, 24]]
+
+    store.crash_after = None
+    manifest = ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1, resume=True)
+
+    assert manifest["resumed"] and manifest["status"] == "completed"
+    assert store.writes[2:] == [[25, 26, 27, 28, 29], [30]]
+    assert manifest["chunk_count"] == 16 and len(set(manifest["chunk_ids"])) == 16
+    assert set(manifest["chunk_ids"]) == store.ids
+    journal_path = IngestJournal("rulebook.pdf", {}).path
+    with open(journal_path, encoding="utf-8") as f:
+        batches = [record["batch"] for record in map(json.loads, f) if record["event"] == "batch"]
+    assert batches == [1, 2, 3, 4]
+
+def test_resume_after_the_last_batch_still_deletes_stale_chunks(rulebook_pdf_path, page_splitter):
+    """A run killed after committing every page removes stale chunks when it is resumed."""
+    store = CrashingVectorStore()
+    store.upsert(["rulebook.pdf:p15:old"], [[0.0] * 8], ["Old page 15"],
+                 [{"source_document": "rulebook.pdf", "page_number": 15}])
+    store.crash_on_delete = True
+    with pytest.raises(KeyboardInterrupt):
+        ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1)
+
+    store.crash_on_delete = False
+    manifest = ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1, resume=True)
+
+    assert manifest["resumed"] and manifest["chunk_count"] == 16
+    assert manifest["upsert"] == {"added": 0, "unchanged": 16, "deleted": 1}
+    assert store.ids == set(manifest["chunk_ids"])
+
+def test_finished_or_changed_runs_start_over(rulebook_pdf_path, page_splitter, monkeypatch):
+    """A completed journal, or one written under other settings, is never resumed."""
+    store = CrashingVectorStore(crash_after=1)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1)
+
+    monkeypatch.setattr(ingestion, "TOKEN_CHUNK_SIZE", 512)
+    store.crash_after = None
+    manifest = ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1, resume=True)
+    # Batch 1 is processed again instead of being skipped
+    assert not manifest["resumed"]
+    assert manifest["upsert"] == {"added": 11, "unchanged": 5, "deleted": 0}
+
+    manifest = ingest_document(rulebook_pdf_path, FAKE_EMBEDDINGS, store, stream=True, num_workers=1, resume=True)
+    assert not manifest["resumed"] and manifest["upsert"]["unchanged"] == 16
+
+def test_torn_last_record_is_ignored(tmp_path):
+    """A record cut short by a crash is dropped; the complete ones before it still count."""
+    journal = IngestJournal("rulebook.pdf", {"sha256": "abc"}, str(tmp_path))
+    journal.start()
+    journal.commit_batch(1, [15, 16], ["a", "b"], added=2)
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"event": "batch", "pages": [17]})[:20])
+
+    resumed = IngestJournal("rulebook.pdf", {"sha256": "abc"}, str(tmp_path))
+    assert resumed.start(resume=True)
+    assert resumed.committed_pages == {15, 16} and resumed.committed_chunk_ids == ["a", "b"]
+    resumed.commit_batch(2, [17], ["c"], added=1)
+    assert [record["event"] for record in resumed._read_records()[0]] == ["start", "batch", "resume", "batch"]
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import pytest
+import fitz  # PyMuPDF
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+import src.ingestion as ingestion
+import src.page_selection as page_selection
+from src.ingestion import resolve_pdf_paths, ingest_documents
+
+def build_pdf(pdf_path, pages, label):
+    """Write a text PDF whose pages mention the document label."""
+    doc = fitz.open()
+    for page_index in range(pages):
+        doc.new_page().insert_text((50, 72), f"{label} page {page_index + 1}. " * 10, fontsize=6)
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
+
+# Placeholder for the shared embedding model; the recording store embeds with its own fake
+FAKE_EMBEDDINGS = object()
+
+class RecordingVectorStore:
+    """Stands in for the shared Chroma collection."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+
+    def __init__(self):
+        self.chunks = {}
+        self.lock = threading.Lock()
+
+    @property
+    def _collection(self):
+        return self
+
+    @property
+    def _client(self):
+        return self
+
+    def get_max_batch_size(self):
+        return 5461
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.add_documents([Document(page_content=text, metadata=metadata or {})
+                            for text, metadata in zip(documents, metadatas)], ids)
+
+    def add_documents(self, documents, ids):
+        with self.lock:
+            self.chunks.update(zip(ids, documents))
+            return ids
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=0):
+        with self.lock:
+            if ids is not None:
+                found = [chunk_id for chunk_id in ids if chunk_id in self.chunks]
+            else:
+                found = [chunk_id for chunk_id, chunk in self.chunks.items()
+                         if all(chunk.metadata.get(key) == value for key, value in (where or {}).items())]
+                found = found[offset:offset + limit] if limit else found
+            return {"ids": found, "metadatas": [self.chunks[chunk_id].metadata for chunk_id in found],
+                    "documents": [self.chunks[chunk_id].page_content for chunk_id in found]}
+
+    def delete(self, ids):
+        with self.lock:
+            for chunk_id in ids:
+                del self.chunks[chunk_id]
+
+@pytest.fixture
+def collection_dir(tmp_path):
+    """A directory holding a rulebook and a circular, plus a non-PDF file."""
+    build_pdf(str(tmp_path / "rulebook.pdf"), 20, "Rulebook")
+    build_pdf(str(tmp_path / "circular_2024.pdf"), 18, "Circular")
+    (tmp_path / "notes.txt").write_text("not a pdf")
+    return tmp_path
+
+def test_resolve_pdf_paths(collection_dir):
+    """Directories, globs and plain files should expand to unique PDF paths."""
+    by_dir = resolve_pdf_paths([str(collection_dir)])
+    assert [os.path.basename(path) for path in by_dir] == ["circular_2024.pdf", "rulebook.pdf"]
+
+    by_glob = resolve_pdf_paths([str(collection_dir / "circ*.pdf"), str(collection_dir / "circular_2024.pdf")])
+    assert [os.path.basename(path) for path in by_glob] == ["circular_2024.pdf"]
+
+def test_same_named_pdfs_are_kept_apart(tmp_path, monkeypatch):
+    """rules.pdf in two folders under DOCUMENT_ROOT gets two document names; outside it, it is rejected."""
+    root = tmp_path / "data"
+    for version in ("v6", "v7"):
+        (root / version).mkdir(parents=True)
+        build_pdf(str(root / version / "rules.pdf"), 16, f"Rules {version}")
+    monkeypatch.setattr(page_selection, "DOCUMENT_ROOT", str(root))
+    store = RecordingVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings_model", lambda: FAKE_EMBEDDINGS)
+    monkeypatch.setattr(ingestion, "get_vector_store", lambda embedding_model: store)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+
+    pdf_paths = resolve_pdf_paths([str(root / "v6" / "rules.pdf"), str(root / "v7" / "rules.pdf")])
+    manifests = ingest_documents(pdf_paths, manifest_dir=str(tmp_path / "manifests"))
+    ingest_documents(pdf_paths[1:], manifest_dir=str(tmp_path / "manifests"))
+
+    assert [manifest["source_document"] for manifest in manifests] == ["v6/rules.pdf", "v7/rules.pdf"]
+    assert len({manifest["manifest_path"] for manifest in manifests}) == 2
+    # Re-ingesting v7 alone leaves v6's chunks alone
+    assert sorted(chunk.metadata["source_document"] for chunk in store.chunks.values()) == \
+        ["v6/rules.pdf"] * 2 + ["v7/rules.pdf"] * 2
+
+    monkeypatch.setattr(page_selection, "DOCUMENT_ROOT", str(tmp_path / "elsewhere"))
+    with pytest.raises(ValueError, match="rules.pdf"):
+        resolve_pdf_paths([str(root / "v6" / "rules.pdf"), str(root / "v7" / "rules.pdf")])
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_ingest_documents_writes_manifests(collection_dir, tmp_path, monkeypatch, stream):
+    """Each document should be tagged with its source and get a manifest listing its chunk IDs."""
+    store = RecordingVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings_model", lambda: FAKE_EMBEDDINGS)
+    monkeypatch.setattr(ingestion, "get_vector_store", lambda embedding_model: store)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+
+    manifest_dir = str(tmp_path / "manifests")
+    manifests = ingest_documents(resolve_pdf_paths([str(collection_dir)]), stream=stream,
+                                 max_concurrent=2, manifest_dir=manifest_dir)
+
+    assert [manifest["source_document"] for manifest in manifests] == ["circular_2024.pdf", "rulebook.pdf"]
+    # Pages 1-14 are skipped by PAGES_TO_SKIP
+    assert [manifest["pages"]["included"] for manifest in manifests] == [4, 6]
+    assert sorted(chunk.metadata["source_document"] for chunk in store.chunks.values()) == \
+        ["circular_2024.pdf"] * 4 + ["rulebook.pdf"] * 6
+
+    for manifest in manifests:
+        with open(manifest["manifest_path"], encoding="utf-8") as f:
+            on_disk = json.load(f)
+        assert on_disk["status"] == "completed"
+        assert on_disk["pages"]["total_in_pdf"] in (18, 20)
+        assert len(on_disk["chunk_ids"]) == on_disk["chunk_count"] == manifest["pages"]["included"]
+        assert on_disk["timings"]["total_seconds"] >= 0
+
+def test_failed_document_does_not_stop_others(collection_dir, tmp_path, monkeypatch):
+    """A corrupt PDF should get a 'failed' manifest while the rest are ingested."""
+    (collection_dir / "broken.pdf").write_bytes(b"not really a pdf")
+    store = RecordingVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings_model", lambda: FAKE_EMBEDDINGS)
+    monkeypatch.setattr(ingestion, "get_vector_store", lambda embedding_model: store)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+
+    manifests = ingest_documents(resolve_pdf_paths([str(collection_dir)]),
+                                 manifest_dir=str(tmp_path / "manifests"))
+
+    assert [manifest["status"] for manifest in manifests] == ["failed", "completed", "completed"]
+
+def test_reingest_does_not_duplicate_chunks(collection_dir, tmp_path, monkeypatch):
+    """Running the pipeline twice should leave the collection unchanged."""
+    store = RecordingVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings_model", lambda: FAKE_EMBEDDINGS)
+    monkeypatch.setattr(ingestion, "get_vector_store", lambda embedding_model: store)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    pdf_paths = resolve_pdf_paths([str(collection_dir)])
+
+    first = ingest_documents(pdf_paths, manifest_dir=str(tmp_path / "manifests"))
+    second = ingest_documents(pdf_paths, manifest_dir=str(tmp_path / "manifests"))
+
+    assert len(store.chunks) == 10
+    assert [manifest["chunk_ids"] for manifest in second] == [manifest["chunk_ids"] for manifest in first]
+    assert [manifest["upsert"] for manifest in second] == [{"added": 0, "unchanged": 4, "deleted": 0},
+                                                           {"added": 0, "unchanged": 6, "deleted": 0}]
+
+def test_emptied_document_loses_its_chunks(collection_dir, tmp_path, monkeypatch):
+    """A batch re-ingest that extracts no pages should still delete the document's old chunks."""
+    store = RecordingVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings_model", lambda: FAKE_EMBEDDINGS)
+    monkeypatch.setattr(ingestion, "get_vector_store", lambda embedding_model: store)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    pdf_path = str(collection_dir / "rulebook.pdf")
+    ingest_documents([pdf_path], manifest_dir=str(tmp_path / "manifests"))
+    assert len(store.chunks) == 6
+
+    # Pages 1-14 are skipped by PAGES_TO_SKIP, so nothing is extracted any more
+    build_pdf(pdf_path, 14, "Rulebook")
+    manifests = ingest_documents([pdf_path], manifest_dir=str(tmp_path / "manifests"))
+
+    assert manifests[0]["upsert"] == {"added": 0, "unchanged": 0, "deleted": 6}
+    assert store.chunks == {}
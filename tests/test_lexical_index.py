@@ -0,0 +1,83 @@
+import uuid
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.data_processor import process_and_store_data
+from src.lexical_index import LexicalIndex, build_lexical_index, reciprocal_rank_fusion, tokenize
+from src.retrieval import CachedRetriever, read_ingest_stamp
+
+TEXTS = [
+    "Article 12: a pesilat who leaves the arena twice receives a warning.",
+    "Article 13: Tanding matches last three rounds of two minutes.",
+    "Article 14: Tanding scoring uses punches, kicks and takedowns. Tanding referees confirm points.",
+    "Article 15: the seni category is judged on technique and expression.",
+]
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+def test_bm25_ranks_matching_chunks():
+    index = LexicalIndex.build(["a", "b", "c", "d"], TEXTS)
+    results = index.search("tanding", k=10)
+    assert [chunk_id for chunk_id, _ in results] == ["c", "b"]
+    assert index.search("article 12", k=1)[0][0] == "a"
+    assert index.search("unknown words", k=10) == []
+
+def test_index_round_trips_through_disk(tmp_path):
+    index = LexicalIndex.build(["a", "b", "c", "d"], TEXTS, ingest_stamp="stamp-1")
+    path = index.save(str(tmp_path / "lexical_index.npz"))
+    assert [entry.name for entry in tmp_path.iterdir()] == ["lexical_index.npz"]
+    loaded = LexicalIndex.load(path)
+    assert loaded.ingest_stamp == "stamp-1"
+    assert loaded.search("seni technique", k=2) == index.search("seni technique", k=2)
+
+def test_keyword_queries_take_the_fast_path():
+    index = LexicalIndex.build(["a", "b", "c", "d"], TEXTS)
+    assert index.is_keyword_query("Article 12")
+    assert index.is_keyword_query("Tanding")
+    assert not index.is_keyword_query("What happens in Tanding?")
+    assert not index.is_keyword_query("tanding penalties")  # "penalties" is not in the index
+    assert tokenize("Art. 12, Tanding") == ["art", "12", "tanding"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "e"]], k=3)
+    assert fused == ["b", "a", "d"]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = CountingEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    process_and_store_data([{"text": text, "page_number": 12 + i, "source_document": "rulebook.pdf"}
+                            for i, text in enumerate(TEXTS)], embedding_model=embeddings, vector_store=store)
+    build_lexical_index(store, read_ingest_stamp())
+    return store
+
+def test_hybrid_retriever(store):
+    retriever = CachedRetriever(store, store.embeddings, k=2, hybrid=True)
+
+    keyword = retriever.invoke("Tanding")
+    assert [doc.metadata["page_number"] for doc in keyword] == [14, 13]
+    assert store.embeddings.queries == 0
+
+    question = retriever.invoke("How is Tanding scored with punches?")
+    assert len(question) == 2 and question[0].metadata["page_number"] == 14
+    assert retriever.cache_stats()["searches"] == {"metadata": 0, "lexical": 1, "vector": 0, "hybrid": 1}
+
+def test_hybrid_retriever_follows_reingests(store):
+    retriever = CachedRetriever(store, store.embeddings, k=1, hybrid=True)
+    assert not retriever.lexical_index.is_keyword_query("Article 16")
+
+    # A new page is ingested without rebuilding the index; the retriever rebuilds it
+    process_and_store_data([{"text": "Article 16: the Gelanggang is a square arena.", "page_number": 16,
+                             "source_document": "circular.pdf"}], embedding_model=store.embeddings, vector_store=store)
+    assert [doc.metadata["page_number"] for doc in retriever.invoke("Article 16")] == [16]
+    assert retriever.cache_stats()["searches"]["lexical"] == 1
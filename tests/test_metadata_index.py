@@ -0,0 +1,95 @@
+import uuid
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.data_processor import process_and_store_data
+from src.metadata_index import MetadataIndex, build_metadata_index, parse_references
+from src.retrieval import CachedRetriever, read_ingest_stamp
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+PAGES = [
+    {"text": "CHAPTER III\nTANDING\nArticle 7: Tanding is a match between two pesilat.", "page_number": 20,
+     "content_type": "text_only"},
+    {"text": "The match lasts three rounds. See Article 9 for breaks.\nArticle 8: Rounds last two minutes.",
+     "page_number": 21, "content_type": "text_only"},
+    {"text": "PAGE 46 VISUAL CONTENT REFERENCE\nThis page contains primarily visual elements.", "page_number": 46,
+     "content_type": "visual_heavy", "is_visual_reference": True},
+]
+
+def test_parse_references():
+    assert parse_references("What does Article 7 say on page 20?") == [("article", "7"), ("page", "20")]
+    assert parse_references("pages 20-22") == [("page", "20"), ("page", "21"), ("page", "22")]
+    assert parse_references("Chapter III") == [("section", "chapter iii")]
+    assert parse_references("How is Tanding scored?") == []
+
+def test_lists_and_words_are_not_mistaken_for_references():
+    assert parse_references("pages 4 and 10") == [("page", "4"), ("page", "10")]
+    assert parse_references("pages 4-5, 9 & 12") == [("page", p) for p in ("4", "5", "9", "12")]
+    assert parse_references("In which section I can find the rules on fouls?") == []
+    assert parse_references("the part civil servants play") == []
+    assert parse_references("What is in Section I?") == [("section", "section i")]
+    assert parse_references("Chapter IV penalties") == [("section", "chapter iv")]
+
+def test_lookup_by_page_article_and_section():
+    texts = [page["text"] for page in PAGES]
+    metadatas = [{k: v for k, v in page.items() if k != "text"} for page in PAGES]
+    index = MetadataIndex.build(["p20", "p21", "p46"], texts, metadatas)
+
+    assert index.lookup("page 46", k=10) == ["p46"]
+    assert index.lookup("Article 8", k=10) == ["p21"]
+    # "See Article 9" is a cross-reference, not a heading
+    assert index.lookup("Article 9", k=10) is None
+    assert index.lookup("chapter iii", k=10) == ["p20"]
+    assert index.lookup("the table on pages 20-46", k=10) is None
+    assert index.lookup("the table on pages 40-46", k=10) == ["p46"]
+    assert index.lookup("How is Tanding scored?", k=10) is None
+    assert index.lookup("pages 20 and 46", k=10) == ["p20", "p46"]
+    # Questions about more than the reference are left to the search
+    assert index.lookup("What does Article 8 say about breaks between tanding rounds?", k=10) is None
+
+def test_lookup_across_documents():
+    chunks = [("rules.pdf", 46, "Article 7: Tanding."), ("archive/rules_v6.pdf", 46, "Article 7: Old tanding."),
+              ("circular_2024.pdf", 46, "Article 7: Amended tanding."), ("circular_2024.pdf", 47, "Notes.")]
+    index = MetadataIndex.build([f"{name}:p{page}" for name, page, _ in chunks], [text for _, _, text in chunks],
+                                [{"source_document": name, "page_number": page} for name, page, _ in chunks])
+
+    # A page or article found in several documents is left to the search unless the query names one
+    assert index.lookup("page 46", k=10) is None
+    assert index.lookup("Article 7", k=10) is None
+    assert index.lookup("page 46 of circular_2024.pdf", k=10) == ["circular_2024.pdf:p46"]
+    assert index.lookup("Article 7 in the rules_v6 document", k=10) == ["archive/rules_v6.pdf:p46"]
+    assert index.lookup("rules.pdf page 46", k=10) == ["rules.pdf:p46"]
+    # Only one document has page 47
+    assert index.lookup("page 47", k=10) == ["circular_2024.pdf:p47"]
+    assert index.lookup("page 47 of rules.pdf", k=10) is None
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = CountingEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    process_and_store_data([{**page, "source_document": "rulebook.pdf"} for page in PAGES],
+                           embedding_model=embeddings, vector_store=store)
+    build_metadata_index(store, read_ingest_stamp())
+    return store
+
+def test_retriever_answers_references_without_embedding(store):
+    retriever = CachedRetriever(store, store.embeddings, k=10, metadata_lookup=True)
+
+    assert [doc.metadata["page_number"] for doc in retriever.invoke("What is on page 46?")] == [46]
+    assert [doc.metadata["page_number"] for doc in retriever.invoke("Explain Article 7")] == [20]
+    assert store.embeddings.queries == 0
+    assert retriever.cache_stats()["searches"]["metadata"] == 2
+
+    retriever.invoke("How long is a round?")
+    assert store.embeddings.queries == 1
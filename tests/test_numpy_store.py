@@ -0,0 +1,108 @@
+import os
+import uuid
+import numpy as np
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.data_processor import process_and_store_data
+from src.numpy_store import NumpyVectorStore, export_numpy_store, load_numpy_store
+from src.retrieval import CachedRetriever, read_ingest_stamp
+
+TEXTS = [
+    "Article 12: a pesilat who leaves the arena twice receives a warning.",
+    "Article 13: Tanding matches last three rounds of two minutes.",
+    "Article 14: Tanding scoring uses punches, kicks and takedowns.",
+    "Article 15: the seni category is judged on technique and expression.",
+]
+
+class UnitEmbeddings(DeterministicFakeEmbedding):
+    """Normalised like the real embedding model, so Chroma's L2 ranking matches cosine."""
+
+    def _get_embedding(self, seed):
+        vector = np.array(super()._get_embedding(seed))
+        return list(vector / np.linalg.norm(vector))
+
+def random_store(directory, count=200, dimensions=16):
+    vectors = np.random.default_rng(0).normal(size=(count, dimensions)).astype(np.float32)
+    store = NumpyVectorStore(directory)
+    store.write([f"id-{i}" for i in range(count)], vectors, [f"text {i}" for i in range(count)],
+                [{"page_number": i} for i in range(count)], ingest_stamp="stamp-1")
+    return store, vectors
+
+def test_search_is_exact(tmp_path):
+    store, vectors = random_store(str(tmp_path / "store"))
+    queries = np.random.default_rng(1).normal(size=(5, 16)).astype(np.float32)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query, ranked in zip(queries, store.search_batch(queries, k=7)):
+        expected = np.argsort(-(unit @ (query / np.linalg.norm(query))))[:7]
+        assert [row for row, _ in ranked] == expected.tolist()
+        single = store.search(query, k=7)
+        assert [row for row, _ in single] == expected.tolist()
+        assert np.allclose([score for _, score in single], [score for _, score in ranked], atol=1e-5)
+    assert len(store.search(queries[0], k=1000)) == 200
+
+def test_store_reopens_memory_mapped(tmp_path):
+    store, _ = random_store(str(tmp_path / "store"))
+    reopened = NumpyVectorStore(str(tmp_path / "store"))
+    assert isinstance(reopened.matrix, np.memmap)
+    assert reopened.ingest_stamp == "stamp-1" and reopened.count() == 200
+    found = reopened.get(ids=["id-3", "missing", "id-1"], include=["documents", "metadatas"])
+    assert found["ids"] == ["id-3", "id-1"] and found["documents"] == ["text 3", "text 1"]
+    assert reopened.get(include=[], limit=5, offset=198)["ids"] == ["id-198", "id-199"]
+
+    # A rewrite replaces the vectors file; the old one is removed
+    store.write(["only"], np.ones((1, 16)), ["text"], [{}], ingest_stamp="stamp-2")
+    assert len(list((tmp_path / "store").glob("vectors-*.npy"))) == 1
+    assert store.refresh("stamp-2") is False
+    with pytest.raises(RuntimeError):
+        reopened.refresh("stamp-3")
+
+def test_rewrite_keeps_vectors_of_a_concurrent_write(tmp_path):
+    store, _ = random_store(str(tmp_path / "store"))
+    old_file = tmp_path / "store" / store.vectors_file
+    # Another exporter has saved its vectors file but not yet swapped in its sidecar
+    in_progress = tmp_path / "store" / "vectors-in-progress.npy"
+    np.save(in_progress, np.ones((1, 16), dtype=np.float32))
+    future = os.stat(old_file).st_mtime_ns + 3_600 * 10**9
+    os.utime(in_progress, ns=(future, future))
+
+    store.write(["only"], np.ones((1, 16)), ["text"], [{}], ingest_stamp="stamp-2")
+    remaining = sorted(path.name for path in (tmp_path / "store").iterdir())
+    assert remaining == sorted(["sidecar.json", store.vectors_file, "vectors-in-progress.npy"])
+    assert not old_file.exists()
+
+@pytest.fixture
+def chroma_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = UnitEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    process_and_store_data([{"text": text, "page_number": 12 + i, "source_document": "rulebook.pdf"}
+                            for i, text in enumerate(TEXTS)], embedding_model=embeddings, vector_store=store)
+    return store
+
+def test_retriever_on_numpy_store_matches_chroma(chroma_store):
+    numpy_store = export_numpy_store(chroma_store, read_ingest_stamp())
+    chroma_retriever = CachedRetriever(chroma_store, chroma_store.embeddings, k=3)
+    numpy_retriever = CachedRetriever(numpy_store, chroma_store.embeddings, k=3)
+    for question in ["How long is a Tanding round?", "What is the seni category judged on?"]:
+        assert ([doc.id for doc in numpy_retriever.invoke(question)]
+                == [doc.id for doc in chroma_retriever.invoke(question)])
+    # Repeated questions are fetched by ID from the NumPy store
+    numpy_retriever.invoke("How long is a Tanding round?")
+    assert numpy_retriever.cache_stats()["results"]["hits"] == 1
+
+def test_numpy_store_follows_reingests(chroma_store):
+    numpy_store = load_numpy_store(lambda: chroma_store, read_ingest_stamp())
+    retriever = CachedRetriever(numpy_store, chroma_store.embeddings, k=10, hybrid=True, metadata_lookup=True)
+    assert len(retriever.invoke("What happens in the arena?")) == 4
+
+    process_and_store_data([{"text": "Article 16: the Gelanggang is a square arena.", "page_number": 16,
+                             "source_document": "circular.pdf"}],
+                           embedding_model=chroma_store.embeddings, vector_store=chroma_store)
+    assert [doc.metadata["page_number"] for doc in retriever.invoke("page 16")] == [16]
+    assert len(retriever.invoke("What happens in the arena?")) == 5
+    assert numpy_store.ingest_stamp == read_ingest_stamp()
@@ -0,0 +1,83 @@
+import pytest
+import fitz  # PyMuPDF
+import src.ocr as ocr
+import src.pdf_parser as pdf_parser
+from src.ocr import adaptive_dpi, apply_ocr
+from src.pdf_parser import extract_text_with_metadata
+
+@pytest.fixture
+def diagram_pdf_path(tmp_path):
+    """A 20-page PDF where every fourth page is a drawing-only (visual-heavy) page."""
+    pdf_path = str(tmp_path / "diagrams.pdf")
+    doc = fitz.open()
+    for page_index in range(20):
+        page = doc.new_page()
+        if page_index % 4 == 3:
+            page.draw_rect(fitz.Rect(50, 50 + page_index, 300, 300))
+        else:
+            page.insert_text((50, 72), f"Scoring rule {page_index + 1}. " * 20, fontsize=6)
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    """Replace Tesseract with a recogniser that records how often it runs."""
+    calls = []
+
+    def recognize_image(image):
+        calls.append(image.size)
+        return {"text": "TABLE 3 Points Kick 2", "confidence": 87.5}
+
+    monkeypatch.setattr(ocr, "recognize_image", recognize_image)
+    # The fake only reaches pool workers that are forked from this process
+    monkeypatch.setattr(ocr, "WORKER_START_METHOD", "fork")
+    return calls
+
+def test_adaptive_dpi_targets_long_side():
+    """A4 pages land near the target; tiny and huge pages are clamped to the DPI bounds."""
+    doc = fitz.open()
+    for width, height in [(595, 842), (100, 100), (3000, 3000)]:
+        doc.new_page(width=width, height=height)
+
+    assert adaptive_dpi(doc[0]) == int(ocr.OCR_TARGET_LONG_SIDE_PX / (842 / 72))
+    assert adaptive_dpi(doc[1]) == ocr.OCR_MAX_DPI
+    assert adaptive_dpi(doc[2]) == ocr.OCR_MIN_DPI
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_ocr_stage_preserves_order_and_uses_cache(diagram_pdf_path, fake_tesseract, tmp_path, num_workers):
+    """Only visual-heavy pages are OCRed, pages keep their order, and reruns come from the cache."""
+    cache_dir = str(tmp_path / "ocr_cache")
+    pages = extract_text_with_metadata(diagram_pdf_path, num_workers=1, ocr=False)
+
+    first = list(apply_ocr([dict(page) for page in pages], diagram_pdf_path, num_workers=num_workers, cache_dir=cache_dir))
+
+    assert [page["page_number"] for page in first] == [page["page_number"] for page in pages]
+    ocr_pages = [page for page in first if page.get("ocr_applied")]
+    assert [page["page_number"] for page in ocr_pages] == [16, 20]
+    assert all("VISUAL CONTENT REFERENCE" in page["text"] and "TABLE 3 Points" in page["text"] for page in ocr_pages)
+    assert not any("ocr_applied" in page for page in first if not page["is_visual_reference"])
+
+    if num_workers == 1:
+        assert len(fake_tesseract) == 2
+    rerun_calls = len(fake_tesseract)
+    second = list(apply_ocr([dict(page) for page in pages], diagram_pdf_path, num_workers=1, cache_dir=cache_dir))
+    assert len(fake_tesseract) == rerun_calls
+    assert second == first
+
+def test_extraction_skips_ocr_without_tesseract(diagram_pdf_path, monkeypatch):
+    """With OCR enabled but no Tesseract installed, extraction falls back to placeholders."""
+    monkeypatch.setattr("src.pdf_parser.tesseract_available", lambda: False)
+    pages = extract_text_with_metadata(diagram_pdf_path, num_workers=1, ocr=True)
+    assert not any(page.get("ocr_applied") for page in pages)
+
+@pytest.mark.parametrize("num_workers, ocr_workers_setting, expected", [
+    (None, 0, None), (3, 0, 3), (3, 2, 2), (1, 8, 1)])
+def test_ocr_gets_the_documents_worker_share(diagram_pdf_path, monkeypatch, num_workers, ocr_workers_setting, expected):
+    """Concurrent documents each OCR with their share of the cores, not a pool per CPU core each."""
+    requested = []
+    monkeypatch.setattr(pdf_parser, "tesseract_available", lambda: True)
+    monkeypatch.setattr(pdf_parser, "OCR_WORKERS", ocr_workers_setting)
+    monkeypatch.setattr(pdf_parser, "apply_ocr", lambda pages, pdf_path, num_workers: requested.append(num_workers) or pages)
+    extract_text_with_metadata(diagram_pdf_path, num_workers=num_workers, ocr=True)
+    assert requested == [expected]
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import pytest
+from langchain_community.embeddings import HuggingFaceEmbeddings
+import src.onnx_embeddings as onnx_embeddings
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.onnx_embeddings import OnnxTokenBudgetEmbeddings, TokenizerOnlyEmbeddings, onnx_model_path
+
+TEXTS = ["the pesilat must salute the referee", "bow twice", "article 12: a technique scores when it lands "
+         "cleanly on a legal target area", "the arena " * 30]
+
+@pytest.fixture(scope="module")
+def tiny_embeddings(tiny_embedding_model_dir):
+    return HuggingFaceEmbeddings(model_name=tiny_embedding_model_dir, model_kwargs={"device": "cpu"},
+                                 encode_kwargs={"normalize_embeddings": True})
+
+@pytest.mark.parametrize("quantize, min_cosine", [(False, 0.99999), (True, 0.99)])
+def test_onnx_backend_matches_torch(tiny_embeddings, tmp_path, quantize, min_cosine):
+    torch_vectors = np.array(TokenBudgetEmbeddings(tiny_embeddings).embed_documents(TEXTS))
+    onnx_backend = OnnxTokenBudgetEmbeddings(tiny_embeddings, "tiny/model", quantize=quantize, model_dir=str(tmp_path))
+    onnx_vectors = np.array(onnx_backend.embed_documents(TEXTS))
+
+    assert onnx_backend.model_path == onnx_model_path("tiny/model", quantize, str(tmp_path))
+    assert (np.sum(torch_vectors * onnx_vectors, axis=1) >= min_cosine).all()
+    assert np.allclose(np.linalg.norm(onnx_vectors, axis=1), 1, atol=1e-5)
+    # Dynamic quantisation picks activation ranges per batch, so a lone query differs a little
+    assert np.allclose(onnx_backend.embed_query(TEXTS[0]), onnx_vectors[0], atol=1e-3)
+
+def test_exported_model_is_cached(tiny_embeddings, tmp_path, monkeypatch):
+    OnnxTokenBudgetEmbeddings(tiny_embeddings, "tiny/model", quantize=True, model_dir=str(tmp_path))
+    assert os.path.exists(onnx_model_path("tiny/model", False, str(tmp_path)))
+
+    monkeypatch.setattr(onnx_embeddings, "export_onnx_model", lambda *args: pytest.fail("model exported again"))
+    monkeypatch.setattr(onnx_embeddings, "quantize_onnx_model", lambda *args: pytest.fail("model quantised again"))
+    OnnxTokenBudgetEmbeddings(tiny_embeddings, "tiny/model", quantize=True, model_dir=str(tmp_path))
+
+def test_exported_model_runs_without_loading_torch_weights(tiny_embedding_model_dir, tiny_embeddings, tmp_path,
+                                                          monkeypatch):
+    settings = ({"device": "cpu"}, {"normalize_embeddings": True})
+    exporting = OnnxTokenBudgetEmbeddings.from_model_name(tiny_embedding_model_dir, *settings, quantize=False,
+                                                          model_dir=str(tmp_path))
+    expected = exporting.embed_documents(TEXTS)
+
+    monkeypatch.setattr(onnx_embeddings, "HuggingFaceEmbeddings",
+                        lambda **kwargs: pytest.fail("PyTorch model loaded although the ONNX model exists"))
+    onnx_backend = OnnxTokenBudgetEmbeddings.from_model_name(tiny_embedding_model_dir, *settings, quantize=False,
+                                                             model_dir=str(tmp_path))
+    assert isinstance(onnx_backend.embeddings, TokenizerOnlyEmbeddings)
+    assert onnx_backend.max_content_tokens == TokenBudgetEmbeddings(tiny_embeddings).max_content_tokens
+    assert np.allclose(onnx_backend.embed_documents(TEXTS), expected, atol=1e-6)
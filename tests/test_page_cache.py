@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import fitz  # PyMuPDF
+import src.page_cache as page_cache
+import src.pdf_parser as pdf_parser
+from src.pdf_parser import extract_text_with_metadata
+from src.page_selection import select_pages
+
+def build_pdf(pdf_path, edited_page=None):
+    """Write a 20-page PDF; optionally change the text of one page."""
+    doc = fitz.open()
+    for page_index in range(20):
+        page = doc.new_page()
+        text = f"Rule {page_index + 1}: the pesilat must remain in the arena. " * 5
+        if page_index + 1 == edited_page:
+            text = "Corrected rule text. " * 20
+        page.insert_text((50, 72), text, fontsize=6)
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
+
+def cache_hits(pdf_path):
+    """Run extraction over the selected pages and return the page numbers served from the cache."""
+    with fitz.open(pdf_path) as doc:
+        results = pdf_parser._iter_pages(doc, select_pages(len(doc)), pdf_parser._page_cache_settings())
+        return [page_number for _, _, page_number, hit in results if hit]
+
+def test_rerun_is_served_from_cache(tmp_path):
+    """A second run over an unchanged PDF should hit the cache for every page and give identical output."""
+    pdf_path = build_pdf(str(tmp_path / "rules.pdf"))
+
+    first = extract_text_with_metadata(pdf_path, num_workers=1)
+    # Pages 1-14 are in PAGES_TO_SKIP and never extracted
+    assert cache_hits(pdf_path) == list(range(15, 21))
+    assert extract_text_with_metadata(pdf_path, num_workers=1) == first
+
+def test_only_edited_page_is_reprocessed(tmp_path):
+    """Editing one page should only invalidate that page's entry."""
+    original = build_pdf(str(tmp_path / "rules_v1.pdf"))
+    edited = build_pdf(str(tmp_path / "rules_v2.pdf"), edited_page=17)
+
+    extract_text_with_metadata(original, num_workers=1)
+    hits = cache_hits(edited)
+
+    assert 17 not in hits
+    assert len(hits) == 5
+    assert "Corrected rule text." in extract_text_with_metadata(edited, num_workers=1)[-4]['text']
+
+def test_config_change_invalidates_keys(tmp_path, monkeypatch):
+    """Changing the cleaning configuration should change every page key."""
+    pdf_path = build_pdf(str(tmp_path / "rules.pdf"))
+    before = page_cache.extraction_config_fingerprint()
+
+    monkeypatch.setattr(page_cache, "BOILERPLATE_PATTERNS", page_cache.BOILERPLATE_PATTERNS + [r"pesilat"])
+    after = page_cache.extraction_config_fingerprint()
+    assert before != after
+
+    with fitz.open(pdf_path) as doc:
+        assert page_cache.page_cache_key(doc[0], 1, before) != page_cache.page_cache_key(doc[0], 1, after)
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    """A truncated cache file should be treated as a miss rather than an error."""
+    page_cache.store_cached_page(str(tmp_path), "ab" * 32, {"cleaned_text": "x"})
+    assert page_cache.load_cached_page(str(tmp_path), "ab" * 32) == {"cleaned_text": "x"}
+
+    with open(page_cache._cache_path(str(tmp_path), "ab" * 32), "w") as f:
+        f.write("{")
+    assert page_cache.load_cached_page(str(tmp_path), "ab" * 32) is None
+
+def test_threads_can_store_the_same_key(tmp_path):
+    """Two documents sharing a page write the same entry from different threads."""
+    def store(_):
+        for _ in range(200):
+            page_cache.store_cached_page(str(tmp_path), "cd" * 32, {"cleaned_text": "shared page. " * 100})
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(store, range(4)))
+    assert page_cache.load_cached_page(str(tmp_path), "cd" * 32) == {"cleaned_text": "shared page. " * 100}
+    assert len(list(tmp_path.rglob("*.tmp"))) == 0
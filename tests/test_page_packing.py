@@ -0,0 +1,70 @@
+import json
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.data_processor import chunk_id, split_pages
+from src.page_packing import pack_page_documents, page_segments, split_packed_documents
+from rag_chain import format_docs
+
+def word_count(text):
+    return len(text.split())
+
+def page(page_number, words=10, source_document="rulebook.pdf", visual=False):
+    text = " ".join(f"p{page_number}w{i}" for i in range(words))
+    return {"text": text, "page_number": page_number, "source_document": source_document,
+            "content_type": "visual_heavy" if visual else "text_only", "is_visual_reference": visual}
+
+def test_consecutive_pages_are_packed_up_to_the_budget():
+    pages = [page(15), page(16), page(17), page(18, words=25), page(19)]
+    documents = pack_page_documents(pages, max_tokens=30, count_tokens=word_count)
+
+    assert [(d.metadata["page_start"], d.metadata["page_end"]) for d in documents] == [(15, 17), (18, 18), (19, 19)]
+    packed = documents[0]
+    assert packed.metadata["page_number"] == 15
+    for page_number, start in json.loads(packed.metadata["page_offsets"]):
+        assert packed.page_content[start:].startswith(f"p{page_number}w0 ")
+
+def test_gaps_documents_and_visual_pages_break_packing():
+    pages = [page(15), page(17), page(18, visual=True), page(19), page(20, source_document="circular.pdf")]
+    documents = pack_page_documents(pages, max_tokens=1000, count_tokens=word_count)
+    assert [(d.metadata["page_start"], d.metadata["page_end"]) for d in documents] == [
+        (15, 15), (17, 17), (18, 18), (19, 19), (20, 20)]
+
+def test_split_chunks_record_the_pages_they_cover():
+    documents = pack_page_documents([page(20, words=60), page(21, words=60)], max_tokens=1000,
+                                    count_tokens=word_count)
+    # Split on spaces only, so a chunk runs over the page break
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=0, separators=[" "])
+    chunks = split_packed_documents(splitter, documents)
+
+    spans = [(chunk.metadata["page_start"], chunk.metadata["page_end"]) for chunk in chunks]
+    assert spans[0] == (20, 20) and spans[-1] == (21, 21)
+    assert (20, 21) in spans
+    for chunk in chunks:
+        for page_number, text in page_segments(chunk.metadata, chunk.page_content):
+            assert text and all(word.startswith(f"p{page_number}w") for word in text.split())
+
+def test_split_pages_without_packing_keeps_one_document_per_page():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0)
+    pages = [page(15), page(16)]
+    assert [chunk.metadata["page_number"] for chunk in split_pages(pages, splitter, pack_pages=False)] == [15, 16]
+    packed = split_pages(pages, splitter, pack_pages=True)
+    assert len(packed) == 1
+    assert chunk_id(packed[0]).startswith("rulebook.pdf:p15-16:")
+
+def test_format_docs_cites_exact_pages():
+    documents = pack_page_documents([page(23, words=3), page(24, words=3)], max_tokens=100, count_tokens=word_count)
+    single = Document(page_content="Article 30", metadata={"page_number": 30})
+    context = format_docs(documents + [single])
+
+    assert "--- START OF DOCUMENT FROM rulebook.pdf, PAGES 23-24 ---" in context
+    assert "[Page 23]\np23w0 p23w1 p23w2\n\n[Page 24]\np24w0 p24w1 p24w2" in context
+    assert "--- START OF DOCUMENT FROM PAGE 30 ---\nArticle 30" in context
+
+def test_format_docs_keeps_the_same_page_of_different_documents():
+    documents = [Document(page_content=f"Page 3 of {name}", metadata={"page_number": 3, "source_document": name})
+                 for name in ("rules.pdf", "circular_2024.pdf", "rules.pdf")]
+    context = format_docs(documents)
+
+    assert "--- START OF DOCUMENT FROM rules.pdf, PAGE 3 ---\nPage 3 of rules.pdf" in context
+    assert "--- START OF DOCUMENT FROM circular_2024.pdf, PAGE 3 ---\nPage 3 of circular_2024.pdf" in context
+    assert context.count("START OF DOCUMENT") == 2
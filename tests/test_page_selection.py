@@ -0,0 +1,56 @@
+import pytest
+import fitz  # PyMuPDF
+import src.page_selection as page_selection
+import src.pdf_parser as pdf_parser
+from src.page_selection import parse_page_spec, select_pages
+from src.pdf_parser import extract_text_with_metadata
+from main import parse_args
+
+def test_parse_page_spec():
+    assert parse_page_spec("200-260,!230") == ([(200, 260)], [(230, 230)])
+    assert parse_page_spec(" 5 , 300- , -10 , !1-3 ") == ([(5, 5), (300, None), (1, 10)], [(1, 3)])
+    assert parse_page_spec(None) == ([], [])
+
+@pytest.mark.parametrize("spec", ["abc", "10-5", "0", "1-2-3", "!"])
+def test_parse_page_spec_rejects_malformed_specs(spec):
+    with pytest.raises(ValueError):
+        parse_page_spec(spec)
+
+def test_select_pages_combines_spec_rules_and_skip_list(monkeypatch):
+    """The spec, the per-document rule and PAGES_TO_SKIP (pages 1-14) must all agree."""
+    assert select_pages(20) == list(range(15, 21))
+    assert select_pages(300, "200-260,!230") == [page for page in range(200, 261) if page != 230]
+    assert select_pages(30, "10-,!25-") == list(range(15, 25))
+    assert select_pages(30, "!1-") == []
+
+    monkeypatch.setattr(page_selection, "DOCUMENT_PAGE_RULES", {"circular.pdf": "16-40"})
+    assert select_pages(30, "-20", source_document="circular.pdf") == list(range(16, 21))
+    assert select_pages(30, "-20", source_document="rulebook.pdf") == list(range(15, 21))
+
+def test_unselected_pages_are_never_loaded(tmp_path, monkeypatch):
+    """Only the selected pages should reach page extraction."""
+    pdf_path = str(tmp_path / "rules.pdf")
+    doc = fitz.open()
+    for page_index in range(40):
+        doc.new_page().insert_text((50, 72), f"Rule text for page {page_index + 1}. " * 10, fontsize=6)
+    doc.save(pdf_path)
+    doc.close()
+
+    loaded = []
+    extract_page = pdf_parser._extract_page
+    def recording_extract_page(page, page_number, config_fingerprint=None):
+        loaded.append(page_number)
+        return extract_page(page, page_number, config_fingerprint)
+    monkeypatch.setattr(pdf_parser, "_extract_page", recording_extract_page)
+
+    pages = extract_text_with_metadata(pdf_path, num_workers=1, page_spec="20-30,!25")
+
+    expected = [page for page in range(20, 31) if page != 25]
+    assert loaded == expected
+    assert [page["page_number"] for page in pages] == expected
+
+def test_cli_pages_option():
+    assert parse_args(["--pages", "200-260,!230"]).pages == "200-260,!230"
+    assert parse_args([]).pages is None
+    with pytest.raises(SystemExit):
+        parse_args(["--pages", "260-200"])
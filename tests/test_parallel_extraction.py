@@ -0,0 +1,44 @@
+import pytest
+import fitz  # PyMuPDF
+import src.pdf_parser as pdf_parser
+from src.pdf_parser import extract_text_with_metadata
+
+@pytest.fixture(scope="module")
+def multi_page_pdf_path(tmp_path_factory):
+    """Create a 60-page PDF mixing text pages and drawing-only pages."""
+    pdf_path = str(tmp_path_factory.mktemp("pdfs") / "multi_page.pdf")
+
+    doc = fitz.open()
+    for page_index in range(60):
+        page = doc.new_page()
+        if page_index % 7 == 0:
+            # Drawing-only page, classified as visual_heavy
+            for row in range(10):
+                page.draw_rect(fitz.Rect(50, 50 + row * 20, 300, 65 + row * 20))
+        else:
+            page.insert_text((50, 72), f"Rule text for page {page_index + 1}. " * 10, fontsize=8)
+    doc.save(pdf_path)
+    doc.close()
+
+    return pdf_path
+
+def test_parallel_extraction_matches_serial(multi_page_pdf_path, monkeypatch):
+    """Sharded extraction should return exactly what the serial path returns, in page order."""
+    monkeypatch.setattr(pdf_parser, "EXTRACTION_MIN_PAGES_PER_WORKER", 10)
+
+    serial = extract_text_with_metadata(multi_page_pdf_path, num_workers=1)
+    parallel = extract_text_with_metadata(multi_page_pdf_path, num_workers=3)
+
+    assert parallel == serial
+    page_numbers = [page['page_number'] for page in parallel]
+    assert page_numbers == sorted(page_numbers)
+    assert any(page['is_visual_reference'] for page in parallel)
+
+def test_shard_pages_cover_selection():
+    """Shards should be contiguous, non-overlapping, balanced and cover every selected page in order."""
+    page_numbers = [page_number for page_number in range(1, 104) if page_number != 50]
+    shards = pdf_parser._shard_pages(page_numbers, 4)
+
+    assert len(shards) == 4
+    assert [page_number for shard in shards for page_number in shard] == page_numbers
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
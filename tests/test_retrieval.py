@@ -0,0 +1,70 @@
+import uuid
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.data_processor import process_and_store_data
+from src.retrieval import CachedRetriever, LRUCache, normalize_query
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake vectors; counts the queries that were embedded."""
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+def pages(edits=None):
+    edits = edits or {}
+    return [{"text": edits.get(page_number, f"Article {page_number}: the pesilat must salute the referee."),
+             "page_number": page_number, "source_document": "rulebook.pdf"}
+            for page_number in range(15, 25)]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A Chroma collection holding pages 15-24, one chunk each."""
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = CountingEmbeddings(size=16)
+    store = Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                   persist_directory=str(tmp_path / "chroma_db"))
+    process_and_store_data(pages(), embedding_model=embeddings, vector_store=store)
+    return store
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2, "hit_rate": 0.6667}
+
+def test_normalize_query():
+    assert normalize_query("  What are the legal TARGETS?\n") == normalize_query("what are the legal targets")
+
+def test_repeated_questions_skip_embedding_and_search(store):
+    retriever = CachedRetriever(store, store.embeddings, k=3)
+    first = retriever.invoke("What does Article 18 say?")
+    again = retriever.invoke("what does article 18 say")
+
+    assert [doc.id for doc in again] == [doc.id for doc in first]
+    assert [doc.page_content for doc in again] == [doc.page_content for doc in first]
+    assert store.embeddings.queries == 1
+    stats = retriever.cache_stats()
+    assert stats["results"]["hits"] == 1 and stats["results"]["misses"] == 1
+    assert stats["query_embeddings"]["misses"] == 1
+
+def test_ingest_runs_invalidate_the_caches(store):
+    retriever = CachedRetriever(store, store.embeddings, k=10)
+    retriever.invoke("What does Article 18 say?")
+
+    # Re-ingesting a corrected page bumps the ingest stamp
+    process_and_store_data(pages(edits={18: "Article 18 (corrected): bow twice."}),
+                           embedding_model=store.embeddings, vector_store=store)
+    documents = retriever.invoke("What does Article 18 say?")
+
+    assert retriever.cache_stats()["invalidations"] == 1
+    assert store.embeddings.queries == 2
+    assert "Article 18 (corrected): bow twice." in [doc.page_content for doc in documents]
@@ -0,0 +1,106 @@
+import threading
+import pytest
+import fitz  # PyMuPDF
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.pdf_parser import extract_text_with_metadata, iter_text_with_metadata
+
+@pytest.fixture(scope="module")
+def rulebook_pdf_path(tmp_path_factory):
+    """Create a 30-page text PDF; pages 1-14 fall in PAGES_TO_SKIP."""
+    pdf_path = str(tmp_path_factory.mktemp("pdfs") / "rulebook.pdf")
+
+    doc = fitz.open()
+    for page_index in range(30):
+        page = doc.new_page()
+        page.insert_text((50, 72), f"Article {page_index + 1}: a pesilat must bow before Tanding. " * 5, fontsize=8)
+    doc.save(pdf_path)
+    doc.close()
+
+    return pdf_path
+
+class RecordingVectorStore:
+    """Stands in for Chroma and records each written batch."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+
+    def __init__(self):
+        self.batches = []
+        self.ids = set()
+
+    @property
+    def _collection(self):
+        return self
+
+    @property
+    def _client(self):
+        return self
+
+    def get_max_batch_size(self):
+        return 5461
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.add_documents([Document(page_content=text, metadata=metadata or {})
+                            for text, metadata in zip(documents, metadatas)], ids)
+
+    def add_documents(self, documents, ids):
+        self.batches.append(list(documents))
+        self.ids.update(ids)
+        return ids
+
+    def get(self, ids=None, where=None, include=None):
+        return {"ids": [chunk_id for chunk_id in ids if chunk_id in self.ids] if ids else [], "metadatas": []}
+
+    def delete(self, ids):
+        self.ids.difference_update(ids)
+
+def test_iter_matches_batch_extraction(rulebook_pdf_path):
+    """The page generator should yield the same pages as the list-based API."""
+    assert list(iter_text_with_metadata(rulebook_pdf_path)) == extract_text_with_metadata(rulebook_pdf_path)
+
+def test_stream_and_store_data_writes_in_bounded_batches(rulebook_pdf_path, monkeypatch):
+    """Pages should reach the vector store in batches of at most batch_pages pages."""
+    store = RecordingVectorStore()
+    monkeypatch.setattr(data_processor, "get_embeddings_model", lambda: None)
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    monkeypatch.setattr(data_processor, "get_vector_store", lambda embedding_model: store)
+
+    chunk_ids = data_processor.stream_and_store_data(
+        iter_text_with_metadata(rulebook_pdf_path), batch_pages=4, max_inflight=1
+    )
+
+    assert len(chunk_ids) == 16
+    assert [len(batch) for batch in store.batches] == [4, 4, 4, 4]
+    stored_pages = [chunk.metadata['page_number'] for batch in store.batches for chunk in batch]
+    assert stored_pages == list(range(15, 31))
+
+def test_prefetch_bounds_work_ahead():
+    """The producer should never run more than max_inflight items ahead of the consumer."""
+    produced = []
+    consumed = []
+    lock = threading.Lock()
+
+    def items():
+        for i in range(20):
+            with lock:
+                produced.append(i)
+            yield i
+
+    for item in data_processor._prefetch(items(), max_inflight=2):
+        with lock:
+            # Queue holds at most 2, plus one item the producer may be blocked on
+            assert len(produced) - len(consumed) <= 4
+        consumed.append(item)
+
+    assert consumed == list(range(20))
+
+def test_prefetch_reraises_producer_errors():
+    """Errors raised while producing (e.g. a corrupt page) should surface in the consumer."""
+    def items():
+        yield 1
+        raise ValueError("corrupt page")
+
+    with pytest.raises(ValueError, match="corrupt page"):
+        list(data_processor._prefetch(items(), max_inflight=1))
@@ -0,0 +1,62 @@
+import re
+import pytest
+from src.config import BOILERPLATE_PATTERNS
+from src.text_processor import clean_text, clean_texts, required_literal
+
+FOOTER = ("Copyright © 01 October 2022 Version 1 by International Pencak Silat Federation (PERSILAT). "
+          "All rights reserved.")
+
+def legacy_clean_text(text: str) -> str:
+    """The original uncompiled implementation, used as the reference output."""
+    cleaned = text
+    for pattern in BOILERPLATE_PATTERNS:
+        cleaned = re.sub(pattern, "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
+    cleaned = re.sub(r'\n\s*\n', '\n\n', cleaned)
+    cleaned = re.sub(r'[ \t]+', ' ', cleaned)
+    return cleaned.strip()
+
+SAMPLES = [
+    "",
+    "   \n\t\n  ",
+    "Article 1\n\n\n\nThe  pesilat\t\tscores.  \n",
+    f"Rule text.\n{FOOTER}\nNo part of this material/publication may be reproduced or published "
+    "in any manner without the consent in writing.",
+    FOOTER.upper() + "\nBody",
+    "  Table of Contents  \nArticle 1 ....... 5\n\tContents\t\nContents of the kit",
+    "TABLE OF CONTENTS\n\n \t \nchapter \t one",
+    "Mixed \t \t whitespace\r\n\r\n  non-breaking",
+    "Tables of Contents\nContentsX",
+]
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_clean_text_matches_legacy_implementation(text):
+    assert clean_text(text) == legacy_clean_text(text)
+
+def test_clean_text_removes_boilerplate_and_normalizes_whitespace():
+    cleaned = clean_text(f"Article 5\n\n\n\nPoints   are\tawarded.\n{FOOTER}\n  Contents  \n")
+    assert cleaned == "Article 5\n\nPoints are awarded."
+
+def test_clean_texts_matches_clean_text():
+    assert clean_texts(SAMPLES) == [clean_text(text) for text in SAMPLES]
+    assert clean_texts([]) == []
+
+@pytest.mark.parametrize("pattern, expected", [
+    (BOILERPLATE_PATTERNS[2], "Table of Contents"),
+    (r"a\.b", "a.b"),
+    (r"foo\d+barbaz", "barbaz"),
+    (r"(abc)?defg", "defg"),
+    (r"ab?cdef", "cdef"),
+    (r"[\]a]bcd", "bcd"),
+    (r"x|y", ""),
+    (r"(?x) a b c", ""),
+    (r"-{10,}", ""),
+    (r"_{5}", ""),
+    (r"Page{2,3} of it", " of it"),
+    (r"\x41BC", "BC"),
+    (r"\u00e9t\u00e9s", "t"),
+    (r"(ab)cd\1", "cd"),
+    (r"\N{BULLET} item", " item"),
+    (r"a{b", ""),
+])
+def test_required_literal(pattern, expected):
+    assert required_literal(pattern) == expected
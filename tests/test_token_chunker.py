@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from src.data_processor import get_token_text_splitter
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_scheduler import TokenBudgetEmbeddings
+from src.token_chunker import ModelTokenTextSplitter
+
+PAGE_TEXT = ("Article 12: the pesilat must salute the referee.\n\nDuring tanding a technique scores when it "
+             "lands cleanly on a legal target area and the referee confirms it. ") * 8
+
+@pytest.fixture
+def embeddings(tiny_embedding_model_dir):
+    return TokenBudgetEmbeddings(HuggingFaceEmbeddings(model_name=tiny_embedding_model_dir,
+                                                       model_kwargs={"device": "cpu"},
+                                                       encode_kwargs={"normalize_embeddings": True}))
+
+def test_chunks_fit_the_model_and_are_exact_slices(embeddings):
+    splitter = ModelTokenTextSplitter(embeddings, chunk_size=4096, chunk_overlap=512)
+    chunks = splitter.split_text(PAGE_TEXT)
+
+    # The 64-token model input minus [CLS] and [SEP]
+    assert splitter._chunk_size == 62
+    # The overlap shrinks with the chunk instead of covering nearly all of it
+    assert splitter._chunk_overlap == 7
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert chunk in PAGE_TEXT
+        assert embeddings.count_tokens([chunk])[0] <= 64
+        assert splitter.count_tokens(chunk) <= 62
+    # Consecutive chunks overlap and together cover the whole text
+    assert PAGE_TEXT.startswith(chunks[0]) and PAGE_TEXT.rstrip().endswith(chunks[-1])
+    for previous, current in zip(chunks, chunks[1:]):
+        assert PAGE_TEXT.index(current) < PAGE_TEXT.index(previous) + len(previous)
+
+def test_chunk_token_ids_are_reused_for_embedding(embeddings, monkeypatch):
+    splitter = ModelTokenTextSplitter(embeddings, chunk_size=30, chunk_overlap=5)
+    documents = splitter.split_documents([Document(page_content=PAGE_TEXT, metadata={"page_number": 20})])
+    texts = [document.page_content for document in documents]
+    assert all(document.metadata == {"page_number": 20} for document in documents)
+
+    tokenized = []
+    tokenizer_class = type(embeddings.tokenizer)
+    original_call = tokenizer_class.__call__
+    monkeypatch.setattr(tokenizer_class, "__call__",
+                        lambda self, text, *args, **kwargs: tokenized.append(text) or original_call(self, text, *args, **kwargs))
+    vectors = embeddings.embed_documents(texts)
+    monkeypatch.undo()
+
+    assert tokenized == []
+    assert np.allclose(vectors, embeddings.embeddings.embed_documents(texts), atol=1e-5)
+
+def test_splitter_factory_uses_the_model_tokenizer(embeddings, tmp_path):
+    cached = CachedEmbeddings(embeddings, "tiny", True, cache_dir=str(tmp_path))
+    splitter = get_token_text_splitter(cached)
+    assert isinstance(splitter, ModelTokenTextSplitter) and splitter.embeddings is embeddings
@@ -0,0 +1,162 @@
+import threading
+import uuid
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import src.data_processor as data_processor
+from src.data_processor import assign_chunk_ids, process_and_store_data, stream_and_store_data, write_chunks
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic fake vectors; counts the texts that were embedded."""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+def pages(source_document="rulebook.pdf", edits=None):
+    """Extracted page data for pages 15-24, with optional replacement texts by page number."""
+    edits = edits or {}
+    return [{"text": edits.get(page_number, f"Article {page_number}: the pesilat must salute the referee."),
+             "page_number": page_number, "source_document": source_document}
+            for page_number in range(15, 25)]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A throwaway Chroma collection with a counting fake embedding model."""
+    monkeypatch.setattr(data_processor, "get_token_text_splitter",
+                        lambda embedding_model=None: RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=0))
+    embeddings = CountingEmbeddings(size=16)
+    return Chroma(collection_name=f"test-{uuid.uuid4().hex}", embedding_function=embeddings,
+                  persist_directory=str(tmp_path / "chroma_db"))
+
+def test_rerun_is_idempotent(store):
+    first = process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store)
+    stats = {}
+    second = process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store, upsert_stats=stats)
+
+    assert second == first
+    assert store._collection.count() == 10
+    assert store.embeddings.embedded == 10
+    assert stats == {"added": 0, "unchanged": 10, "deleted": 0}
+
+def test_large_upserts_are_split_into_chroma_batches(store, monkeypatch):
+    monkeypatch.setattr(data_processor, "CHROMA_BATCH_SIZE", 3)
+    process_and_store_data(pages()[:5], embedding_model=store.embeddings, vector_store=store)
+    stats = {}
+    process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store, upsert_stats=stats)
+
+    assert stats == {"added": 5, "unchanged": 5, "deleted": 0}
+    assert store.embeddings.embedded == 10
+    assert store._collection.count() == 10
+
+def test_stale_chunks_are_deleted_in_chroma_batches(store, monkeypatch):
+    process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store)
+    monkeypatch.setattr(data_processor, "CHROMA_BATCH_SIZE", 3)
+    deletes = []
+    delete = store.delete
+    monkeypatch.setattr(store, "delete", lambda ids: deletes.append(len(ids)) or delete(ids=ids))
+    stats = {}
+    process_and_store_data(pages()[:2], embedding_model=store.embeddings, vector_store=store, upsert_stats=stats)
+
+    assert stats == {"added": 0, "unchanged": 2, "deleted": 8}
+    assert deletes == [3, 3, 2]
+    assert store._collection.count() == 2
+
+def test_one_page_correction_costs_one_page(store):
+    process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store)
+    stats = {}
+    ids = process_and_store_data(pages(edits={18: "Article 18 (corrected): bow twice."}), embedding_model=store.embeddings, vector_store=store,
+                                 upsert_stats=stats)
+
+    assert stats == {"added": 1, "unchanged": 9, "deleted": 1}
+    assert store.embeddings.embedded == 11
+    assert sorted(store.get(include=[])["ids"]) == sorted(ids)
+    assert "Article 18 (corrected): bow twice." in store.get(where={"page_number": 18})["documents"]
+
+def test_page_scope_limits_stale_deletion(store):
+    process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store)
+    partial = [page for page in pages(edits={20: "Article 20 (revised)."}) if page["page_number"] in (19, 20)]
+    stats = {}
+    stream_and_store_data(iter(partial), batch_pages=1, max_inflight=1, embedding_model=store.embeddings, vector_store=store,
+                          page_scope={19, 20}, upsert_stats=stats)
+
+    assert stats == {"added": 1, "unchanged": 1, "deleted": 1}
+    assert store._collection.count() == 10
+
+def test_packed_rerun_replaces_spans_within_the_page_scope(store):
+    first = process_and_store_data(pages(), embedding_model=store.embeddings, vector_store=store, pack_pages=True)
+    assert len(first) == 1 and ":p15-24:" in first[0]
+
+    stats = {}
+    partial = [page for page in pages(edits={20: "Article 20 (revised)."}) if page["page_number"] in (19, 20)]
+    process_and_store_data(partial, embedding_model=store.embeddings, vector_store=store, page_scope={19, 20},
+                           pack_pages=True, upsert_stats=stats)
+    # The 15-24 chunk reaches outside the scope, so it is kept next to the new 19-20 chunk
+    assert stats == {"added": 1, "unchanged": 0, "deleted": 0}
+
+    stats = {}
+    process_and_store_data(pages(edits={20: "Article 20 (revised)."}), embedding_model=store.embeddings,
+                           vector_store=store, pack_pages=True, upsert_stats=stats)
+    assert stats == {"added": 1, "unchanged": 0, "deleted": 2}
+    assert store._collection.count() == 1
+
+def test_documents_do_not_delete_each_other(store):
+    process_and_store_data(pages("rulebook.pdf"), embedding_model=store.embeddings, vector_store=store)
+    process_and_store_data(pages("circular.pdf"), embedding_model=store.embeddings, vector_store=store)
+    assert store._collection.count() == 20
+
+def test_duplicate_chunks_get_distinct_ids():
+    chunk = Document(page_content="Same text", metadata={"source_document": "a.pdf", "page_number": 3})
+    seen = {}
+    ids = assign_chunk_ids([chunk, chunk], seen) + assign_chunk_ids([chunk], seen)
+
+    assert len(set(ids)) == 3
+    assert ids[0].startswith("a.pdf:p3:") and ids[1] == f"{ids[0]}#1" and ids[2] == f"{ids[0]}#2"
+    assert assign_chunk_ids([chunk]) == ids[:1]
+
+def test_write_chunks_stores_precomputed_vectors_in_batches(store):
+    chunks = [Document(page_content=f"Article {i}", metadata={"page_number": i}) for i in range(10)]
+    ids = [f"chunk-{i}" for i in range(10)]
+    stats = write_chunks(store, chunks, ids, batch_size=3)
+
+    assert (stats["chunks"], stats["batches"]) == (10, 4)
+    stored = store.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    by_id = dict(zip(stored["ids"], zip(stored["documents"], stored["metadatas"], stored["embeddings"])))
+    for chunk_id, chunk in zip(ids, chunks):
+        document, metadata, vector = by_id[chunk_id]
+        assert (document, metadata) == (chunk.page_content, chunk.metadata)
+        assert np.allclose(vector, store.embeddings.embed_query(chunk.page_content))
+
+def test_write_chunks_embeds_the_next_batch_while_writing(store):
+    """The first write only completes once the second batch is being embedded."""
+    second_batch_embedded = threading.Event()
+
+    class SignallingEmbeddings(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            if texts[0] == "Article 2":
+                second_batch_embedded.set()
+            return super().embed_documents(texts)
+
+    class BlockingCollection:
+        def __init__(self, collection):
+            self.collection = collection
+            self.overlapped = []
+
+        def upsert(self, **kwargs):
+            self.overlapped.append(second_batch_embedded.wait(timeout=5))
+            self.collection.upsert(**kwargs)
+
+    class ProbeStore:
+        embeddings = SignallingEmbeddings(size=16)
+        _client = store._client
+        _collection = BlockingCollection(store._collection)
+
+    chunks = [Document(page_content=f"Article {i}", metadata={"page_number": i}) for i in range(4)]
+    write_chunks(ProbeStore(), chunks, [f"chunk-{i}" for i in range(4)], batch_size=2)
+
+    assert ProbeStore._collection.overlapped == [True, True]
+    assert store._collection.count() == 4